@@ -101,6 +101,21 @@ DATABASES = {
     }
 }
 
+# ============================================================================
+# CACHE
+# ============================================================================
+# Cache locale in memoria (nessun servizio esterno richiesto).
+# Usata per gli indicatori di dashboard e report, invalidati dai signals.
+# Con più processi worker si può passare a FileBasedCache per condividerla.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'gmr-cache',
+        'TIMEOUT': 300,
+    }
+}
+
 # ============================================================================
 # PASSWORD VALIDATION E AUTENTICAZIONE
 # ============================================================================
@@ -238,8 +253,23 @@ django.db.backends.mysql.base.DatabaseFeatures.can_return_columns_from_insert =
 # Le configurazioni di backup vengono lette dalla tabella 'configurazioni'
 # Questi sono solo valori di fallback se il database non è ancora inizializzato
 BACKUP_DIR = BASE_DIR / 'backups'
-BACKUP_RETENTION_DAYS = 30
+BACKUP_RETENTION_DAYS = 30            # Conservazione GFS: giorni con un backup giornaliero
+BACKUP_CONSERVA_ORARI = 24            # ... ore con un backup orario
+BACKUP_CONSERVA_SETTIMANALI = 8       # ... settimane con un backup settimanale
+BACKUP_CONSERVA_MENSILI = 12          # ... mesi con un backup mensile
 MYSQL_BIN_PATH = r'C:\xampp\mysql\bin'
+BACKUP_COMPRESSIONE = 'gzip'          # 'gzip' oppure 'zstd' (richiede il modulo zstandard)
+BACKUP_LIVELLO_COMPRESSIONE = 6       # gzip 1-9, zstd 1-19
+BACKUP_PARALLELO = False              # True: una tabella per file, esportate in parallelo (.tar)
+BACKUP_PROCESSI = 4                   # Processi del backup/restore parallelo
+BACKUP_ORARI = ''                     # Backup completi pianificati, es. '02:00, 13:30' (comando pianifica_backup)
+BACKUP_INTERVALLO_INCREMENTALE = 0    # Minuti tra due incrementali pianificati (0 = nessuno)
+# Download dei backup inviati dal proxy invece che da Django (Range e ripresa gestiti dal proxy):
+#   'x-sendfile' per Apache con mod_xsendfile (XSendFile On, XSendFilePath <cartella backup>)
+#   'x-accel' per nginx con "location /backup-interni/ { internal; alias <cartella backup>/; }"
+BACKUP_DOWNLOAD_PROXY = None
+BACKUP_DOWNLOAD_URL_INTERNO = '/backup-interni/'
+# BACKUP_SCHEMA_VERIFICA = 'GMR_verifica'  # Database usa e getta dei test-restore (default <NAME>_verifica)
 
 # ============================================================================
 # MEDIA FILES (Upload immagini articoli)
@@ -247,5 +277,11 @@ MYSQL_BIN_PATH = r'C:\xampp\mysql\bin'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Thread per processo che elaborano la coda immagini (magazzino/coda_immagini.py)
+IMMAGINI_WORKERS = 2
+
+# Formati generati oltre al JPEG, se supportati da Pillow (per AVIF: build con libavif o pillow-avif-plugin)
+IMMAGINI_FORMATI_ALTERNATIVI = ('webp', 'avif')
+
 # Per il futuro: migrazione su NAS Synology
 # MEDIA_ROOT = Path(r'\\NAS-SYNOLOGY\magazzino\media')  # Percorso UNC via VPN
@@ -0,0 +1,93 @@
+"""
+Costruzione dell'albero delle categorie per la pagina Categorie.
+
+Carica tutte le categorie e il numero di articoli attivi per categoria
+(una GROUP BY su pezzi_ricambio): due query in totale, indipendentemente
+dalla dimensione dell'albero. I conteggi del sottoalbero vengono sommati
+in memoria risalendo la gerarchia, con la stessa regola di
+Categoria.count_articoli() (i rami disattivati non vengono sommati).
+"""
+
+from dataclasses import dataclass, field
+
+from django.db.models import Count
+
+from .models import Categoria, PezzoRicambio
+
+
+# Numero di query eseguite da costruisci_albero_categorie() (usato anche dai test)
+ALBERO_QUERY_BUDGET = 2
+
+
+@dataclass
+class NodoCategoria:
+    """Categoria con figli e conteggi articoli già calcolati"""
+
+    categoria: Categoria
+    articoli_diretti: int = 0
+    articoli_totali: int = 0
+    ha_figli: bool = False
+    figli: list = field(default_factory=list)
+
+
+def _somma_sottoalbero(nodo):
+    """Calcola articoli_totali e ha_figli del nodo e dei suoi discendenti"""
+    totale = nodo.articoli_diretti
+    for figlio in nodo.figli:
+        _somma_sottoalbero(figlio)
+        if figlio.categoria.stato_attivo:
+            totale += figlio.articoli_totali
+            nodo.ha_figli = True
+    nodo.articoli_totali = totale
+
+
+def _filtra_figli(nodo, stato):
+    """Con il filtro 'attivo' nasconde le sottocategorie disattivate"""
+    if stato == 'attivo':
+        nodo.figli = [figlio for figlio in nodo.figli if figlio.categoria.stato_attivo]
+    for figlio in nodo.figli:
+        _filtra_figli(figlio, stato)
+
+
+def costruisci_albero_categorie(stato=None):
+    """
+    Costruisce l'albero delle categorie con i conteggi articoli.
+
+    Args:
+        stato: 'attivo', 'inattivo' o None, filtra le macrocategorie come
+            CategoriaListView (con 'attivo' nasconde anche le sottocategorie disattivate)
+
+    Returns:
+        list[NodoCategoria]: macrocategorie ordinate per ordine e nome
+    """
+    categorie = list(Categoria.objects.order_by('livello', 'ordine', 'nome_categoria'))
+    conteggi = dict(
+        PezzoRicambio.objects.filter(stato_attivo=True, categoria__isnull=False)
+        .values_list('categoria_id')
+        .annotate(totale=Count('pk'))
+        .order_by()
+    )
+
+    nodi = {
+        categoria.pk: NodoCategoria(categoria=categoria, articoli_diretti=conteggi.get(categoria.pk, 0))
+        for categoria in categorie
+    }
+
+    radici = []
+    for categoria in categorie:
+        padre = nodi.get(categoria.categoria_padre_id)
+        if padre is None:
+            radici.append(nodi[categoria.pk])
+        else:
+            padre.figli.append(nodi[categoria.pk])
+
+    for radice in radici:
+        _somma_sottoalbero(radice)
+        _filtra_figli(radice, stato)
+
+    if stato == 'attivo':
+        radici = [radice for radice in radici if radice.categoria.stato_attivo]
+    elif stato == 'inattivo':
+        radici = [radice for radice in radici if not radice.categoria.stato_attivo]
+
+    return radici
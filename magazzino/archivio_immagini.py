@@ -0,0 +1,250 @@
+"""
+Archivio delle immagini articoli indirizzato per contenuto.
+
+Le rendition di una foto sono salvate una sola volta sotto un percorso
+derivato dall'hash SHA-256 del file caricato:
+    articoli/cas/ab/ab12...ef_large.jpg, ..._thumb.jpg, ..._thumb_medio.webp, ...
+e descritte da una riga ImmagineCondivisa con il numero di articoli che la
+usano (riferimenti).
+
+- acquisisci_immagine(): al caricamento di una foto già presente nell'archivio
+  l'articolo punta subito ai file esistenti, senza elaborazione né spazio in più
+- assegna_immagine_condivisa(): il worker della coda collega l'articolo alle
+  rendition appena generate
+- assegna_immagini_in_blocco(): lo stesso per molti articoli (import massivo)
+- rilascia_immagine(): alla sostituzione/rimozione della foto o alla
+  cancellazione dell'articolo; i file vengono eliminati solo quando nessun
+  articolo li usa più
+
+L'hash è quello del file caricato, non delle rendition elaborate: si calcola
+in pre_save con una sola lettura del file, senza decodificarlo, e così una
+foto già archiviata non entra nemmeno nella coda. Di conseguenza la stessa
+foto caricata con EXIF o codifica diversi è archiviata due volte (le
+rendition di codifiche diverse non sarebbero comunque identiche byte per
+byte): è il prezzo per non decodificare l'immagine nella richiesta.
+
+I contatori sono aggiornati sotto select_for_update sulla riga
+ImmagineCondivisa, quindi acquisizioni e rilasci concorrenti non eliminano
+file ancora in uso. Riallineamento dopo modifiche manuali:
+    python manage.py coda_immagini --ricalcola-riferimenti
+"""
+
+import hashlib
+import logging
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .immagini import elimina_rendition_aggiuntive
+from .models import ImmagineCondivisa, PezzoRicambio
+
+logger = logging.getLogger(__name__)
+
+
+CARTELLA_ARCHIVIO = 'articoli/cas'
+
+
+def calcola_hash(file):
+    """
+    SHA-256 del contenuto di un file (letto a blocchi, posizione ripristinata).
+    Chiave dell'archivio: vedi sopra perché si usa il file caricato e non le rendition.
+    """
+    sha = hashlib.sha256()
+    file.seek(0)
+    for blocco in file.chunks():
+        sha.update(blocco)
+    file.seek(0)
+    return sha.hexdigest()
+
+
+def percorso_base(hash_contenuto):
+    """Prefisso dei file di un'immagine nell'archivio (due livelli per non affollare le cartelle)"""
+    return f"{CARTELLA_ARCHIVIO}/{hash_contenuto[:2]}/{hash_contenuto}"
+
+
+def acquisisci_immagine(hash_contenuto):
+    """
+    Aggiunge un riferimento all'immagine già archiviata con questo hash.
+
+    Returns:
+        ImmagineCondivisa, oppure None se il contenuto non è ancora in archivio
+    """
+    with transaction.atomic():
+        condivisa = ImmagineCondivisa.objects.select_for_update().filter(hash_contenuto=hash_contenuto).first()
+        if condivisa is None:
+            return None
+        ImmagineCondivisa.objects.filter(pk=condivisa.pk).update(riferimenti=F('riferimenti') + 1)
+        condivisa.riferimenti += 1
+    return condivisa
+
+
+def registra_immagine_condivisa(hash_contenuto, nome_immagine, nome_thumbnail, formati, larghezze=''):
+    """
+    Registra le rendition appena generate (senza riferimenti).
+    Se un altro worker ha archiviato lo stesso contenuto per primo restituisce la sua riga:
+    i percorsi dipendono solo dall'hash, quindi i file sono gli stessi.
+    """
+    condivisa, _ = ImmagineCondivisa.objects.get_or_create(
+        hash_contenuto=hash_contenuto,
+        defaults={
+            'nome_immagine': nome_immagine,
+            'nome_thumbnail': nome_thumbnail,
+            'formati': ' '.join(formati),
+            'larghezze': larghezze,
+        }
+    )
+    return condivisa
+
+
+def assegna_immagine_condivisa(articolo_id, nome_originale, hash_contenuto):
+    """
+    Collega l'articolo all'immagine archiviata, se la sua immagine è ancora nome_originale.
+
+    Returns:
+        bool: True se l'articolo è stato aggiornato
+
+    Raises:
+        ImmagineCondivisa.DoesNotExist: l'immagine è stata rilasciata ed eliminata nel frattempo
+    """
+    with transaction.atomic():
+        condivisa = ImmagineCondivisa.objects.select_for_update().get(hash_contenuto=hash_contenuto)
+        # Senza signals: l'immagine non va rielaborata
+        aggiornati = PezzoRicambio.objects.filter(pk=articolo_id, immagine=nome_originale).update(
+            immagine=condivisa.nome_immagine,
+            immagine_thumbnail=condivisa.nome_thumbnail,
+            immagine_condivisa=condivisa,
+            formati_immagine=condivisa.formati,
+            larghezze_immagine=condivisa.larghezze,
+            stato_immagine=PezzoRicambio.IMMAGINE_PRONTA,
+            # update() non applica auto_now: serve ai backup incrementali
+            modificato_il=timezone.now()
+        )
+        if aggiornati:
+            ImmagineCondivisa.objects.filter(pk=condivisa.pk).update(riferimenti=F('riferimenti') + 1)
+        elif condivisa.riferimenti == 0:
+            # Immagine dell'articolo cambiata nel frattempo e contenuto non usato da altri
+            _elimina_condivisa(condivisa)
+    return bool(aggiornati)
+
+
+def _elimina_file(storage, nome_immagine, nome_thumbnail):
+    elimina_rendition_aggiuntive(nome_immagine, nome_thumbnail, storage)
+    for nome in (nome_immagine, nome_thumbnail):
+        if nome:
+            storage.delete(nome)
+
+
+def _elimina_condivisa(condivisa):
+    """Elimina la riga (bloccata dal chiamante) e, dopo il commit, i suoi file"""
+    storage = PezzoRicambio._meta.get_field('immagine').storage
+    nome_immagine, nome_thumbnail = condivisa.nome_immagine, condivisa.nome_thumbnail
+    condivisa.delete()
+    transaction.on_commit(lambda: _elimina_file(storage, nome_immagine, nome_thumbnail))
+    logger.info(f"[IMG_ARCHIVIO] Eliminata immagine non più usata: {nome_immagine}")
+
+
+def rilascia_immagine(condivisa_id):
+    """
+    Toglie un riferimento all'immagine; all'ultimo riferimento elimina riga e file
+    (dopo il commit, così un rollback non lascia articoli senza file).
+    """
+    with transaction.atomic():
+        condivisa = ImmagineCondivisa.objects.select_for_update().filter(pk=condivisa_id).first()
+        if condivisa is None:
+            return
+        if condivisa.riferimenti > 1:
+            ImmagineCondivisa.objects.filter(pk=condivisa.pk).update(riferimenti=F('riferimenti') - 1)
+            return
+
+        _elimina_condivisa(condivisa)
+
+
+def assegna_immagini_in_blocco(assegnazioni):
+    """
+    Collega molti articoli a immagini già archiviate con un solo bulk_update,
+    rilasciando (o eliminando, se fuori archivio) le loro immagini precedenti.
+
+    Args:
+        assegnazioni: dict articolo_id -> hash_contenuto
+
+    Returns:
+        int: articoli aggiornati (quelli che avevano già l'immagine non vengono toccati)
+    """
+    condivise = {
+        condivisa.hash_contenuto: condivisa
+        for condivisa in ImmagineCondivisa.objects.filter(hash_contenuto__in=set(assegnazioni.values()))
+    }
+    storage = PezzoRicambio._meta.get_field('immagine').storage
+    aggiornati = []
+    incrementi = Counter()
+    da_rilasciare = []
+    file_da_eliminare = []
+
+    with transaction.atomic():
+        # Immagini condivise bloccate per prime, come in acquisisci/rilascia
+        list(ImmagineCondivisa.objects.select_for_update().filter(
+            pk__in=[condivisa.pk for condivisa in condivise.values()]
+        ).order_by('pk').values_list('pk', flat=True))
+
+        for articolo in PezzoRicambio.objects.select_for_update().filter(pk__in=assegnazioni).order_by('pk'):
+            condivisa = condivise.get(assegnazioni[articolo.pk])
+            if condivisa is None or articolo.immagine_condivisa_id == condivisa.pk:
+                continue
+            if articolo.immagine_condivisa_id:
+                da_rilasciare.append(articolo.immagine_condivisa_id)
+            elif articolo.immagine:
+                file_da_eliminare.append((articolo.immagine.name, articolo.immagine_thumbnail.name))
+
+            articolo.immagine = condivisa.nome_immagine
+            articolo.immagine_thumbnail = condivisa.nome_thumbnail
+            articolo.immagine_condivisa = condivisa
+            articolo.formati_immagine = condivisa.formati
+            articolo.larghezze_immagine = condivisa.larghezze
+            articolo.stato_immagine = PezzoRicambio.IMMAGINE_PRONTA
+            articolo.modificato_il = timezone.now()
+            aggiornati.append(articolo)
+            incrementi[condivisa.pk] += 1
+
+        PezzoRicambio.objects.bulk_update(
+            aggiornati,
+            [
+                'immagine', 'immagine_thumbnail', 'immagine_condivisa', 'formati_immagine', 'larghezze_immagine',
+                'stato_immagine', 'modificato_il',
+            ],
+            batch_size=500
+        )
+        for condivisa_id, numero in incrementi.items():
+            ImmagineCondivisa.objects.filter(pk=condivisa_id).update(riferimenti=F('riferimenti') + numero)
+        for condivisa_id in da_rilasciare:
+            rilascia_immagine(condivisa_id)
+
+        if file_da_eliminare:
+            transaction.on_commit(lambda: [_elimina_file(storage, *nomi) for nomi in file_da_eliminare])
+
+    return len(aggiornati)
+
+
+def ricalcola_riferimenti():
+    """
+    Riallinea i contatori al numero reale di articoli collegati ed elimina
+    le immagini non più usate.
+
+    Returns:
+        int: immagini eliminate
+    """
+    ImmagineCondivisa.objects.update(
+        riferimenti=Coalesce(
+            Subquery(
+                PezzoRicambio.objects.filter(immagine_condivisa=OuterRef('pk'))
+                .values('immagine_condivisa').annotate(totale=Count('pk')).values('totale')
+            ),
+            Value(0)
+        )
+    )
+    orfane = list(ImmagineCondivisa.objects.filter(riferimenti=0).values_list('pk', flat=True))
+    for pk in orfane:
+        rilascia_immagine(pk)
+    return len(orfane)
@@ -2,18 +2,286 @@
 Utility per la gestione dei backup del database MySQL.
 """
 
+import functools
+import json
 import os
+import re
 import subprocess
 import gzip
-import shutil
-from datetime import datetime, timedelta
+import tarfile
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
 import logging
 from django.conf import settings
 
+from .catalogo_backup import (
+    CatalogoBackup, LetturaConHash, ScritturaConHash, sha256_file, timestamp_da_nome, voce_da_manifest
+)
+
+try:
+    import zstandard
+except ImportError:  # compressione zstd opzionale: pip install zstandard
+    zstandard = None
+
 logger = logging.getLogger(__name__)
 
 
+# Estensione dei file di backup per formato di compressione
+ESTENSIONI_BACKUP = {
+    'gzip': '.sql.gz',
+    'zstd': '.sql.zst',
+}
+
+# Backup parallelo per tabella (backup_parallelo.py): archivio tar con un file compresso per tabella
+ESTENSIONE_PARALLELO = '.tar'
+# Backup incrementali: backup_<db>_<timestamp>_inc.tar
+SUFFISSO_INCREMENTALE = '_inc'
+ESTENSIONI_ARCHIVIO = tuple(ESTENSIONI_BACKUP.values()) + (ESTENSIONE_PARALLELO,)
+
+# Blocchi letti dallo stdout di mysqldump e scritti nel compressore
+BLOCCO_STREAMING = 1024 * 1024
+
+MESSAGGIO_OCCUPATO = "Un altro backup, ripristino o pulizia è in corso: riprova al termine"
+
+# Tabelle mai salvate né ripristinate: lo stato dei lavori di backup non deve tornare indietro con un restore
+TABELLE_ESCLUSE = ('lavori_backup',)
+
+# Ultima riga di un mysqldump arrivato in fondo e di ogni file del backup parallelo
+FINE_MYSQLDUMP = b'-- Dump completed'
+FINE_TABELLA_PARALLELO = b'COMMIT;\n'
+
+
+def formato_da_nome(nome_file):
+    """Formato del backup dal nome del file: gzip, zstd, parallelo o incrementale"""
+    if nome_file.endswith(SUFFISSO_INCREMENTALE + ESTENSIONE_PARALLELO):
+        return 'incrementale'
+    if nome_file.endswith(ESTENSIONE_PARALLELO):
+        return 'parallelo'
+    return 'zstd' if nome_file.endswith(ESTENSIONI_BACKUP['zstd']) else 'gzip'
+
+
+def zstd_disponibile():
+    """True se il modulo zstandard è installato"""
+    return zstandard is not None
+
+
+def apri_compressore(file_out, formato, livello, multithread=True):
+    """
+    Writer che comprime in file_out (aperto in binario) nel formato richiesto.
+    Chiudendo il writer si chiude lo stream compresso (trailer gzip / frame zstd).
+    """
+    if formato == 'zstd':
+        # threads=-1: compressione su tutti i core mentre mysqldump continua a scrivere
+        # write_checksum: la verifica dei backup rileva i frame corrotti, come il CRC di gzip
+        return zstandard.ZstdCompressor(
+            level=livello, threads=-1 if multithread else 0, write_checksum=True
+        ).stream_writer(file_out)
+    # filename vuoto: nessun nome (del file .partial) nell'header gzip
+    return gzip.GzipFile(filename='', mode='wb', compresslevel=min(livello, 9), fileobj=file_out)
+
+
+def apri_backup(backup_path, file_in=None):
+    """
+    Apre un file di backup (.sql.gz o .sql.zst) restituendo lo stream SQL decompresso.
+    
+    Args:
+        file_in: file compresso già aperto in binario (resta a carico del chiamante),
+                 per misurare con tell() i byte compressi consumati
+    """
+    zstd = Path(backup_path).suffix == '.zst'
+    if zstd and zstandard is None:
+        raise RuntimeError("Backup in formato zstd: installa il modulo zstandard per leggerlo")
+    if file_in is None:
+        if zstd:
+            return zstandard.ZstdDecompressor().stream_reader(open(backup_path, 'rb'), closefd=True)
+        return gzip.open(backup_path, 'rb')
+    if zstd:
+        return zstandard.ZstdDecompressor().stream_reader(file_in, closefd=False)
+    return gzip.GzipFile(fileobj=file_in, mode='rb')
+
+
+class _AvanzamentoRestore:
+    """Somma i byte compressi consumati (anche da più thread), li notifica e li logga ogni 10%"""
+    
+    def __init__(self, filename, byte_totali, progresso=None):
+        self.filename = filename
+        self.byte_totali = byte_totali
+        self.progresso = progresso
+        self._letti = {}
+        self._ultimo_decimo = 0
+        self._lock = threading.Lock()
+    
+    def aggiorna(self, membro, letti):
+        with self._lock:
+            self._letti[membro] = letti
+            totale_letti = min(sum(self._letti.values()), self.byte_totali)
+            if self.progresso:
+                self.progresso(totale_letti, self.byte_totali)
+            decimo = totale_letti * 10 // max(self.byte_totali, 1)
+            if decimo > self._ultimo_decimo:
+                self._ultimo_decimo = decimo
+                logger.info(f"Restore {self.filename}: {decimo * 10}%")
+
+
+def _esclusivo(*esito_occupato):
+    """
+    Decoratore dei metodi di BackupManager che non devono sovrapporsi:
+    se un'altra operazione tiene il lock (vedi _operazione_esclusiva) il
+    metodo non viene eseguito e restituisce esito_occupato.
+    """
+    def decoratore(metodo):
+        @functools.wraps(metodo)
+        def eseguito(self, *args, **kwargs):
+            with self._operazione_esclusiva() as preso:
+                if not preso:
+                    logger.warning(f"{metodo.__name__}: {MESSAGGIO_OCCUPATO}")
+                    return esito_occupato
+                return metodo(self, *args, **kwargs)
+        return eseguito
+    return decoratore
+
+
+class _TempiTabelle:
+    """
+    Tempo e byte di caricamento per tabella di un dump mysqldump, dai commenti
+    '-- Table structure for table' che precedono ogni tabella. Il client mysql
+    legge dalla pipe man mano che esegue, quindi il momento in cui un blocco
+    viene scritto approssima (a meno di un blocco) quello in cui viene eseguito.
+    """
+    
+    MARCATORE = re.compile(rb'-- Table structure for table `([^`]+)`')
+    
+    def __init__(self, tempi):
+        self.tempi = tempi
+        self._corrente = None
+        self._inizio = None
+        self._coda = b''
+    
+    def _aggiungi(self, byte):
+        if self._corrente is not None:
+            self.tempi[self._corrente]['byte_sql'] += byte
+    
+    def _chiudi(self, adesso):
+        if self._corrente is not None:
+            self.tempi[self._corrente]['secondi'] += adesso - self._inizio
+    
+    def osserva(self, blocco):
+        adesso = time.monotonic()
+        # La coda del blocco precedente trova i marcatori spezzati tra due blocchi
+        dati = self._coda + blocco
+        inizio_blocco = len(self._coda)
+        posizione = 0
+        for marcatore in self.MARCATORE.finditer(dati):
+            if marcatore.end() <= inizio_blocco:
+                continue
+            fine = max(marcatore.start() - inizio_blocco, 0)
+            self._aggiungi(fine - posizione)
+            posizione = fine
+            self._chiudi(adesso)
+            self._corrente = marcatore.group(1).decode('utf-8', errors='replace')
+            self._inizio = adesso
+            self.tempi.setdefault(self._corrente, {'secondi': 0.0, 'byte_sql': 0})
+        self._aggiungi(len(blocco) - posizione)
+        self._coda = dati[-200:]
+    
+    def termina(self):
+        self._chiudi(time.monotonic())
+        self._corrente = None
+
+
+class _RigheSnapshot:
+    """
+    Righe per tabella nello stesso snapshot del dump mysqldump, registrate nel
+    catalogo e confrontate dalla verifica con test-restore: un dump che si
+    ferma prima della fine risulta con meno righe del database di partenza.
+
+    Come nel backup parallelo (backup_parallelo.py) le scritture restano
+    bloccate da prima dell'avvio di mysqldump finché il dump non arriva alla
+    prima tabella, quando la sua transazione --single-transaction è già
+    aperta; nel frattempo una seconda connessione apre il proprio snapshot,
+    uguale a quello del dump, e a dump finito conta le righe. Se mysqldump
+    non arriva alla prima tabella entro TIMEOUT_SNAPSHOT le scritture
+    vengono sbloccate e le righe non sono registrate.
+    """
+    
+    def __init__(self, credenziali):
+        from .backup_parallelo import TIMEOUT_SNAPSHOT, _blocca_scritture, _connetti, _elenca_tabelle
+        
+        self._contatore = None
+        self._scadenza = None
+        self._bloccato = False
+        self._lock = threading.Lock()
+        self._coda = b''
+        self.consistente = True
+        self._coordinatore = _connetti(credenziali)
+        try:
+            self.tabelle, _ = _elenca_tabelle(self._coordinatore, credenziali['database'])
+            self._contatore = _connetti(credenziali)
+            with self._coordinatore.cursor() as cursor:
+                # Una transazione lunga non deve tenere ferme a lungo le scritture in coda al lock
+                cursor.execute("SET SESSION lock_wait_timeout = %s", [TIMEOUT_SNAPSHOT])
+            self.blocco = _blocca_scritture(self._coordinatore, self.tabelle)
+            self._bloccato = True
+            with self._contatore.cursor() as cursor:
+                cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+        except BaseException:
+            self.chiudi()
+            raise
+        self._scadenza = threading.Timer(TIMEOUT_SNAPSHOT, self._scaduto)
+        self._scadenza.daemon = True
+        self._scadenza.start()
+    
+    def _sblocca(self):
+        with self._lock:
+            if self._bloccato:
+                self._bloccato = False
+                with self._coordinatore.cursor() as cursor:
+                    cursor.execute("UNLOCK TABLES")
+    
+    def _scaduto(self):
+        if self._bloccato:
+            logger.warning("mysqldump non ha aperto lo snapshot in tempo: righe per tabella non registrate")
+            self.consistente = False
+            self._sblocca()
+    
+    def osserva(self, blocco):
+        """Sblocca le scritture al primo blocco che contiene l'inizio di una tabella"""
+        if not self._bloccato:
+            return
+        dati = self._coda + blocco
+        if _TempiTabelle.MARCATORE.search(dati):
+            self._sblocca()
+        self._coda = dati[-200:]
+    
+    def conta(self):
+        """Righe di ogni tabella nello snapshot del dump, None se lo snapshot non è quello del dump"""
+        self._sblocca()
+        if not self.consistente:
+            return None
+        righe = {}
+        with self._contatore.cursor() as cursor:
+            for tabella in self.tabelle:
+                cursor.execute(f"SELECT COUNT(*) FROM `{tabella}`")
+                righe[tabella] = cursor.fetchone()[0]
+        return righe
+    
+    def chiudi(self):
+        if self._scadenza is not None:
+            self._scadenza.cancel()
+        try:
+            self._sblocca()
+        finally:
+            for connessione in (self._contatore, self._coordinatore):
+                if connessione is not None:
+                    connessione.close()
+
+
 class BackupManager:
     """Gestione backup del database"""
     
@@ -27,9 +295,42 @@ class BackupManager:
         )
         self.retention_days = int(Configurazione.get_value('backup_retention_days', 30))  # type: ignore
         self.mysql_bin_path = str(Configurazione.get_value('mysql_bin_path', r'C:\xampp\mysql\bin'))  # type: ignore
+        self.compressione = str(Configurazione.get_value(
+            'backup_compressione', getattr(settings, 'BACKUP_COMPRESSIONE', 'gzip')
+        ))
+        self.livello_compressione = int(Configurazione.get_value(  # type: ignore
+            'backup_livello_compressione', getattr(settings, 'BACKUP_LIVELLO_COMPRESSIONE', 6)
+        ))
+        
+        self.parallelo = bool(Configurazione.get_value(
+            'backup_parallelo', getattr(settings, 'BACKUP_PARALLELO', False)
+        ))
+        self.processi = int(Configurazione.get_value(  # type: ignore
+            'backup_processi', getattr(settings, 'BACKUP_PROCESSI', 4)
+        ))
+        
+        # Conservazione nonno-padre-figlio: quanti backup tenere per ora, giorno, settimana, mese
+        self.politica_conservazione = {
+            'orario': int(Configurazione.get_value(  # type: ignore
+                'backup_conserva_orari', getattr(settings, 'BACKUP_CONSERVA_ORARI', 24)
+            )),
+            'giornaliero': self.retention_days,
+            'settimanale': int(Configurazione.get_value(  # type: ignore
+                'backup_conserva_settimanali', getattr(settings, 'BACKUP_CONSERVA_SETTIMANALI', 8)
+            )),
+            'mensile': int(Configurazione.get_value(  # type: ignore
+                'backup_conserva_mensili', getattr(settings, 'BACKUP_CONSERVA_MENSILI', 12)
+            )),
+        }
+        
+        # Statistiche dell'ultimo create_backup (byte, durata, throughput)
+        self.statistiche_backup = None
+        # Lock di _operazione_esclusiva già preso da questa istanza
+        self._lock_preso = False
         
         # Crea directory backup se non esiste
         self.backup_dir.mkdir(parents=True, exist_ok=True)
+        self.catalogo = CatalogoBackup(self.backup_dir)
         
         # Credenziali database da settings
         db_settings = settings.DATABASES['default']
@@ -38,21 +339,149 @@ class BackupManager:
         self.db_password = db_settings['PASSWORD']
         self.db_host = db_settings.get('HOST', 'localhost')
         self.db_port = db_settings.get('PORT', '3306')
+        # Database usa e getta per i test-restore della verifica
+        self.schema_verifica = getattr(settings, 'BACKUP_SCHEMA_VERIFICA', f'{self.db_name}_verifica')
+    
+    @contextmanager
+    def _operazione_esclusiva(self):
+        """
+        Un solo backup, ripristino o pulizia alla volta, anche tra processi
+        diversi (pagina web, pianificatore, comandi): lock con nome di MySQL,
+        rilasciato dal server anche se il processo termina. Le chiamate
+        annidate della stessa istanza (create_backup -> create_backup_parallelo)
+        riusano il lock già preso.
+        
+        Yields:
+            bool: False se un'altra operazione è in corso
+        """
+        if self._lock_preso:
+            yield True
+            return
+        
+        from django.db import connection
+        
+        nome_lock = f"{self.db_name}_backup"
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT GET_LOCK(%s, 0)", [nome_lock])
+                preso = cursor.fetchone()[0] == 1
+        except Exception as e:
+            # Database non raggiungibile: l'operazione fallirà o servirà comunque (restore d'emergenza)
+            logger.warning(f"Lock dei backup non disponibile: {e}")
+            yield True
+            return
+        
+        if not preso:
+            yield False
+            return
+        self._lock_preso = True
+        try:
+            yield True
+        finally:
+            self._lock_preso = False
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT RELEASE_LOCK(%s)", [nome_lock])
+            except Exception as e:
+                logger.warning(f"Rilascio del lock dei backup non riuscito: {e}")
+    
+    def _credenziali(self):
+        """Credenziali di connessione per i processi del backup parallelo"""
+        return {
+            'host': self.db_host,
+            'port': self.db_port,
+            'user': self.db_user,
+            'password': self.db_password,
+            'database': self.db_name,
+        }
+    
+    def _formato_compressione(self):
+        formato = self.compressione if self.compressione in ESTENSIONI_BACKUP else 'gzip'
+        if formato == 'zstd' and not zstd_disponibile():
+            logger.warning("Modulo zstandard non installato: backup compresso in gzip")
+            formato = 'gzip'
+        return formato
+    
+    def _registra_statistiche(self, formato, byte_dump, byte_compressi, durata, **altre):
+        """Salva le statistiche dell'ultimo backup e restituisce il riepilogo per messaggi e log"""
+        self.statistiche_backup = {
+            'formato': formato,
+            'livello': self.livello_compressione,
+            'byte_dump': byte_dump,
+            'byte_compressi': byte_compressi,
+            'durata_secondi': durata,
+            'mb_al_secondo': byte_dump / (1024 * 1024) / max(durata, 0.001),
+            **altre,
+        }
+        return (
+            f"{byte_compressi / (1024 * 1024):.2f} MB, dump {byte_dump / (1024 * 1024):.2f} MB in {durata:.1f}s, "
+            f"{self.statistiche_backup['mb_al_secondo']:.1f} MB/s"
+        )
     
-    def create_backup(self):
+    def _registra_nel_catalogo(self, backup_path, sha256, manifest=None, righe=None):
+        """
+        Aggiunge al catalogo il backup appena creato, con le statistiche di
+        _registra_statistiche e le righe per tabella (dal manifest per i
+        backup paralleli, da _RigheSnapshot per mysqldump)
+        """
+        statistiche = self.statistiche_backup
+        voce = {
+            'filename': backup_path.name,
+            'formato': formato_da_nome(backup_path.name),
+            'tipo': 'completo',
+            'creato_il': (timestamp_da_nome(backup_path.name) or datetime.now()).isoformat(timespec='seconds'),
+            'byte': statistiche['byte_compressi'],
+            'sha256': sha256,
+            'compressione': statistiche['formato'],
+            'livello': statistiche['livello'],
+            'byte_sql': statistiche['byte_dump'],
+            'righe': righe,
+        }
+        if manifest is not None:
+            voce.update(voce_da_manifest(manifest))
+        # Durata misurata dal manager (comprende la scrittura del tar)
+        voce['durata_secondi'] = round(statistiche['durata_secondi'], 3)
+        try:
+            self.catalogo.registra(voce)
+        except Exception as e:
+            # Il backup è valido comunque: il catalogo si può ricostruire
+            logger.error(f"Backup {backup_path.name} non registrato nel catalogo: {e}")
+    
+    @_esclusivo(False, None, MESSAGGIO_OCCUPATO)
+    def create_backup(self, parallelo=None, progresso=None):
         """
         Crea un nuovo backup compresso del database.
         
+        L'output di mysqldump passa in streaming dal compressore al file finale:
+        nessun dump non compresso su disco. Il file viene scritto come .partial
+        e rinominato solo a dump riuscito, quindi list_backups non vede mai
+        backup incompleti.
+        
+        Args:
+            parallelo: True per il backup per tabella in parallelo (backup_parallelo.py),
+                       None per usare l'impostazione backup_parallelo
+            progresso: callable(byte_scritti, tabelle_completate) opzionale,
+                       chiamata a ogni blocco scritto nel backup
+        
         Returns:
             tuple: (success: bool, filepath: Path, message: str)
         """
+        if parallelo is None:
+            parallelo = self.parallelo
+        if parallelo:
+            return self.create_backup_parallelo(progresso=progresso)
+        
+        parziale = None
         try:
+            formato = self._formato_compressione()
+            
             # Nome file con timestamp
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_filename = f'backup_{self.db_name}_{timestamp}.sql'
+            backup_filename = f'backup_{self.db_name}_{timestamp}{ESTENSIONI_BACKUP[formato]}'
             backup_path = self.backup_dir / backup_filename
+            parziale = backup_path.with_name(backup_filename + '.partial')
             
-            logger.info(f"Creazione backup: {backup_filename}")
+            logger.info(f"Creazione backup: {backup_filename} ({formato}, livello {self.livello_compressione})")
             
             # Percorso mysqldump dal database o settings
             mysqldump_exe = os.path.join(str(self.mysql_bin_path), 'mysqldump.exe')
@@ -77,38 +506,77 @@ class BackupManager:
                 '--create-options',           # Include opzioni CREATE TABLE
                 '--disable-keys',             # Ottimizzazione import con ALTER TABLE DISABLE KEYS
                 '--lock-tables=false',        # Non bloccare tabelle (single-transaction già gestisce)
+                *(f'--ignore-table={self.db_name}.{tabella}' for tabella in TABELLE_ESCLUSE),
                 self.db_name
             ]
             
-            # Esegui mysqldump
-            with open(backup_path, 'w', encoding='utf-8') as f:
-                result = subprocess.run(
-                    cmd,
-                    stdout=f,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
+            inizio = time.monotonic()
+            byte_dump = 0
+            # Tabelle già scritte, dai commenti di mysqldump
+            tabelle = {}
+            osservatore = _TempiTabelle(tabelle) if progresso else None
+            
+            # Righe per tabella nello snapshot del dump, per la verifica con test-restore
+            try:
+                snapshot = _RigheSnapshot(self._credenziali())
+            except Exception as e:
+                # Il backup si fa comunque: la verifica non potrà confrontare le righe
+                logger.warning(f"Righe per tabella non registrate nel backup: {e}")
+                snapshot = None
+            righe = None
+            
+            try:
+                # stderr su file temporaneo: una PIPE non letta bloccherebbe mysqldump se si riempie
+                with tempfile.TemporaryFile() as stderr_file, open(parziale, 'wb') as file_out:
+                    # SHA-256 calcolato durante la scrittura, per il catalogo
+                    file_hash = ScritturaConHash(file_out)
+                    processo = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file)
+                    try:
+                        with apri_compressore(file_hash, formato, self.livello_compressione) as compresso:
+                            for blocco in iter(lambda: processo.stdout.read(BLOCCO_STREAMING), b''):
+                                compresso.write(blocco)
+                                byte_dump += len(blocco)
+                                if snapshot:
+                                    snapshot.osserva(blocco)
+                                if osservatore:
+                                    osservatore.osserva(blocco)
+                                    progresso(file_hash.byte, max(len(tabelle) - 1, 0))
+                    except BaseException:
+                        processo.kill()
+                        raise
+                    finally:
+                        processo.stdout.close()
+                        returncode = processo.wait()
+                    
+                    stderr_file.seek(0)
+                    error_msg = stderr_file.read().decode('utf-8', errors='replace')
+                
+                if snapshot and returncode == 0:
+                    try:
+                        righe = snapshot.conta()
+                    except Exception as e:
+                        logger.warning(f"Righe per tabella non registrate nel backup: {e}")
+            finally:
+                if snapshot:
+                    snapshot.chiudi()
             
-            if result.returncode != 0:
-                error_msg = result.stderr
+            if returncode != 0:
                 logger.error(f"Errore mysqldump: {error_msg}")
                 return False, None, f"Errore durante il backup: {error_msg}"
             
-            # Comprimi con gzip
-            compressed_path = backup_path.with_suffix('.sql.gz')
-            with open(backup_path, 'rb') as f_in:
-                with gzip.open(compressed_path, 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-            
-            # Rimuovi file non compresso
-            backup_path.unlink()
+            os.replace(parziale, backup_path)
+            parziale = None
+            if progresso:
+                progresso(file_hash.byte, len(tabelle))
             
-            # Dimensione file
-            size_mb = compressed_path.stat().st_size / (1024 * 1024)
+            riepilogo = self._registra_statistiche(
+                formato, byte_dump, backup_path.stat().st_size, time.monotonic() - inizio
+            )
+            self._registra_nel_catalogo(backup_path, file_hash.hexdigest(), righe=righe)
             
-            logger.info(f"Backup creato: {compressed_path.name} ({size_mb:.2f} MB)")
+            logger.info(f"Backup creato: {backup_path.name} ({riepilogo})")
             
-            return True, compressed_path, f"Backup creato con successo ({size_mb:.2f} MB)"
+            return True, backup_path, f"Backup creato con successo ({riepilogo})"
             
         except FileNotFoundError:
             error_msg = "mysqldump non trovato. Assicurati che MySQL sia installato e nel PATH."
@@ -119,51 +587,209 @@ class BackupManager:
             error_msg = f"Errore durante il backup: {str(e)}"
             logger.error(error_msg, exc_info=True)
             return False, None, error_msg
+        
+        finally:
+            # Dump fallito o interrotto: niente file a metà nella cartella backup
+            if parziale is not None and parziale.exists():
+                parziale.unlink()
+    
+    @_esclusivo(False, None, MESSAGGIO_OCCUPATO)
+    def create_backup_parallelo(self, processi=None, progresso=None):
+        """
+        Crea un backup per tabella: ogni tabella è esportata in parallelo nel
+        proprio file compresso, da un unico snapshot consistente, e raccolta
+        con un manifest in un archivio .tar (vedi backup_parallelo.py).
+        
+        Args:
+            progresso: callable(byte_scritti, tabelle_completate) opzionale,
+                       chiamata al termine di ogni tabella
+        
+        Returns:
+            tuple: (success: bool, filepath: Path, message: str)
+        """
+        from .backup_parallelo import crea_archivio_parallelo
+        
+        try:
+            formato = self._formato_compressione()
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            backup_path = self.backup_dir / f'backup_{self.db_name}_{timestamp}{ESTENSIONE_PARALLELO}'
+            processi = processi or self.processi
+            
+            logger.info(f"Creazione backup parallelo: {backup_path.name} ({formato}, {processi} processi)")
+            
+            inizio = time.monotonic()
+            manifest = crea_archivio_parallelo(
+                self._credenziali(), str(backup_path), formato, self.livello_compressione, processi,
+                progresso=progresso
+            )
+            
+            riepilogo = self._registra_statistiche(
+                formato,
+                sum(voce['byte_sql'] for voce in manifest['tabelle']),
+                backup_path.stat().st_size,
+                time.monotonic() - inizio,
+                tabelle=len(manifest['tabelle']),
+                righe=sum(voce['righe'] for voce in manifest['tabelle']),
+            )
+            riepilogo += f", {len(manifest['tabelle'])} tabelle con {processi} processi"
+            self._registra_nel_catalogo(backup_path, sha256_file(backup_path), manifest)
+            
+            logger.info(f"Backup creato: {backup_path.name} ({riepilogo})")
+            
+            return True, backup_path, f"Backup creato con successo ({riepilogo})"
+            
+        except ImportError:
+            error_msg = "Modulo pymysql non disponibile: necessario per il backup parallelo."
+            logger.error(error_msg)
+            return False, None, error_msg
+            
+        except Exception as e:
+            error_msg = f"Errore durante il backup: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            return False, None, error_msg
+    
+    def _ultimo_backup_catena(self, solo_completi=False):
+        """Backup parallelo più recente utilizzabile come precedente di un incrementale"""
+        from .backup_parallelo import BACKUP_COMPLETO
+        
+        for backup in self.list_backups():
+            if backup['formato'] not in ('parallelo', 'incrementale'):
+                continue
+            if backup['versione_manifest'] < 2:
+                # Backup parallelo senza high-water mark: la catena deve ripartire da un completo
+                return None
+            if not solo_completi or backup['tipo'] == BACKUP_COMPLETO:
+                return backup['filepath']
+        return None
+    
+    @_esclusivo(False, None, MESSAGGIO_OCCUPATO)
+    def create_backup_incrementale(self, differenziale=False, processi=None, progresso=None):
+        """
+        Crea un backup incrementale: solo righe modificate e cancellazioni dal
+        backup parallelo precedente (vedi backup_parallelo.py). Se non esiste
+        un backup parallelo completo da cui partire ne crea uno.
+        
+        Args:
+            differenziale: True per partire sempre dall'ultimo backup completo
+                           (catena di due anelli, incrementale più grande)
+            progresso: come per create_backup_parallelo
+        
+        Returns:
+            tuple: (success: bool, filepath: Path, message: str)
+        """
+        from .backup_parallelo import crea_archivio_parallelo
+        
+        try:
+            precedente = self._ultimo_backup_catena(solo_completi=differenziale)
+            if precedente is None:
+                logger.info("Nessun backup parallelo completo da cui partire: creazione backup completo")
+                return self.create_backup_parallelo(processi, progresso)
+            
+            formato = self._formato_compressione()
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            backup_path = self.backup_dir / (
+                f'backup_{self.db_name}_{timestamp}{SUFFISSO_INCREMENTALE}{ESTENSIONE_PARALLELO}'
+            )
+            processi = processi or self.processi
+            
+            logger.info(f"Creazione backup incrementale: {backup_path.name} (precedente {precedente.name})")
+            
+            inizio = time.monotonic()
+            manifest = crea_archivio_parallelo(
+                self._credenziali(), str(backup_path), formato, self.livello_compressione, processi,
+                precedente=str(precedente), progresso=progresso
+            )
+            
+            righe = sum(voce['righe'] for voce in manifest['tabelle'])
+            eliminate = sum(voce['eliminate'] for voce in manifest['tabelle'])
+            riepilogo = self._registra_statistiche(
+                formato,
+                sum(voce['byte_sql'] for voce in manifest['tabelle']),
+                backup_path.stat().st_size,
+                time.monotonic() - inizio,
+                tabelle=len(manifest['tabelle']),
+                righe=righe,
+                eliminate=eliminate,
+            )
+            riepilogo += f", {righe} righe modificate e {eliminate} cancellate dopo {precedente.name}"
+            self._registra_nel_catalogo(backup_path, sha256_file(backup_path), manifest)
+            
+            logger.info(f"Backup creato: {backup_path.name} ({riepilogo})")
+            
+            return True, backup_path, f"Backup incrementale creato con successo ({riepilogo})"
+            
+        except ImportError:
+            error_msg = "Modulo pymysql non disponibile: necessario per il backup incrementale."
+            logger.error(error_msg)
+            return False, None, error_msg
+            
+        except Exception as e:
+            error_msg = f"Errore durante il backup: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            return False, None, error_msg
+    
+    def catena_backup(self, filename):
+        """
+        Backup da ripristinare in ordine per arrivare a filename: per un
+        incrementale il backup completo di base e tutti gli anelli successivi.
+        
+        Returns:
+            list: nomi file, dal completo a filename
+        
+        Raises:
+            FileNotFoundError: manca un backup della catena
+        """
+        from .backup_parallelo import BACKUP_INCREMENTALE, leggi_manifest
+        
+        catena = [filename]
+        if not filename.endswith(ESTENSIONE_PARALLELO):
+            return catena
+        
+        manifest = leggi_manifest(self.backup_dir / filename)
+        while manifest.get('tipo') == BACKUP_INCREMENTALE:
+            precedente = manifest['precedente']
+            if not (self.backup_dir / precedente).exists():
+                raise FileNotFoundError(f"Backup {precedente} della catena di {filename} non trovato")
+            catena.insert(0, precedente)
+            manifest = leggi_manifest(self.backup_dir / precedente)
+        return catena
+    
+    def _backup_dipendenti(self, filename):
+        """Backup incrementali costruiti direttamente su filename"""
+        return [
+            backup['filename'] for backup in self.list_backups()
+            if backup['formato'] == 'incrementale' and backup['precedente'] == filename
+        ]
     
     def list_backups(self):
         """
-        Lista tutti i backup disponibili.
+        Lista tutti i backup disponibili, dal catalogo (nessuna scansione della cartella).
         
         Returns:
             list: Lista di dict con info sui backup
         """
+        adesso = datetime.now()
         backups = []
-        
-        # Pattern più flessibile per catturare tutti i backup
-        for backup_file in sorted(self.backup_dir.glob('backup_*.sql.gz'), reverse=True):
-            try:
-                # Estrai timestamp dal nome (backup_GMR_20251205_235438.sql.gz)
-                parts = backup_file.stem.replace('.sql', '').split('_')
-                # Cerca gli ultimi due elementi che sembrano data e ora
-                date_str = None
-                time_str = None
-                
-                for i in range(len(parts) - 1, 0, -1):
-                    if len(parts[i]) == 6 and parts[i].isdigit():  # HHMMSS
-                        time_str = parts[i]
-                        if i > 0 and len(parts[i-1]) == 8 and parts[i-1].isdigit():  # YYYYMMDD
-                            date_str = parts[i-1]
-                            break
-                
-                if date_str and time_str:
-                    timestamp = datetime.strptime(f"{date_str}_{time_str}", '%Y%m%d_%H%M%S')
-                else:
-                    timestamp = datetime.fromtimestamp(backup_file.stat().st_mtime)
-                
-                # Info file
-                size_mb = backup_file.stat().st_size / (1024 * 1024)
-                
-                backups.append({
-                    'filename': backup_file.name,
-                    'filepath': backup_file,
-                    'timestamp': timestamp,
-                    'size_mb': size_mb,
-                    'age_days': (datetime.now() - timestamp).days
-                })
-                
-            except Exception as e:
-                logger.warning(f"Errore lettura backup {backup_file}: {e}")
-        
+        for voce in self.catalogo.voci():
+            timestamp = datetime.fromisoformat(voce['creato_il'])
+            backups.append({
+                'filename': voce['filename'],
+                'filepath': self.backup_dir / voce['filename'],
+                'timestamp': timestamp,
+                'size_mb': voce['byte'] / (1024 * 1024),
+                'age_days': (adesso - timestamp).days,
+                'formato': voce['formato'],
+                'tipo': voce.get('tipo', 'completo'),
+                'versione_manifest': voce.get('versione_manifest', 1),
+                'precedente': voce.get('precedente'),
+                'sha256': voce.get('sha256'),
+                'durata_secondi': voce.get('durata_secondi'),
+                'righe': voce.get('righe'),
+                'righe_totali': sum(voce['righe'].values()) if voce.get('righe') else None,
+                'verifica': dict(
+                    voce['verifica'], data=datetime.fromisoformat(voce['verifica']['data'])
+                ) if voce.get('verifica') else None,
+            })
         return backups
     
     def delete_backup(self, filename):
@@ -179,14 +805,22 @@ class BackupManager:
         try:
             backup_path = self.backup_dir / filename
             
+            # Verifica che sia un file di backup valido
+            if not backup_path.name.startswith('backup_') or not backup_path.name.endswith(ESTENSIONI_ARCHIVIO):
+                return False, "File non valido"
+            
             if not backup_path.exists():
+                # Eliminato a mano: basta toglierlo dal catalogo
+                self.catalogo.rimuovi(backup_path.name)
                 return False, "File non trovato"
             
-            # Verifica che sia un file di backup valido
-            if not backup_path.name.startswith('backup_') or not backup_path.suffix == '.gz':
-                return False, "File non valido"
+            if backup_path.suffix == ESTENSIONE_PARALLELO:
+                dipendenti = self._backup_dipendenti(backup_path.name)
+                if dipendenti:
+                    return False, f"Backup necessario alla catena incrementale di {', '.join(dipendenti)}"
             
             backup_path.unlink()
+            self.catalogo.rimuovi(backup_path.name)
             logger.info(f"Backup eliminato: {filename}")
             
             return True, "Backup eliminato con successo"
@@ -196,24 +830,37 @@ class BackupManager:
             logger.error(error_msg)
             return False, error_msg
     
+    @_esclusivo(0, MESSAGGIO_OCCUPATO)
     def cleanup_old_backups(self):
         """
-        Elimina backup più vecchi di retention_days.
+        Applica la conservazione nonno-padre-figlio (politica_conservazione):
+        per ogni ora, giorno, settimana e mese degli ultimi N resta il backup
+        più recente, più i backup su cui si basano gli incrementali conservati.
+        Gli altri vengono eliminati in un solo passaggio sul catalogo.
         
         Returns:
             tuple: (count: int, message: str)
         """
+        from .pianificazione_backup import classifica_backup
+        
         try:
-            cutoff_date = datetime.now() - timedelta(days=int(self.retention_days))  # type: ignore
-            removed_count = 0
+            backups = self.list_backups()
+            motivi = classifica_backup(backups, self.politica_conservazione)
             
-            for backup in self.list_backups():
-                if backup['timestamp'] < cutoff_date:
-                    success, _ = self.delete_backup(backup['filename'])
-                    if success:
-                        removed_count += 1
+            eliminati = []
+            for backup in backups:
+                if motivi[backup['filename']]:
+                    continue
+                try:
+                    backup['filepath'].unlink(missing_ok=True)
+                    eliminati.append(backup['filename'])
+                except OSError as e:
+                    logger.warning(f"Backup {backup['filename']} non eliminato: {e}")
             
-            logger.info(f"Pulizia completata: {removed_count} backup eliminati")
+            if eliminati:
+                self.catalogo.rimuovi(*eliminati)
+            removed_count = len(eliminati)
+            logger.info(f"Pulizia completata: {removed_count} backup eliminati ({', '.join(eliminati) or 'nessuno'})")
             
             return removed_count, f"{removed_count} backup obsoleti eliminati"
             
@@ -222,12 +869,163 @@ class BackupManager:
             logger.error(error_msg)
             return 0, error_msg
     
-    def restore_backup(self, filename):
+    def _comando_mysql(self, database=None):
+        # Percorso mysql dal database o settings
+        mysql_exe = os.path.join(str(self.mysql_bin_path), 'mysql.exe')
+        return [
+            mysql_exe,
+            f'--user={self.db_user}',
+            f'--password={self.db_password}',
+            f'--host={self.db_host}',
+            f'--port={self.db_port}',
+            database or self.db_name
+        ]
+    
+    def _carica_in_mysql(self, file_compresso, nome_file, avanzamento=None, database=None, tempi=None):
+        """
+        Decomprime file_compresso a blocchi direttamente nello stdin di un client mysql.
+        
+        Args:
+            nome_file: nome del file compresso (l'estensione decide il formato)
+            avanzamento: callable(byte_compressi_letti) opzionale, chiamata a ogni blocco
+            database: database di destinazione (default quello dell'applicazione)
+            tempi: dict opzionale riempito con secondi e byte per tabella (vedi _TempiTabelle)
+        
+        Returns:
+            tuple: (returncode: int, stderr: str, byte_sql: int)
+        """
+        byte_sql = 0
+        osservatore = _TempiTabelle(tempi) if tempi is not None else None
+        with tempfile.TemporaryFile() as stderr_file:
+            processo = subprocess.Popen(self._comando_mysql(database), stdin=subprocess.PIPE, stderr=stderr_file)
+            try:
+                with apri_backup(nome_file, file_compresso) as sql:
+                    for blocco in iter(lambda: sql.read(BLOCCO_STREAMING), b''):
+                        if osservatore:
+                            osservatore.osserva(blocco)
+                        processo.stdin.write(blocco)
+                        byte_sql += len(blocco)
+                        if avanzamento:
+                            avanzamento(file_compresso.tell())
+            except BrokenPipeError:
+                # mysql è uscito prima della fine dell'input: l'errore è nel suo stderr
+                pass
+            except BaseException:
+                # Backup illeggibile a metà: mysql non deve vedere un input "finito"
+                processo.kill()
+                raise
+            finally:
+                try:
+                    processo.stdin.close()
+                except OSError:
+                    pass
+                returncode = processo.wait()
+                if osservatore:
+                    osservatore.termina()
+            
+            stderr_file.seek(0)
+            error_msg = stderr_file.read().decode('utf-8', errors='replace')
+        
+        return returncode, error_msg, byte_sql
+    
+    def _restore_parallelo(self, backup_path, avanzamento, processi, database=None, tempi=None):
+        """
+        Carica le tabelle di un archivio parallelo con più client mysql
+        contemporaneamente (ogni file disabilita i controlli delle foreign key),
+        poi viste, trigger e routine.
+        
+        Args:
+            tempi: dict opzionale, riceve secondi e byte di SQL per tabella
+        
+        Returns:
+            tuple: (errori: list, byte_sql: int)
+        """
+        from .backup_parallelo import membri_archivio
+        
+        manifest, membri = membri_archivio(backup_path)
+        
+        def carica(nome_file):
+            chiave = f"{backup_path.name}/{nome_file}"
+            inizio = time.monotonic()
+            # Un handle per thread: i membri del tar si leggono da posizioni diverse
+            with tarfile.open(backup_path) as archivio:
+                with archivio.extractfile(membri[nome_file]) as file_compresso:
+                    returncode, error_msg, byte_sql = self._carica_in_mysql(
+                        file_compresso, nome_file, lambda letti: avanzamento.aggiorna(chiave, letti), database
+                    )
+            avanzamento.aggiorna(chiave, membri[nome_file].size)
+            return nome_file, returncode, error_msg, byte_sql, time.monotonic() - inizio
+        
+        # Prima le tabelle più grandi, che determinano la durata
+        tabelle = sorted(manifest['tabelle'], key=lambda voce: voce['byte_compressi'], reverse=True)
+        with ThreadPoolExecutor(max_workers=max(1, processi or self.processi)) as executor:
+            risultati = list(executor.map(carica, [voce['file'] for voce in tabelle]))
+        
+        if tempi is not None:
+            # Per un incrementale i tempi degli anelli si sommano
+            for voce, (_, _, _, byte_tabella, secondi) in zip(tabelle, risultati):
+                tempo = tempi.setdefault(voce['nome'], {'secondi': 0.0, 'byte_sql': 0})
+                tempo['secondi'] += secondi
+                tempo['byte_sql'] += byte_tabella
+        
+        errori = [f"{nome_file}: {error_msg}" for nome_file, returncode, error_msg, _, _ in risultati if returncode != 0]
+        byte_sql = sum(risultato[3] for risultato in risultati)
+        if not errori:
+            nome_file, returncode, error_msg, byte_oggetti, _ = carica(manifest['oggetti'])
+            if returncode != 0:
+                errori.append(f"{nome_file}: {error_msg}")
+            byte_sql += byte_oggetti
+        return errori, byte_sql
+    
+    def _carica_backup(self, filename, progresso=None, processi=None, database=None, tempi=None):
+        """
+        Carica un backup (per un incrementale tutta la catena) nel database.
+        
+        Returns:
+            tuple: (errori: list, byte_sql: int)
+        """
+        backup_path = self.backup_dir / filename
+        
+        if backup_path.suffix == ESTENSIONE_PARALLELO:
+            # Incrementale: prima il backup completo, poi ogni anello della catena
+            catena = [self.backup_dir / nome for nome in self.catena_backup(filename)]
+            avanzamento = _AvanzamentoRestore(filename, sum(p.stat().st_size for p in catena), progresso)
+            errori = []
+            byte_sql = 0
+            for anello in catena:
+                if len(catena) > 1:
+                    logger.info(f"Restore catena {filename}: {anello.name}")
+                errori, byte_anello = self._restore_parallelo(anello, avanzamento, processi, database, tempi)
+                byte_sql += byte_anello
+                if errori:
+                    errori.insert(0, f"Ripristino interrotto a {anello.name}")
+                    break
+        else:
+            avanzamento = _AvanzamentoRestore(filename, backup_path.stat().st_size, progresso)
+            with open(backup_path, 'rb') as compresso:
+                returncode, error_msg, byte_sql = self._carica_in_mysql(
+                    compresso, filename, lambda letti: avanzamento.aggiorna(filename, letti), database, tempi
+                )
+            errori = [error_msg] if returncode != 0 else []
+        
+        if not errori:
+            avanzamento.aggiorna(filename, avanzamento.byte_totali)
+        return errori, byte_sql
+    
+    @_esclusivo(False, MESSAGGIO_OCCUPATO)
+    def restore_backup(self, filename, progresso=None, processi=None):
         """
         Ripristina un backup (DA USARE CON CAUTELA!).
         
+        Il backup viene decompresso a blocchi direttamente nello stdin del
+        client mysql: nessun file .sql temporaneo su disco. I backup paralleli
+        (.tar) vengono caricati una tabella per client, in parallelo.
+        
         Args:
             filename: Nome del file di backup
+            progresso: callable(byte_letti, byte_totali) opzionale, chiamata
+                       a ogni blocco con i byte compressi consumati
+            processi: client mysql contemporanei per i backup paralleli
             
         Returns:
             tuple: (success: bool, message: str)
@@ -240,46 +1038,240 @@ class BackupManager:
             
             logger.warning(f"[WARNING] RESTORE backup: {filename}")
             
-            # Percorso mysql dal database o settings
-            mysql_exe = os.path.join(str(self.mysql_bin_path), 'mysql.exe')
-            
-            # Decomprimi temporaneamente
-            sql_path = backup_path.with_suffix('')
-            with gzip.open(backup_path, 'rb') as f_in:  # type: ignore
-                with open(sql_path, 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)  # type: ignore
-            
-            # Comando mysql restore
-            cmd = [
-                mysql_exe,
-                f'--user={self.db_user}',
-                f'--password={self.db_password}',
-                f'--host={self.db_host}',
-                f'--port={self.db_port}',
-                self.db_name
-            ]
-            
-            with open(sql_path, 'r', encoding='utf-8') as f:
-                result = subprocess.run(
-                    cmd,
-                    stdin=f,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
-            
-            # Rimuovi file decompresso
-            sql_path.unlink()
+            inizio = time.monotonic()
+            errori, byte_sql = self._carica_backup(filename, progresso, processi)
             
-            if result.returncode != 0:
-                error_msg = result.stderr
+            if errori:
+                error_msg = '\n'.join(errori)
                 logger.error(f"Errore restore: {error_msg}")
                 return False, f"Errore durante il ripristino: {error_msg}"
             
-            logger.info(f"Backup ripristinato: {filename}")
+            durata = time.monotonic() - inizio
+            riepilogo = (
+                f"{byte_sql / (1024 * 1024):.2f} MB di SQL in {durata:.1f}s, "
+                f"{byte_sql / (1024 * 1024) / max(durata, 0.001):.1f} MB/s"
+            )
+            logger.info(f"Backup ripristinato: {filename} ({riepilogo})")
             
-            return True, "Database ripristinato con successo"
+            return True, f"Database ripristinato con successo ({riepilogo})"
             
         except Exception as e:
             error_msg = f"Errore durante il ripristino: {str(e)}"
             logger.error(error_msg, exc_info=True)
             return False, error_msg
+    
+    def _verifica_archivio(self, lettore, errori):
+        """
+        Decomprime in streaming ogni membro di un archivio parallelo e
+        controlla che ci siano tutti i file del manifest.
+        
+        Returns:
+            int: byte di SQL decompressi
+        """
+        manifest = None
+        visti = set()
+        byte_sql = 0
+        # Modalità stream 'r|': i membri si leggono in ordine, un solo passaggio sul file
+        with tarfile.open(fileobj=lettore, mode='r|') as archivio:
+            for membro in archivio:
+                visti.add(membro.name)
+                with archivio.extractfile(membro) as contenuto:
+                    if membro.name == 'manifest.json':
+                        manifest = json.load(contenuto)
+                        continue
+                    coda = b''
+                    with apri_backup(membro.name, contenuto) as dati:
+                        for blocco in iter(lambda: dati.read(BLOCCO_STREAMING), b''):
+                            if not membro.name.startswith('chiavi/'):
+                                byte_sql += len(blocco)
+                            coda = (coda + blocco)[-64:]
+                if membro.name.startswith('tabelle/') and not coda.endswith(FINE_TABELLA_PARALLELO):
+                    errori.append(f"{membro.name}: file troncato")
+        
+        if manifest is None:
+            errori.append("manifest.json mancante")
+        else:
+            attesi = {manifest['oggetti']}
+            for voce in manifest['tabelle']:
+                attesi.add(voce['file'])
+                if voce.get('file_chiavi'):
+                    attesi.add(voce['file_chiavi'])
+            for mancante in sorted(attesi - visti):
+                errori.append(f"{mancante}: mancante nell'archivio")
+        return byte_sql
+    
+    def verifica_integrita(self, filename):
+        """
+        Rilegge il backup in streaming, senza scrivere nulla su disco: calcola
+        lo SHA-256 e decomprime tutto (CRC gzip, checksum zstd) nello stesso
+        passaggio, controllando che il dump arrivi fino in fondo.
+        
+        Returns:
+            dict: filename, sha256, byte_sql, secondi, errori
+        """
+        backup_path = self.backup_dir / filename
+        inizio = time.monotonic()
+        errori = []
+        byte_sql = 0
+        
+        with open(backup_path, 'rb') as file_in:
+            lettore = LetturaConHash(file_in)
+            try:
+                if backup_path.suffix == ESTENSIONE_PARALLELO:
+                    byte_sql = self._verifica_archivio(lettore, errori)
+                else:
+                    coda = b''
+                    with apri_backup(filename, lettore) as sql:
+                        for blocco in iter(lambda: sql.read(BLOCCO_STREAMING), b''):
+                            byte_sql += len(blocco)
+                            coda = (coda + blocco)[-256:]
+                    if FINE_MYSQLDUMP not in coda:
+                        errori.append("dump troncato: manca la riga finale di mysqldump")
+            except Exception as e:
+                errori.append(f"file compresso danneggiato: {e}")
+            sha256 = lettore.hexdigest()
+        
+        return {
+            'filename': filename,
+            'sha256': sha256,
+            'byte_sql': byte_sql,
+            'secondi': time.monotonic() - inizio,
+            'errori': errori,
+        }
+    
+    def _test_restore(self, filename, processi=None):
+        """
+        Carica il backup (o la catena) nel database usa e getta schema_verifica,
+        conta le righe di ogni tabella e lo elimina.
+        
+        Returns:
+            dict: secondi, byte_sql, errori, tempi (per tabella), righe (per tabella)
+        """
+        from django.db import connection
+        
+        schema = self.schema_verifica
+        if schema == self.db_name:
+            raise ValueError("Lo schema di verifica non può essere il database dell'applicazione")
+        
+        tempi = {}
+        righe = {}
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS `{schema}`")
+            cursor.execute(f"CREATE DATABASE `{schema}` CHARACTER SET utf8mb4")
+        try:
+            inizio = time.monotonic()
+            errori, byte_sql = self._carica_backup(filename, processi=processi, database=schema, tempi=tempi)
+            secondi = time.monotonic() - inizio
+            
+            if not errori:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT TABLE_NAME FROM information_schema.TABLES "
+                        "WHERE TABLE_SCHEMA = %s AND TABLE_TYPE = 'BASE TABLE'",
+                        [schema]
+                    )
+                    for (tabella,) in cursor.fetchall():
+                        cursor.execute(f"SELECT COUNT(*) FROM `{schema}`.`{tabella}`")
+                        righe[tabella] = cursor.fetchone()[0]
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP DATABASE IF EXISTS `{schema}`")
+        
+        return {'secondi': secondi, 'byte_sql': byte_sql, 'errori': errori, 'tempi': tempi, 'righe': righe}
+    
+    def verifica_backup(self, filename, test_restore=False, processi=None):
+        """
+        Verifica un backup e registra l'esito nel catalogo.
+        
+        - integrità: verifica_integrita() del file (per un incrementale di tutta
+          la catena) e SHA-256 confrontato con quello registrato alla creazione
+        - test_restore: ripristino cronometrato in schema_verifica e confronto
+          delle righe per tabella con quelle registrate al backup. La durata è
+          il tempo di ripristino misurato (RTO) con questo hardware e processi.
+        
+        Returns:
+            tuple: (success: bool, message: str, risultato: dict)
+        """
+        try:
+            backup_path = self.backup_dir / filename
+            if not backup_path.exists():
+                return False, "File di backup non trovato", None
+            
+            catalogo = {voce['filename']: voce for voce in self.catalogo.voci()}
+            catena = self.catena_backup(filename)
+            errori = []
+            controlli = []
+            
+            for nome in catena:
+                controllo = self.verifica_integrita(nome)
+                controlli.append(controllo)
+                errori.extend(f"{nome}: {errore}" for errore in controllo['errori'])
+                
+                sha256_registrato = catalogo.get(nome, {}).get('sha256')
+                if sha256_registrato is None:
+                    # Backup creato prima del catalogo: l'hash di oggi fa da riferimento
+                    self.catalogo.aggiorna(nome, sha256=controllo['sha256'])
+                elif sha256_registrato != controllo['sha256']:
+                    errori.append(f"{nome}: SHA-256 diverso da quello registrato alla creazione")
+            
+            risultato = {'filename': filename, 'integrita': controlli, 'restore': None, 'errori': errori}
+            secondi_integrita = sum(controllo['secondi'] for controllo in controlli)
+            messaggio = (
+                f"{len(catena)} file, {sum(c['byte_sql'] for c in controlli) / (1024 * 1024):.2f} MB di SQL "
+                f"letti in {secondi_integrita:.1f}s"
+            )
+            
+            if test_restore and not errori:
+                restore = self._test_restore(filename, processi)
+                errori.extend(restore['errori'])
+                
+                # Righe contate alla creazione del backup: il test-restore non fa da riferimento a se stesso
+                righe_attese = catalogo.get(filename, {}).get('righe')
+                tabelle = {}
+                for tabella in sorted(set(restore['righe']) | set(righe_attese or {}) | set(restore['tempi'])):
+                    tempo = restore['tempi'].get(tabella, {'secondi': 0.0, 'byte_sql': 0})
+                    attese = (righe_attese or {}).get(tabella)
+                    trovate = restore['righe'].get(tabella)
+                    tabelle[tabella] = {
+                        'secondi': tempo['secondi'],
+                        'byte_sql': tempo['byte_sql'],
+                        'mb_al_secondo': tempo['byte_sql'] / (1024 * 1024) / max(tempo['secondi'], 0.001),
+                        'righe': trovate,
+                        'righe_attese': attese,
+                    }
+                    if righe_attese is not None and not restore['errori'] and attese != trovate:
+                        errori.append(f"{tabella}: {trovate} righe ripristinate, {attese} al momento del backup")
+                
+                risultato['restore'] = {
+                    'secondi': restore['secondi'],
+                    'byte_sql': restore['byte_sql'],
+                    'mb_al_secondo': restore['byte_sql'] / (1024 * 1024) / max(restore['secondi'], 0.001),
+                    'tabelle': tabelle,
+                }
+                messaggio += (
+                    f"; test-restore in {restore['secondi']:.1f}s (RTO), "
+                    f"{risultato['restore']['mb_al_secondo']:.1f} MB/s, {len(restore['righe'])} tabelle"
+                )
+                if righe_attese is None:
+                    messaggio += " (righe non registrate alla creazione del backup: nessun confronto)"
+            
+            self.catalogo.aggiorna(filename, verifica={
+                'data': datetime.now().isoformat(timespec='seconds'),
+                'esito': not errori,
+                'test_restore': risultato['restore'] is not None,
+                'secondi_integrita': round(secondi_integrita, 3),
+                'rto_secondi': round(risultato['restore']['secondi'], 3) if risultato['restore'] else None,
+                'errori': errori[:10],
+            })
+            
+            if errori:
+                logger.error(f"Verifica backup {filename} fallita: {'; '.join(errori)}")
+                return False, f"Verifica fallita: {'; '.join(errori[:5])}", risultato
+            
+            logger.info(f"Verifica backup {filename} riuscita ({messaggio})")
+            return True, f"Backup integro ({messaggio})", risultato
+            
+        except Exception as e:
+            error_msg = f"Errore durante la verifica: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            return False, error_msg, None
@@ -0,0 +1,548 @@
+"""
+Backup logico parallelo, una tabella per file, completo o incrementale.
+
+Il mysqldump unico scrive le tabelle una dopo l'altra, quindi la durata
+cresce con le tabelle più grandi (movimenti_magazzino, azioni_utenti).
+Qui ogni tabella è esportata da un processo del pool nel proprio file
+compresso e tutto viene raccolto in un archivio tar non compresso:
+
+    backup_GMR_20260101_120000.tar
+        manifest.json              tipo, compressione e per tabella righe, byte, high-water mark
+        tabelle/<tabella>.sql.gz   SQL della tabella
+        chiavi/<tabella>.txt.gz    chiavi primarie presenti (per le cancellazioni del backup successivo)
+        oggetti.sql.gz             viste, trigger, procedure e funzioni
+
+Snapshot consistente (come mydumper): la connessione di coordinamento prende
+FLUSH TABLES WITH READ LOCK (o, senza privilegio RELOAD, LOCK TABLES ... READ
+di tutte le tabelle), ogni processo apre la sua transazione con
+START TRANSACTION WITH CONSISTENT SNAPSHOT e solo allora il lock viene
+rilasciato: le scritture restano bloccate per il tempo di apertura delle
+transazioni, non per tutto il dump.
+
+Backup incrementali (backup_GMR_<timestamp>_inc.tar): partono dal manifest
+del backup precedente della catena e per ogni tabella esportano solo
+- le righe con colonna di modifica (COLONNE_MODIFICA, o la data di creazione
+  per le TABELLE_SOLO_INSERIMENTI) >= high-water mark precedente - MARGINE_HWM,
+  con REPLACE (ripetere una riga già salvata non fa danni)
+- le cancellazioni (tombstone): chiavi primarie del backup precedente non
+  più presenti, applicate con DELETE
+Le tabelle senza colonna di modifica o chiave primaria singola, e quelle
+con struttura cambiata (migrazioni), sono copiate per intero.
+Le modifiche fatte con QuerySet.update() devono aggiornare la colonna di
+modifica (auto_now non interviene): su movimenti e azioni, registri in sola
+aggiunta, una modifica massiva (es. riassegnazione dei movimenti al fornitore
+di fallback) entra solo nel backup completo successivo.
+
+Ogni file di tabella disabilita FOREIGN_KEY_CHECKS e UNIQUE_CHECKS, quindi
+il ripristino (BackupManager.restore_backup) carica le tabelle in parallelo,
+in qualunque ordine, con un client mysql per tabella; per un incrementale
+ricarica il backup completo e poi ogni anello della catena. Gli eventi
+schedulati non sono inclusi (il database non ne usa).
+
+I processi ricevono solo credenziali e percorsi: nessun accesso a modelli o
+impostazioni Django, come per genera_rendition_file() nell'import immagini.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import tarfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from .backup_manager import ESTENSIONI_BACKUP, TABELLE_ESCLUSE, apri_backup, apri_compressore
+
+logger = logging.getLogger(__name__)
+
+
+FORMATO_PARALLELO = 'parallelo'
+# 2: high-water mark, chiavi primarie e backup incrementali
+VERSIONE_MANIFEST = 2
+
+BACKUP_COMPLETO = 'completo'
+BACKUP_INCREMENTALE = 'incrementale'
+
+# Modalità di esportazione di una tabella
+MODO_STRUTTURA = 'struttura'          # DROP/CREATE e tutte le righe
+MODO_SVUOTA = 'svuota'                # DELETE e tutte le righe (incrementale senza colonna di modifica)
+MODO_INCREMENTALE = 'incrementale'    # tombstone e righe modificate
+
+# Colonne aggiornate a ogni modifica della riga, in ordine di preferenza
+COLONNE_MODIFICA = ('modificato_il', 'ultimo_aggiornamento', 'aggiornato_il')
+# Registri in sola aggiunta: basta la data di creazione
+TABELLE_SOLO_INSERIMENTI = {'movimenti_magazzino': 'creato_il', 'azioni_utenti': 'data_azione'}
+# Le righe salvate poco prima del backup precedente possono essere state confermate dopo lo snapshot
+MARGINE_HWM = timedelta(minutes=5)
+
+# Dimensione massima (circa) di un INSERT multi-riga, come --extended-insert
+MAX_BYTE_INSERT = 1024 * 1024
+# Chiavi per DELETE dei tombstone
+MAX_CHIAVI_DELETE = 1000
+# Attesa massima perché tutti i processi aprano lo snapshot
+TIMEOUT_SNAPSHOT = 60
+
+INTESTAZIONE_SQL = (
+    "SET NAMES utf8mb4;\n"
+    "SET time_zone='+00:00';\n"
+    "SET FOREIGN_KEY_CHECKS=0;\n"
+    "SET UNIQUE_CHECKS=0;\n"
+    "SET autocommit=0;\n"
+)
+
+# Connessione con lo snapshot aperto, una per processo del pool
+_connessione = None
+
+
+def _connetti(credenziali):
+    import pymysql
+    connessione = pymysql.connect(
+        host=credenziali['host'],
+        port=int(credenziali['port'] or 3306),
+        user=credenziali['user'],
+        password=credenziali['password'],
+        database=credenziali['database'],
+        charset='utf8mb4',
+        autocommit=True,
+    )
+    with connessione.cursor() as cursor:
+        # Come mysqldump: TIMESTAMP esportati e ricaricati in UTC
+        cursor.execute("SET SESSION time_zone='+00:00'")
+    return connessione
+
+
+def _inizializza_processo(credenziali, pronti):
+    """Initializer del pool: apre la connessione e la transazione con snapshot consistente"""
+    global _connessione
+    _connessione = _connetti(credenziali)
+    with _connessione.cursor() as cursor:
+        cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+    pronti.release()
+
+
+def _letterale(connessione, valore):
+    # Dati binari in esadecimale (come --hex-blob): il file resta testo utf-8 valido
+    if isinstance(valore, (bytes, bytearray)):
+        return '0x' + valore.hex() if valore else "''"
+    return connessione.escape(valore)
+
+
+def _scrivi(file_out, testo):
+    dati = testo.encode('utf-8')
+    file_out.write(dati)
+    return len(dati)
+
+
+def _impronta_schema(create_table):
+    """Hash della struttura della tabella (il contatore AUTO_INCREMENT non conta)"""
+    return hashlib.sha256(re.sub(r' AUTO_INCREMENT=\d+', '', create_table).encode('utf-8')).hexdigest()
+
+
+def _leggi_chiavi(percorso_archivio, nome_file):
+    """Chiavi primarie registrate in un archivio precedente"""
+    with tarfile.open(percorso_archivio) as archivio:
+        with archivio.extractfile(nome_file) as compresso, apri_backup(nome_file, compresso) as file_chiavi:
+            return {json.loads(riga) for riga in io.TextIOWrapper(file_chiavi, encoding='utf-8')}
+
+
+def _scrivi_chiavi(cartella, tabella, chiave, formato, livello, precedenti=None):
+    """
+    Salva le chiavi primarie presenti nello snapshot.
+
+    Returns:
+        tuple: (nome file, chiavi presenti, chiavi di precedenti non più presenti)
+    """
+    import pymysql
+
+    # chiavi/<tabella>.txt.gz o .txt.zst
+    nome_file = f"chiavi/{tabella}.txt{ESTENSIONI_BACKUP[formato][len('.sql'):]}"
+    eliminate = set(precedenti or ())
+    with open(os.path.join(cartella, nome_file), 'wb') as file_out:
+        with apri_compressore(file_out, formato, livello, multithread=False) as compresso:
+            with _connessione.cursor(pymysql.cursors.SSCursor) as cursor:
+                cursor.execute(f"SELECT `{chiave}` FROM `{tabella}`")
+                righe = []
+                presenti = 0
+                for (valore,) in cursor.fetchall_unbuffered():
+                    presenti += 1
+                    righe.append(json.dumps(valore))
+                    eliminate.discard(valore)
+                    if len(righe) >= 10000:
+                        _scrivi(compresso, '\n'.join(righe) + '\n')
+                        righe = []
+                if righe:
+                    _scrivi(compresso, '\n'.join(righe) + '\n')
+    return nome_file, presenti, sorted(eliminate)
+
+
+def dump_tabella(tabella, cartella, formato, livello, piano):
+    """
+    Esporta una tabella (nel processo del pool, dentro lo snapshot) in cartella/tabelle.
+
+    Args:
+        piano: dict modo, colonna (di modifica), chiave (primaria), dal (righe modificate da),
+               schema_precedente, chiavi_precedenti (percorso archivio, file) - vedi _piano_tabella
+
+    Returns:
+        dict: voce del manifest
+    """
+    import pymysql
+
+    inizio = time.monotonic()
+    nome_file = f"tabelle/{tabella}{ESTENSIONI_BACKUP[formato]}"
+    righe = byte_sql = 0
+
+    with _connessione.cursor() as cursor:
+        cursor.execute(f"SHOW CREATE TABLE `{tabella}`")
+        create_table = cursor.fetchone()[1]
+    schema = _impronta_schema(create_table)
+
+    modo = piano['modo']
+    if modo != MODO_STRUTTURA and schema != piano.get('schema_precedente'):
+        # Struttura cambiata dal backup precedente (migrazione): copia completa
+        modo = MODO_STRUTTURA
+
+    colonna, chiave = piano.get('colonna'), piano.get('chiave')
+    hwm = None
+    file_chiavi = None
+    righe_totali = None
+    eliminate = []
+    if colonna:
+        with _connessione.cursor() as cursor:
+            cursor.execute(f"SELECT MAX(`{colonna}`) FROM `{tabella}`")
+            massimo = cursor.fetchone()[0]
+            hwm = massimo.isoformat(sep=' ') if massimo is not None else None
+        if chiave:
+            precedenti = None
+            if modo == MODO_INCREMENTALE:
+                precedenti = _leggi_chiavi(*piano['chiavi_precedenti'])
+            file_chiavi, righe_totali, eliminate = _scrivi_chiavi(
+                cartella, tabella, chiave, formato, livello, precedenti
+            )
+
+    with open(os.path.join(cartella, nome_file), 'wb') as file_out:
+        # Un solo thread zstd per processo: il parallelismo è già tra le tabelle
+        with apri_compressore(file_out, formato, livello, multithread=False) as compresso:
+            byte_sql += _scrivi(compresso, INTESTAZIONE_SQL)
+
+            query = f"SELECT * FROM `{tabella}`"
+            parametri = []
+            verbo = 'INSERT'
+            if modo == MODO_STRUTTURA:
+                byte_sql += _scrivi(compresso, f"DROP TABLE IF EXISTS `{tabella}`;\n{create_table};\n")
+            elif modo == MODO_SVUOTA:
+                byte_sql += _scrivi(compresso, f"DELETE FROM `{tabella}`;\n")
+            else:
+                for indice in range(0, len(eliminate), MAX_CHIAVI_DELETE):
+                    chiavi = ','.join(
+                        _letterale(_connessione, valore) for valore in eliminate[indice:indice + MAX_CHIAVI_DELETE]
+                    )
+                    byte_sql += _scrivi(compresso, f"DELETE FROM `{tabella}` WHERE `{chiave}` IN ({chiavi});\n")
+                verbo = 'REPLACE'
+                if piano.get('dal'):
+                    query += f" WHERE `{colonna}` >= %s"
+                    parametri.append(piano['dal'])
+
+            # Cursore non bufferizzato: le righe arrivano in streaming dal server
+            with _connessione.cursor(pymysql.cursors.SSCursor) as cursor:
+                cursor.execute(query, parametri)
+                colonne = ', '.join(f"`{descrizione[0]}`" for descrizione in cursor.description)
+                insert = f"{verbo} INTO `{tabella}` ({colonne}) VALUES\n"
+                valori = []
+                dimensione = 0
+                for riga in cursor.fetchall_unbuffered():
+                    valore = '(' + ','.join(_letterale(_connessione, campo) for campo in riga) + ')'
+                    valori.append(valore)
+                    dimensione += len(valore)
+                    righe += 1
+                    if dimensione >= MAX_BYTE_INSERT:
+                        byte_sql += _scrivi(compresso, insert + ',\n'.join(valori) + ';\n')
+                        valori = []
+                        dimensione = 0
+                if valori:
+                    byte_sql += _scrivi(compresso, insert + ',\n'.join(valori) + ';\n')
+
+            byte_sql += _scrivi(compresso, "COMMIT;\n")
+
+    return {
+        'nome': tabella,
+        'file': nome_file,
+        'modo': modo,
+        'righe': righe,
+        # Righe della tabella nello snapshot (per un incrementale righe sono solo quelle modificate)
+        'righe_totali': righe_totali if modo == MODO_INCREMENTALE else righe,
+        'eliminate': len(eliminate) if modo == MODO_INCREMENTALE else 0,
+        'colonna_modifica': colonna,
+        'chiave': chiave,
+        'hwm': hwm,
+        'file_chiavi': file_chiavi,
+        'schema': schema,
+        'byte_sql': byte_sql,
+        'byte_compressi': os.path.getsize(os.path.join(cartella, nome_file)),
+        'durata_secondi': round(time.monotonic() - inizio, 3),
+    }
+
+
+def _dump_tabella_pool(argomenti):
+    return dump_tabella(*argomenti)
+
+
+def _elenca_tabelle(connessione, database):
+    """Tabelle (dalla più grande, escluse TABELLE_ESCLUSE) e viste del database"""
+    with connessione.cursor() as cursor:
+        cursor.execute(
+            "SELECT TABLE_NAME, TABLE_TYPE FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = %s ORDER BY DATA_LENGTH + INDEX_LENGTH DESC, TABLE_NAME",
+            [database]
+        )
+        elenco = cursor.fetchall()
+    tabelle = [nome for nome, tipo in elenco if tipo == 'BASE TABLE' and nome not in TABELLE_ESCLUSE]
+    viste = sorted(nome for nome, tipo in elenco if tipo == 'VIEW')
+    return tabelle, viste
+
+
+def _colonne_incrementali(connessione, database):
+    """
+    Returns:
+        dict: tabella -> (colonna di modifica o None, chiave primaria singola o None)
+    """
+    colonne = defaultdict(set)
+    chiavi = defaultdict(list)
+    with connessione.cursor() as cursor:
+        cursor.execute(
+            "SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s", [database]
+        )
+        for tabella, colonna in cursor.fetchall():
+            colonne[tabella].add(colonna)
+        cursor.execute(
+            "SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.KEY_COLUMN_USAGE "
+            "WHERE TABLE_SCHEMA = %s AND CONSTRAINT_NAME = 'PRIMARY'",
+            [database]
+        )
+        for tabella, colonna in cursor.fetchall():
+            chiavi[tabella].append(colonna)
+
+    risultato = {}
+    for tabella, nomi in colonne.items():
+        colonna = next((nome for nome in COLONNE_MODIFICA if nome in nomi), None)
+        if colonna is None and TABELLE_SOLO_INSERIMENTI.get(tabella) in nomi:
+            colonna = TABELLE_SOLO_INSERIMENTI[tabella]
+        risultato[tabella] = (colonna, chiavi[tabella][0] if len(chiavi[tabella]) == 1 else None)
+    return risultato
+
+
+def _piano_tabella(tabella, colonna, chiave, precedente):
+    """
+    Come esportare la tabella rispetto al backup precedente della catena.
+
+    Args:
+        precedente: (percorso archivio, manifest) oppure None per un backup completo
+    """
+    piano = {'modo': MODO_STRUTTURA, 'colonna': colonna, 'chiave': chiave}
+    if precedente is None:
+        return piano
+
+    percorso_precedente, manifest_precedente = precedente
+    voce = next((voce for voce in manifest_precedente['tabelle'] if voce['nome'] == tabella), None)
+    if voce is None:
+        # Tabella nuova
+        return piano
+
+    piano['schema_precedente'] = voce.get('schema')
+    if colonna and chiave and voce.get('colonna_modifica') == colonna and voce.get('file_chiavi'):
+        piano['modo'] = MODO_INCREMENTALE
+        piano['chiavi_precedenti'] = (percorso_precedente, voce['file_chiavi'])
+        if voce.get('hwm'):
+            piano['dal'] = (datetime.fromisoformat(voce['hwm']) - MARGINE_HWM).isoformat(sep=' ')
+    else:
+        piano['modo'] = MODO_SVUOTA
+    return piano
+
+
+def _blocca_scritture(connessione, tabelle):
+    """Blocca le scritture per aprire gli snapshot; restituisce il metodo usato"""
+    import pymysql
+
+    with connessione.cursor() as cursor:
+        try:
+            cursor.execute("FLUSH TABLES WITH READ LOCK")
+            return 'FLUSH TABLES WITH READ LOCK'
+        except pymysql.err.OperationalError as e:
+            # 1227: manca il privilegio RELOAD
+            if e.args[0] != 1227:
+                raise
+            cursor.execute("LOCK TABLES " + ', '.join(f"`{tabella}` READ" for tabella in tabelle))
+            return 'LOCK TABLES READ'
+
+
+def _dump_oggetti(connessione, database, viste, cartella, formato, livello, tabelle_eliminate=()):
+    """Viste, trigger, procedure e funzioni, da caricare dopo tutte le tabelle"""
+    nome_file = f"oggetti{ESTENSIONI_BACKUP[formato]}"
+    # Tabelle che esistevano nel backup precedente della catena
+    blocchi = [f"DROP TABLE IF EXISTS `{tabella}`;\n" for tabella in tabelle_eliminate]
+    with connessione.cursor() as cursor:
+        for vista in viste:
+            cursor.execute(f"SHOW CREATE VIEW `{vista}`")
+            blocchi.append(f"DROP VIEW IF EXISTS `{vista}`;\n{cursor.fetchone()[1]};\n")
+
+        cursor.execute(
+            "SELECT TRIGGER_NAME FROM information_schema.TRIGGERS WHERE TRIGGER_SCHEMA = %s", [database]
+        )
+        for (trigger,) in cursor.fetchall():
+            cursor.execute(f"SHOW CREATE TRIGGER `{trigger}`")
+            blocchi.append(
+                f"DROP TRIGGER IF EXISTS `{trigger}`;\nDELIMITER ;;\n{cursor.fetchone()[2]};;\nDELIMITER ;\n"
+            )
+
+        cursor.execute(
+            "SELECT ROUTINE_NAME, ROUTINE_TYPE FROM information_schema.ROUTINES WHERE ROUTINE_SCHEMA = %s",
+            [database]
+        )
+        for nome, tipo in cursor.fetchall():
+            cursor.execute(f"SHOW CREATE {tipo} `{nome}`")
+            blocchi.append(
+                f"DROP {tipo} IF EXISTS `{nome}`;\nDELIMITER ;;\n{cursor.fetchone()[2]};;\nDELIMITER ;\n"
+            )
+
+    with open(os.path.join(cartella, nome_file), 'wb') as file_out:
+        with apri_compressore(file_out, formato, livello) as compresso:
+            _scrivi(compresso, INTESTAZIONE_SQL + ''.join(blocchi))
+    return nome_file
+
+
+def crea_archivio_parallelo(credenziali, percorso_archivio, formato, livello, processi, precedente=None,
+                            progresso=None):
+    """
+    Esporta il database in percorso_archivio (tar) con processi in parallelo.
+    L'archivio viene scritto come .partial e rinominato solo a dump completato.
+
+    Args:
+        credenziali: dict host, port, user, password, database
+        precedente: percorso del backup parallelo su cui costruire un incrementale
+                    (None per un backup completo)
+        progresso: callable(byte_compressi, tabelle_completate) opzionale,
+                   chiamata al termine di ogni tabella
+
+    Returns:
+        dict: il manifest scritto nell'archivio
+    """
+    manifest_precedente = leggi_manifest(precedente) if precedente else None
+    if manifest_precedente and manifest_precedente.get('versione', 1) < 2:
+        raise ValueError(
+            f"{os.path.basename(precedente)} non registra gli high-water mark: serve un nuovo backup completo"
+        )
+
+    cartella = f"{percorso_archivio}.partial.d"
+    parziale = f"{percorso_archivio}.partial"
+    os.makedirs(os.path.join(cartella, 'tabelle'), exist_ok=True)
+    os.makedirs(os.path.join(cartella, 'chiavi'), exist_ok=True)
+    inizio = time.monotonic()
+
+    try:
+        coordinatore = _connetti(credenziali)
+        try:
+            tabelle, viste = _elenca_tabelle(coordinatore, credenziali['database'])
+            incrementali = _colonne_incrementali(coordinatore, credenziali['database'])
+            piani = {
+                tabella: _piano_tabella(
+                    tabella, *incrementali.get(tabella, (None, None)),
+                    (precedente, manifest_precedente) if precedente else None
+                )
+                for tabella in tabelle
+            }
+            processi = max(1, min(processi, len(tabelle) or 1))
+
+            contesto = multiprocessing.get_context()
+            pronti = contesto.Semaphore(0)
+            blocco = _blocca_scritture(coordinatore, tabelle)
+            try:
+                pool = contesto.Pool(processi, initializer=_inizializza_processo, initargs=(credenziali, pronti))
+                for _ in range(processi):
+                    if not pronti.acquire(timeout=TIMEOUT_SNAPSHOT):
+                        pool.terminate()
+                        raise RuntimeError("I processi di backup non sono riusciti ad aprire lo snapshot")
+            finally:
+                with coordinatore.cursor() as cursor:
+                    cursor.execute("UNLOCK TABLES")
+            logger.info(f"Snapshot aperto da {processi} processi ({blocco}) in {time.monotonic() - inizio:.1f}s")
+
+            voci = []
+            with pool:
+                for voce in pool.imap_unordered(
+                    _dump_tabella_pool,
+                    [(tabella, cartella, formato, livello, piani[tabella]) for tabella in tabelle]
+                ):
+                    voci.append(voce)
+                    if progresso:
+                        progresso(sum(fatta['byte_compressi'] for fatta in voci), len(voci))
+
+            tabelle_eliminate = sorted(
+                {voce['nome'] for voce in manifest_precedente['tabelle']} - set(tabelle)
+            ) if manifest_precedente else []
+            file_oggetti = _dump_oggetti(
+                coordinatore, credenziali['database'], viste, cartella, formato, livello, tabelle_eliminate
+            )
+        finally:
+            coordinatore.close()
+
+        manifest = {
+            'formato': FORMATO_PARALLELO,
+            'versione': VERSIONE_MANIFEST,
+            'tipo': BACKUP_INCREMENTALE if precedente else BACKUP_COMPLETO,
+            'database': credenziali['database'],
+            'creato_il': datetime.now().isoformat(timespec='seconds'),
+            'compressione': formato,
+            'livello': livello,
+            'processi': processi,
+            'snapshot': blocco,
+            'durata_secondi': round(time.monotonic() - inizio, 3),
+            'tabelle': sorted(voci, key=lambda voce: voce['nome']),
+            'tabelle_eliminate': tabelle_eliminate,
+            'oggetti': file_oggetti,
+        }
+        if precedente:
+            manifest['precedente'] = os.path.basename(precedente)
+            manifest['base'] = manifest_precedente.get('base') or os.path.basename(precedente)
+        with open(os.path.join(cartella, 'manifest.json'), 'w', encoding='utf-8') as file_manifest:
+            json.dump(manifest, file_manifest, indent=2)
+
+        # Manifest per primo: si legge senza scorrere tutto l'archivio
+        with tarfile.open(parziale, 'w') as archivio:
+            archivio.add(os.path.join(cartella, 'manifest.json'), arcname='manifest.json')
+            for voce in manifest['tabelle']:
+                archivio.add(os.path.join(cartella, voce['file']), arcname=voce['file'])
+                if voce['file_chiavi']:
+                    archivio.add(os.path.join(cartella, voce['file_chiavi']), arcname=voce['file_chiavi'])
+            archivio.add(os.path.join(cartella, file_oggetti), arcname=file_oggetti)
+        os.replace(parziale, percorso_archivio)
+        return manifest
+
+    finally:
+        shutil.rmtree(cartella, ignore_errors=True)
+        if os.path.exists(parziale):
+            os.remove(parziale)
+
+
+def leggi_manifest(percorso_archivio):
+    """Manifest di un archivio parallelo"""
+    with tarfile.open(percorso_archivio) as archivio:
+        with archivio.extractfile('manifest.json') as file_manifest:
+            return json.load(file_manifest)
+
+
+def membri_archivio(percorso_archivio):
+    """
+    Returns:
+        tuple: (manifest, dict nome file -> TarInfo dei file compressi)
+    """
+    with tarfile.open(percorso_archivio) as archivio:
+        with archivio.extractfile('manifest.json') as file_manifest:
+            manifest = json.load(file_manifest)
+        membri = {membro.name: membro for membro in archivio.getmembers() if membro.name != 'manifest.json'}
+    return manifest, membri
@@ -0,0 +1,220 @@
+"""
+Catalogo dei backup: un file catalogo.json nella cartella dei backup con
+una voce per file (formato, dimensione, SHA-256, durata, righe per tabella).
+
+BackupManager lo aggiorna a ogni creazione, eliminazione e pulizia, quindi
+la pagina dei backup e cleanup_old_backups leggono un solo file invece di
+scorrere la cartella, interpretare i nomi e fare stat di ogni backup.
+
+Il catalogo sta accanto ai file e non nel database: un restore riporta il
+database allo stato del backup, ma i backup creati dopo restano elencati.
+Se manca (prima esecuzione, cartella copiata a mano) viene ricostruito
+dai file presenti; dopo spostamenti o cancellazioni manuali:
+    python manage.py catalogo_backup --ricostruisci
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+NOME_CATALOGO = 'catalogo.json'
+VERSIONE_CATALOGO = 1
+
+# Letture e scritture del catalogo nello stesso processo
+_lock = threading.Lock()
+# Percorso -> ((mtime_ns, dimensione), voci): il file viene riletto solo se cambiato
+_cache = {}
+
+
+def sha256_file(percorso):
+    """SHA-256 di un file letto a blocchi"""
+    sha = hashlib.sha256()
+    with open(percorso, 'rb') as file:
+        for blocco in iter(lambda: file.read(1024 * 1024), b''):
+            sha.update(blocco)
+    return sha.hexdigest()
+
+
+class ScritturaConHash:
+    """File in scrittura che calcola lo SHA-256 di quanto scritto (nessuna rilettura del backup)"""
+
+    def __init__(self, file_out):
+        self.file_out = file_out
+        self.sha = hashlib.sha256()
+        self.byte = 0
+
+    def write(self, dati):
+        self.sha.update(dati)
+        self.byte += len(dati)
+        return self.file_out.write(dati)
+
+    def flush(self):
+        self.file_out.flush()
+
+    def hexdigest(self):
+        return self.sha.hexdigest()
+
+
+class LetturaConHash:
+    """File in lettura che calcola lo SHA-256 di quanto letto (verifica in un solo passaggio)"""
+
+    def __init__(self, file_in):
+        self.file_in = file_in
+        self.sha = hashlib.sha256()
+
+    def read(self, dimensione=-1):
+        dati = self.file_in.read(dimensione)
+        self.sha.update(dati)
+        return dati
+
+    def hexdigest(self):
+        """Hash dell'intero file: legge anche quanto il decompressore non ha consumato"""
+        for blocco in iter(lambda: self.read(1024 * 1024), b''):
+            pass
+        return self.sha.hexdigest()
+
+
+def timestamp_da_nome(nome_file):
+    """Data e ora dal nome del backup (backup_GMR_20251205_235438.sql.gz), None se assente"""
+    parti = nome_file.split('.')[0].split('_')
+    for indice in range(len(parti) - 1, 0, -1):
+        if len(parti[indice]) == 6 and parti[indice].isdigit() and len(parti[indice - 1]) == 8 and parti[indice - 1].isdigit():
+            return datetime.strptime(f"{parti[indice - 1]}_{parti[indice]}", '%Y%m%d_%H%M%S')
+    return None
+
+
+def voce_da_manifest(manifest):
+    """Campi della voce di catalogo ricavati dal manifest di un backup parallelo o incrementale"""
+    return {
+        'tipo': manifest.get('tipo', 'completo'),
+        'versione_manifest': manifest.get('versione', 1),
+        'precedente': manifest.get('precedente'),
+        'compressione': manifest.get('compressione'),
+        'byte_sql': sum(voce.get('byte_sql', 0) for voce in manifest['tabelle']),
+        # Righe di ogni tabella al momento del backup (confrontate dalla verifica con test-restore)
+        'righe': {voce['nome']: voce.get('righe_totali', voce['righe']) for voce in manifest['tabelle']},
+        'durata_secondi': manifest.get('durata_secondi'),
+    }
+
+
+class CatalogoBackup:
+    """Catalogo dei backup di una cartella"""
+
+    def __init__(self, backup_dir):
+        self.backup_dir = Path(backup_dir)
+        self.percorso = self.backup_dir / NOME_CATALOGO
+
+    def _leggi(self):
+        try:
+            stat = os.stat(self.percorso)
+        except FileNotFoundError:
+            return None
+        firma = (stat.st_mtime_ns, stat.st_size)
+        in_cache = _cache.get(self.percorso)
+        if in_cache is None or in_cache[0] != firma:
+            with open(self.percorso, encoding='utf-8') as file_catalogo:
+                in_cache = (firma, json.load(file_catalogo)['backup'])
+            _cache[self.percorso] = in_cache
+        # Copie: le voci in cache non vanno modificate dai chiamanti
+        return [dict(voce) for voce in in_cache[1]]
+
+    def _scrivi(self, voci):
+        """Scrittura atomica: chi legge vede il catalogo precedente o quello nuovo, mai metà"""
+        voci = sorted(voci, key=lambda voce: voce['filename'], reverse=True)
+        descrittore, temporaneo = tempfile.mkstemp(prefix='catalogo_', suffix='.tmp', dir=self.backup_dir)
+        try:
+            with os.fdopen(descrittore, 'w', encoding='utf-8') as file_catalogo:
+                json.dump({'versione': VERSIONE_CATALOGO, 'backup': voci}, file_catalogo, indent=1)
+            os.replace(temporaneo, self.percorso)
+        except BaseException:
+            os.remove(temporaneo)
+            raise
+        _cache.pop(self.percorso, None)
+
+    def voci(self):
+        """
+        Voci del catalogo, dalla più recente (ricostruito dai file se manca).
+
+        Returns:
+            list: dict filename, formato, tipo, creato_il, byte, sha256, durata_secondi, righe, ...
+        """
+        with _lock:
+            voci = self._leggi()
+            if voci is None:
+                voci = self._ricostruisci()
+            return voci
+
+    def registra(self, voce):
+        """Aggiunge (o sostituisce) la voce di un backup"""
+        with _lock:
+            voci = [altra for altra in (self._leggi() or []) if altra['filename'] != voce['filename']]
+            self._scrivi(voci + [voce])
+
+    def aggiorna(self, filename, **campi):
+        """Aggiorna alcuni campi della voce di un backup (es. esito della verifica)"""
+        with _lock:
+            voci = self._leggi() or []
+            for voce in voci:
+                if voce['filename'] == filename:
+                    voce.update(campi)
+                    break
+            else:
+                return False
+            self._scrivi(voci)
+            return True
+
+    def rimuovi(self, *filenames):
+        with _lock:
+            voci = self._leggi() or []
+            rimaste = [voce for voce in voci if voce['filename'] not in filenames]
+            if len(rimaste) != len(voci):
+                self._scrivi(rimaste)
+
+    def ricostruisci(self):
+        """Ricostruisce il catalogo dai file nella cartella (SHA-256 e durata dei vecchi backup restano vuoti)"""
+        with _lock:
+            return self._ricostruisci()
+
+    def _ricostruisci(self):
+        from .backup_manager import ESTENSIONI_ARCHIVIO, ESTENSIONE_PARALLELO, formato_da_nome
+        from .backup_parallelo import leggi_manifest
+
+        precedenti = {voce['filename']: voce for voce in (self._leggi() or [])}
+        voci = []
+        for percorso in self.backup_dir.iterdir():
+            if not percorso.name.startswith('backup_') or not percorso.name.endswith(ESTENSIONI_ARCHIVIO):
+                continue
+            try:
+                stat = percorso.stat()
+                precedente = precedenti.get(percorso.name, {})
+                voce = {
+                    'filename': percorso.name,
+                    'formato': formato_da_nome(percorso.name),
+                    'tipo': 'completo',
+                    'creato_il': (
+                        timestamp_da_nome(percorso.name) or datetime.fromtimestamp(stat.st_mtime)
+                    ).isoformat(timespec='seconds'),
+                    'byte': stat.st_size,
+                    # L'hash calcolato alla creazione resta valido se il file non è cambiato
+                    'sha256': precedente.get('sha256') if precedente.get('byte') == stat.st_size else None,
+                    'durata_secondi': precedente.get('durata_secondi'),
+                    'byte_sql': precedente.get('byte_sql'),
+                    'righe': precedente.get('righe'),
+                }
+                if percorso.suffix == ESTENSIONE_PARALLELO:
+                    voce.update(voce_da_manifest(leggi_manifest(percorso)))
+                voci.append(voce)
+            except Exception as e:
+                logger.warning(f"Backup {percorso.name} non aggiunto al catalogo: {e}")
+
+        self._scrivi(voci)
+        logger.info(f"Catalogo backup ricostruito: {len(voci)} backup")
+        return self._leggi()
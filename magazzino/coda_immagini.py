@@ -0,0 +1,245 @@
+"""
+Coda di elaborazione delle immagini degli articoli.
+
+Il caricamento di una foto salva subito l'articolo con l'immagine originale
+e stato_immagine 'in elaborazione'; la generazione delle rendition
+(immagini.py) avviene fuori dalla richiesta HTTP e il risultato viene
+salvato nell'archivio per contenuto (archivio_immagini.py).
+
+La coda è la tabella LavoroImmagine, quindi non serve alcun broker esterno:
+- accoda_elaborazione() crea il lavoro e, al commit della transazione,
+  sveglia un worker del pool di thread del processo
+- un worker prenota il prossimo lavoro con un UPDATE condizionale sullo
+  stato (due worker non possono prendere lo stesso lavoro) e lo esegue
+- un lavoro fallito viene ritentato con attesa crescente fino a
+  MAX_TENTATIVI, poi resta in ERRORE
+
+I lavori rimasti in coda (es. riavvio del server) si gestiscono con:
+    python manage.py coda_immagini              # stato della coda
+    python manage.py coda_immagini --drena      # elabora subito i lavori pendenti
+    python manage.py coda_immagini --riprova-errori
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+from .archivio_immagini import (
+    assegna_immagine_condivisa, calcola_hash, percorso_base, registra_immagine_condivisa
+)
+from .immagini import genera_rendition_articolo
+from .models import ImmagineCondivisa, LavoroImmagine, PezzoRicambio
+
+logger = logging.getLogger(__name__)
+
+
+MAX_TENTATIVI = 3
+# Attesa prima del tentativo n: RITARDO_BASE_SECONDI * 2^(n-1)
+RITARDO_BASE_SECONDI = 30
+# Un lavoro IN_CORSO da più di così è di un worker interrotto e torna in coda
+TIMEOUT_LAVORO = timedelta(minutes=10)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMMAGINI_WORKERS', 2),
+                thread_name_prefix='coda-immagini'
+            )
+        return _executor
+
+
+def accoda_elaborazione(articolo, hash_contenuto):
+    """
+    Accoda l'elaborazione dell'immagine corrente dell'articolo (hash_contenuto: vedi archivio_immagini).
+    Il worker parte solo dopo il commit, quando il lavoro è visibile agli altri thread.
+    """
+    lavoro = LavoroImmagine.objects.create(
+        articolo=articolo,
+        nome_file=articolo.immagine.name,
+        hash_contenuto=hash_contenuto
+    )
+    transaction.on_commit(avvia_worker)
+    logger.info(f"[IMG_CODA] Accodato lavoro {lavoro.pk}: {lavoro.nome_file}")
+    return lavoro
+
+
+def avvia_worker():
+    """Esegue drena_coda() in un thread del pool (IMMAGINI_WORKERS thread per processo)"""
+    _get_executor().submit(_esegui_worker)
+
+
+def _esegui_worker():
+    try:
+        drena_coda()
+        _pianifica_riprova()
+    except Exception:
+        logger.exception("[IMG_CODA] Worker interrotto")
+    finally:
+        # Ogni thread ha la sua connessione al database
+        connection.close()
+
+
+def _pianifica_riprova():
+    """Sveglia di nuovo un worker quando scade l'attesa del prossimo lavoro da ritentare"""
+    prossimo = LavoroImmagine.objects.filter(stato=LavoroImmagine.IN_CODA).aggregate(
+        prossimo=Min('eseguibile_dal')
+    )['prossimo']
+    if prossimo is None:
+        return
+    timer = threading.Timer(max((prossimo - timezone.now()).total_seconds(), 1), avvia_worker)
+    timer.daemon = True
+    timer.start()
+
+
+def rimetti_in_coda_bloccati():
+    """Riporta in coda i lavori IN_CORSO da oltre TIMEOUT_LAVORO (worker interrotto)"""
+    adesso = timezone.now()
+    return LavoroImmagine.objects.filter(
+        stato=LavoroImmagine.IN_CORSO,
+        modificato_il__lt=adesso - TIMEOUT_LAVORO
+    ).update(stato=LavoroImmagine.IN_CODA, modificato_il=adesso)
+
+
+def prenota_lavoro():
+    """
+    Prenota il prossimo lavoro eseguibile passandolo IN_CORSO e contando il tentativo.
+
+    Returns:
+        LavoroImmagine prenotato, oppure None se non ci sono lavori eseguibili
+    """
+    while True:
+        adesso = timezone.now()
+        candidati = list(
+            LavoroImmagine.objects.filter(
+                stato=LavoroImmagine.IN_CODA,
+                eseguibile_dal__lte=adesso
+            ).order_by('eseguibile_dal', 'pk').values_list('pk', flat=True)[:10]
+        )
+        if not candidati:
+            return None
+        for pk in candidati:
+            # UPDATE condizionale: un solo worker vede la riga aggiornata
+            prenotato = LavoroImmagine.objects.filter(pk=pk, stato=LavoroImmagine.IN_CODA).update(
+                stato=LavoroImmagine.IN_CORSO,
+                tentativi=F('tentativi') + 1,
+                modificato_il=adesso
+            )
+            if prenotato:
+                lavoro = LavoroImmagine.objects.select_related('articolo').filter(pk=pk).first()
+                if lavoro is not None:
+                    return lavoro
+
+
+def _registra_errore(lavoro, errore):
+    """Rimette in coda il lavoro con attesa crescente, o lo chiude in ERRORE dopo MAX_TENTATIVI"""
+    if lavoro.tentativi >= MAX_TENTATIVI:
+        LavoroImmagine.objects.filter(pk=lavoro.pk).update(
+            stato=LavoroImmagine.ERRORE,
+            errore=str(errore)[:1000],
+            modificato_il=timezone.now()
+        )
+        PezzoRicambio.objects.filter(pk=lavoro.articolo_id, immagine=lavoro.nome_file).update(
+            stato_immagine=PezzoRicambio.IMMAGINE_ERRORE,
+            modificato_il=timezone.now()
+        )
+        logger.error(f"[IMG_CODA] Lavoro {lavoro.pk} fallito dopo {lavoro.tentativi} tentativi: {errore}")
+        return
+
+    ritardo = timedelta(seconds=RITARDO_BASE_SECONDI * 2 ** (lavoro.tentativi - 1))
+    LavoroImmagine.objects.filter(pk=lavoro.pk).update(
+        stato=LavoroImmagine.IN_CODA,
+        errore=str(errore)[:1000],
+        eseguibile_dal=timezone.now() + ritardo,
+        modificato_il=timezone.now()
+    )
+    logger.warning(f"[IMG_CODA] Lavoro {lavoro.pk} fallito (tentativo {lavoro.tentativi}), nuovo tentativo tra {ritardo}")
+
+
+def elabora_lavoro(lavoro):
+    """
+    Genera le rendition di un lavoro prenotato e le assegna all'articolo.
+
+    Returns:
+        bool: False se l'elaborazione è fallita (il lavoro è stato rimesso in coda o chiuso in errore)
+    """
+    articolo = lavoro.articolo
+    storage = articolo.immagine.storage
+
+    if articolo.immagine.name != lavoro.nome_file:
+        # Immagine sostituita o rimossa dopo l'accodamento: il lavoro non serve più
+        logger.info(f"[IMG_CODA] Lavoro {lavoro.pk} superato da una nuova immagine, skip")
+    else:
+        try:
+            hash_contenuto = lavoro.hash_contenuto
+            if not hash_contenuto:
+                # Lavori accodati prima dell'archivio per contenuto
+                with storage.open(lavoro.nome_file, 'rb') as originale:
+                    hash_contenuto = calcola_hash(originale)
+            if not ImmagineCondivisa.objects.filter(hash_contenuto=hash_contenuto).exists():
+                # Contenuto nuovo (altrimenti un altro lavoro lo ha già archiviato: nulla da generare)
+                nomi, formati, larghezze = genera_rendition_articolo(
+                    lavoro.nome_file, percorso_base(hash_contenuto), storage
+                )
+                registra_immagine_condivisa(hash_contenuto, nomi['large'], nomi['thumb'], formati, larghezze)
+            assegnata = assegna_immagine_condivisa(articolo.pk, lavoro.nome_file, hash_contenuto)
+        except Exception as e:
+            _registra_errore(lavoro, e)
+            return False
+
+        if assegnata:
+            storage.delete(lavoro.nome_file)
+        logger.info(f"[IMG_CODA] Lavoro {lavoro.pk} completato: {percorso_base(hash_contenuto)}")
+
+    LavoroImmagine.objects.filter(pk=lavoro.pk).update(
+        stato=LavoroImmagine.COMPLETATO,
+        errore=None,
+        modificato_il=timezone.now()
+    )
+    return True
+
+
+def drena_coda(limite=None):
+    """
+    Elabora i lavori eseguibili finché la coda è vuota (o fino a limite lavori).
+
+    Returns:
+        tuple: (lavori completati, lavori falliti)
+    """
+    rimetti_in_coda_bloccati()
+    completati = falliti = 0
+    while limite is None or completati + falliti < limite:
+        lavoro = prenota_lavoro()
+        if lavoro is None:
+            break
+        if elabora_lavoro(lavoro):
+            completati += 1
+        else:
+            falliti += 1
+    return completati, falliti
+
+
+def riprova_errori():
+    """Rimette in coda i lavori in ERRORE azzerando i tentativi"""
+    lavori = LavoroImmagine.objects.filter(stato=LavoroImmagine.ERRORE)
+    PezzoRicambio.objects.filter(
+        pk__in=lavori.values('articolo_id'),
+        stato_immagine=PezzoRicambio.IMMAGINE_ERRORE
+    ).update(stato_immagine=PezzoRicambio.IMMAGINE_IN_ELABORAZIONE, modificato_il=timezone.now())
+    return lavori.update(
+        stato=LavoroImmagine.IN_CODA,
+        tentativi=0,
+        eseguibile_dal=timezone.now(),
+        modificato_il=timezone.now()
+    )
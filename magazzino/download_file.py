@@ -0,0 +1,140 @@
+"""
+Download di file grandi (i backup) riprendibili e senza tenere occupati i worker Python.
+
+risposta_download() serve un file su disco con:
+- ETag e Last-Modified dai metadati del file (dimensione e data di modifica,
+  nessuna lettura): If-None-Match / If-Modified-Since rispondono 304
+- Range con una sola porzione (206 Partial Content): un download interrotto,
+  es. su VPN lenta, riprende da dove si era fermato; If-Range fa ripartire
+  da zero se nel frattempo il file è cambiato
+- FileResponse sul file aperto e posizionato: per le porzioni fino alla
+  fine del file (ogni ripresa) il server WSGI può inviarlo con
+  wsgi.file_wrapper/sendfile, senza copiarlo attraverso Python
+- con un proxy davanti (proxy='x-sendfile' per Apache mod_xsendfile,
+  'x-accel' per nginx) la risposta contiene solo l'header: il file, Range
+  compresi, lo invia il proxy e il worker si libera subito
+"""
+
+import os
+import re
+
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+
+# Blocchi letti quando il file passa da Python (FileResponse usa 4 KB)
+BLOCCO_DOWNLOAD = 256 * 1024
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class _Porzione:
+    """
+    Lettura limitata a lunghezza byte dalla posizione corrente del file.
+    Senza fileno né tell: il server non la invia con sendfile fino alla fine
+    del file e FileResponse non ricalcola Content-Length.
+    """
+
+    def __init__(self, file, lunghezza):
+        self.file = file
+        self.rimanenti = lunghezza
+
+    def read(self, dimensione=-1):
+        if dimensione < 0 or dimensione > self.rimanenti:
+            dimensione = self.rimanenti
+        dati = self.file.read(dimensione) if dimensione else b''
+        self.rimanenti -= len(dati)
+        return dati
+
+    def close(self):
+        self.file.close()
+
+
+def porzione_richiesta(intestazione, dimensione):
+    """
+    Porzione richiesta dall'header Range.
+
+    Returns:
+        tuple: (primo byte, ultimo byte incluso), None per l'intero file
+               (Range assente, non valido o con più porzioni: si può ignorare)
+
+    Raises:
+        ValueError: porzione fuori dal file (416 Range Not Satisfiable)
+    """
+    trovato = _RANGE.match((intestazione or '').strip())
+    if not trovato or trovato.groups() == ('', ''):
+        return None
+    inizio, fine = trovato.groups()
+    if not inizio:
+        # bytes=-N: gli ultimi N byte
+        if int(fine) == 0 or dimensione == 0:
+            raise ValueError(intestazione)
+        return max(dimensione - int(fine), 0), dimensione - 1
+    inizio = int(inizio)
+    fine = min(int(fine), dimensione - 1) if fine else dimensione - 1
+    if inizio >= dimensione:
+        raise ValueError(intestazione)
+    if fine < inizio:
+        return None
+    return inizio, fine
+
+
+def risposta_download(request, percorso, content_type, proxy=None, url_interno=None):
+    """
+    Risposta che scarica il file percorso come allegato.
+
+    Args:
+        proxy: None, 'x-sendfile' o 'x-accel'
+        url_interno: percorso della location interna di nginx (solo per 'x-accel')
+    """
+    stat = os.stat(percorso)
+    etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    modificato = int(stat.st_mtime)
+
+    non_modificato = get_conditional_response(request, etag=etag, last_modified=modificato)
+    if non_modificato is not None:
+        return non_modificato
+
+    nome = os.path.basename(percorso)
+    if proxy:
+        response = HttpResponse(content_type=content_type)
+        if proxy == 'x-accel':
+            response['X-Accel-Redirect'] = url_interno
+        else:
+            response['X-Sendfile'] = str(percorso)
+        response['Content-Disposition'] = content_disposition_header(True, nome)
+        return response
+
+    porzione = None
+    se_range = request.headers.get('If-Range')
+    if se_range is None or se_range == etag or parse_http_date_safe(se_range) == modificato:
+        try:
+            porzione = porzione_richiesta(request.headers.get('Range'), stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+    file = open(percorso, 'rb')
+    if porzione is None:
+        response = FileResponse(file, as_attachment=True, filename=nome, content_type=content_type)
+    else:
+        inizio, fine = porzione
+        file.seek(inizio)
+        if fine == stat.st_size - 1:
+            # Fino alla fine del file: FileResponse calcola la lunghezza, sendfile resta possibile
+            contenuto = file
+        else:
+            contenuto = _Porzione(file, fine - inizio + 1)
+        response = FileResponse(
+            contenuto, status=206, as_attachment=True, filename=nome, content_type=content_type
+        )
+        response['Content-Length'] = fine - inizio + 1
+        response['Content-Range'] = f'bytes {inizio}-{fine}/{stat.st_size}'
+
+    response.block_size = BLOCCO_DOWNLOAD
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modificato)
+    return response
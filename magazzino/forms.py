@@ -20,21 +20,64 @@ from .models import (
 # ============================================================================
 
 class MatricolaSelectWidget(forms.Select):
-    """Widget personalizzato per le matricole che aggiunge data-modello-id"""
+    """
+    Widget personalizzato per le matricole che aggiunge data-modello-id.
+    Il modello viene letto dall'istanza già caricata dal queryset del campo
+    (nessuna query per opzione); per scelte non-model si usa una mappa
+    {id_matricola: id_modello} caricata una sola volta per render.
+    """
+    
+    def get_context(self, name, value, attrs):
+        self._modelli_per_matricola = None
+        return super().get_context(name, value, attrs)
+    
+    def _get_modello_id(self, value):
+        istanza = getattr(value, 'instance', None)
+        if istanza is not None:
+            return istanza.modello_id
+        
+        if getattr(self, '_modelli_per_matricola', None) is None:
+            self._modelli_per_matricola = dict(
+                MatricolaMacchinaSCM.objects.values_list('id_matricola', 'modello_id')
+            )
+        try:
+            return self._modelli_per_matricola.get(int(value))
+        except (ValueError, TypeError):
+            return None
     
     def create_option(self, name, value, label, selected, index, subindex=None, attrs=None):
         option = super().create_option(name, value, label, selected, index, subindex, attrs)
         if value:
-            try:
-                # Converti value in intero se necessario
-                value_id = int(value.value) if hasattr(value, 'value') else int(value)
-                matricola = MatricolaMacchinaSCM.objects.select_related('modello').get(pk=value_id)
-                option['attrs']['data-modello-id'] = str(matricola.modello.id_modello)
-            except (MatricolaMacchinaSCM.DoesNotExist, AttributeError, ValueError, TypeError):
-                pass
+            modello_id = self._get_modello_id(value)
+            if modello_id is not None:
+                option['attrs']['data-modello-id'] = str(modello_id)
         return option
 
 
+class ArticoloAutocompleteWidget(forms.Select):
+    """
+    Select per l'articolo che contiene solo l'opzione selezionata.
+    Le altre opzioni vengono caricate su richiesta dall'API di autocompletamento
+    (data-autocomplete-url), invece di serializzare tutto il catalogo nell'HTML.
+    """
+    
+    def __init__(self, attrs=None):
+        from django.urls import reverse_lazy
+        attrs = {'data-autocomplete-url': reverse_lazy('magazzino:api_articolo_autocomplete'), **(attrs or {})}
+        super().__init__(attrs)
+    
+    def optgroups(self, name, value, attrs=None):
+        ids = [v for v in value if str(v).isdigit()]
+        articoli = PezzoRicambio.objects.filter(pk__in=ids) if ids else []
+        scelte = [('', '---------')] + [(articolo.pk, str(articolo)) for articolo in articoli]
+        
+        groups = []
+        for index, (option_value, label) in enumerate(scelte):
+            selected = str(option_value) in value
+            groups.append((None, [self.create_option(name, option_value, label, selected, index, attrs=attrs)], index))
+        return groups
+
+
 # ============================================================================
 # BACKUP SETTINGS FORM
 # ============================================================================
@@ -61,11 +104,74 @@ class BackupSettingsForm(forms.Form):
             'min': '1',
             'max': '365',
         }),
-        label=_('Giorni di Conservazione'),
-        help_text=_('Numero di giorni per cui conservare i backup prima della pulizia automatica'),
+        label=_('Backup Giornalieri'),
+        help_text=_('Giorni per cui conservare l\'ultimo backup di ogni giorno'),
         initial=30,
     )
     
+    conserva_orari = forms.IntegerField(
+        min_value=0,
+        max_value=168,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+            'min': '0',
+            'max': '168',
+        }),
+        label=_('Backup Orari'),
+        help_text=_('Ore per cui conservare l\'ultimo backup di ogni ora (0 = nessuno)'),
+        initial=24,
+    )
+    
+    conserva_settimanali = forms.IntegerField(
+        min_value=0,
+        max_value=520,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+            'min': '0',
+            'max': '520',
+        }),
+        label=_('Backup Settimanali'),
+        help_text=_('Settimane per cui conservare l\'ultimo backup di ogni settimana'),
+        initial=8,
+    )
+    
+    conserva_mensili = forms.IntegerField(
+        min_value=0,
+        max_value=240,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+            'min': '0',
+            'max': '240',
+        }),
+        label=_('Backup Mensili'),
+        help_text=_('Mesi per cui conservare l\'ultimo backup di ogni mese'),
+        initial=12,
+    )
+    
+    orari = forms.CharField(
+        max_length=200,
+        required=False,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': '02:00, 13:30',
+        }),
+        label=_('Orari Backup Completi'),
+        help_text=_('Orari dei backup automatici separati da virgola (vuoto = nessuno); richiede il comando pianifica_backup'),
+    )
+    
+    intervallo_incrementale = forms.IntegerField(
+        min_value=0,
+        max_value=1440,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+            'min': '0',
+            'max': '1440',
+        }),
+        label=_('Intervallo Incrementali (minuti)'),
+        help_text=_('Minuti tra due backup incrementali automatici (0 = nessuno)'),
+        initial=0,
+    )
+    
     mysql_bin_path = forms.CharField(
         max_length=500,
         widget=forms.TextInput(attrs={
@@ -77,6 +183,54 @@ class BackupSettingsForm(forms.Form):
         required=True,
     )
     
+    compressione = forms.ChoiceField(
+        choices=[
+            ('gzip', 'gzip (.sql.gz)'),
+            ('zstd', 'zstd (.sql.zst) - più veloce, richiede il modulo zstandard'),
+        ],
+        widget=forms.Select(attrs={
+            'class': 'form-select',
+        }),
+        label=_('Compressione'),
+        help_text=_('Formato dei nuovi backup: il dump viene compresso mentre mysqldump lo scrive'),
+        initial='gzip',
+    )
+    
+    livello_compressione = forms.IntegerField(
+        min_value=1,
+        max_value=19,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+            'min': '1',
+            'max': '19',
+        }),
+        label=_('Livello di Compressione'),
+        help_text=_('gzip 1-9, zstd 1-19: valori alti producono file più piccoli ma backup più lenti'),
+        initial=6,
+    )
+    
+    parallelo = forms.BooleanField(
+        required=False,
+        widget=forms.CheckboxInput(attrs={
+            'class': 'form-check-input',
+        }),
+        label=_('Backup parallelo per tabella'),
+        help_text=_('Ogni tabella in un file compresso, esportate in parallelo da uno snapshot consistente (archivio .tar)'),
+    )
+    
+    processi = forms.IntegerField(
+        min_value=1,
+        max_value=16,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+            'min': '1',
+            'max': '16',
+        }),
+        label=_('Processi Paralleli'),
+        help_text=_('Tabelle esportate o ripristinate contemporaneamente nei backup paralleli'),
+        initial=4,
+    )
+    
     def clean_backup_dir(self):
         """Valida che la cartella di backup sia accessibile"""
         backup_dir = self.cleaned_data.get('backup_dir')
@@ -96,6 +250,16 @@ class BackupSettingsForm(forms.Form):
         
         return backup_dir
     
+    def clean_orari(self):
+        """Valida e normalizza gli orari (es. '2:00,13:30' -> '02:00, 13:30')"""
+        from .pianificazione_backup import leggi_orari
+        
+        try:
+            orari = leggi_orari(self.cleaned_data.get('orari'))
+        except ValueError:
+            raise forms.ValidationError(_('Orari non validi: usare HH:MM separati da virgola (es. 02:00, 13:30)'))
+        return ', '.join(orario.strftime('%H:%M') for orario in orari)
+    
     def clean_mysql_bin_path(self):
         """Valida che mysqldump.exe esista nel percorso specificato"""
         mysql_path = self.cleaned_data.get('mysql_bin_path')
@@ -113,6 +277,21 @@ class BackupSettingsForm(forms.Form):
             raise forms.ValidationError(_(f'mysql.exe non trovato in: {mysql_path}'))
         
         return mysql_path
+    
+    def clean(self):
+        """Verifica formato e livello di compressione"""
+        cleaned_data = super().clean()
+        compressione = cleaned_data.get('compressione')
+        livello = cleaned_data.get('livello_compressione')
+        
+        if compressione == 'zstd':
+            from .backup_manager import zstd_disponibile
+            if not zstd_disponibile():
+                self.add_error('compressione', _('Modulo zstandard non installato (pip install zstandard)'))
+        elif compressione == 'gzip' and livello and livello > 9:
+            self.add_error('livello_compressione', _('Per gzip il livello massimo è 9'))
+        
+        return cleaned_data
 
 
 # ============================================================================
@@ -203,13 +382,12 @@ class CategoriaForm(forms.ModelForm):
         
         # Popola le categorie padre (solo quelle che non causerebbero loop)
         if self.instance and self.instance.pk:
-            # In modifica: escludi se stessa e i suoi discendenti
-            excluded_ids = [self.instance.pk] + self.instance.get_all_children_ids()
+            # In modifica: escludi se stessa e tutti i suoi discendenti (percorso materializzato)
             # Mostra solo categorie di livello 0 e 1 (max 2 livelli sotto)
             self.fields['categoria_padre'].queryset = Categoria.objects.filter(
                 stato_attivo=True,
                 livello__lt=2
-            ).exclude(pk__in=excluded_ids).order_by('livello', 'ordine', 'nome_categoria')
+            ).exclude(percorso__startswith=self.instance.percorso).order_by('livello', 'ordine', 'nome_categoria')
             
             # Pre-popola i campi virtuali in base alla categoria_padre attuale
             if self.instance.categoria_padre:
@@ -225,7 +403,7 @@ class CategoriaForm(forms.ModelForm):
                         self.fields['categoria_livello2'].queryset = Categoria.objects.filter(
                             categoria_padre=self.instance.categoria_padre.categoria_padre,
                             stato_attivo=True
-                        ).exclude(pk__in=excluded_ids).order_by('ordine', 'nome_categoria')
+                        ).exclude(percorso__startswith=self.instance.percorso).order_by('ordine', 'nome_categoria')
         else:
             # In creazione: mostra tutte fino a livello 1
             self.fields['categoria_padre'].queryset = Categoria.objects.filter(
@@ -402,6 +580,8 @@ class PezzoRicambioForm(forms.ModelForm):
         self.fields['modello_macchina_scm'].label = _('Modello Macchina')
         
         # matricola_macchina_scm usa già MatricolaSelectWidget dal Meta.widgets
+        # select_related: l'etichetta di ogni matricola mostra il nome del modello
+        self.fields['matricola_macchina_scm'].queryset = MatricolaMacchinaSCM.objects.select_related('modello')
         self.fields['matricola_macchina_scm'].required = False
         self.fields['matricola_macchina_scm'].label = _('Matricola Macchina')
         
@@ -687,6 +867,10 @@ class MovimentoMagazzinoForm(forms.ModelForm):
             'articolo', 'tipo_movimento', 'quantita', 'fornitore',
             'causale', 'numero_documento', 'note'
         )
+        widgets = {
+            # Opzioni caricate su richiesta (ricerca per codice o descrizione)
+            'articolo': ArticoloAutocompleteWidget,
+        }
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -0,0 +1,315 @@
+"""
+Elaborazione delle immagini degli articoli.
+
+Dalle immagini caricate si generano le RENDITION_ARTICOLO:
+- large: immagine principale ottimizzata (max 800x800px, qualità 90%)
+- medio: immagine per card e anteprime (max 400x400px)
+- thumb: thumbnail (300x300px con crop centrato, qualità 85%)
+- icona: miniatura per le liste (64x64px con crop centrato)
+
+Ogni rendition è salvata in JPEG (sempre supportato dai browser) e nei
+formati alternativi abilitati in IMMAGINI_FORMATI_ALTERNATIVI che Pillow
+sa codificare (WebP, AVIF), con lo stesso nome e diversa estensione.
+Il template tag immagine_articolo (templatetags/immagini_tags.py) li
+offre con <picture>/srcset, così il browser scarica il formato e la
+dimensione più piccoli adatti alla pagina; le larghezze effettive delle
+rendition (descrivi_larghezze) sono salvate con l'immagine, così il tag
+non deve aprire i file.
+
+genera_rendition() decodifica l'immagine una sola volta: per i JPEG usa
+Image.draft() per far scalare al decoder stesso (1/2, 1/4, 1/8) fino alla
+risoluzione minima che serve alla rendition più grande, converte in RGB una
+volta e ricava tutte le rendition da questa immagine intermedia.
+Per aggiungere un formato (es. icona 64px per le liste) basta una voce in
+RENDITION_ARTICOLO.
+
+Le funzioni vengono eseguite dai worker della coda immagini (coda_immagini.py),
+fuori dalla richiesta HTTP che ha caricato il file; i percorsi dei file
+sono decisi dall'archivio per contenuto (archivio_immagini.py). Confronto dei tempi con
+l'elaborazione di una rendition alla volta:
+    python manage.py benchmark_immagini
+"""
+
+import math
+import os
+from dataclasses import dataclass
+from io import BytesIO
+
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+
+@dataclass(frozen=True)
+class Rendition:
+    """Formato di un'immagine derivata"""
+
+    nome: str
+    dimensioni: tuple
+    qualita: int = 90
+    crop: bool = False
+
+
+# Rendition generate per ogni immagine articolo: 'large' va nel campo immagine,
+# 'thumb' in immagine_thumbnail, le altre accanto al thumbnail (vedi percorso_rendition)
+RENDITION_ARTICOLO = (
+    Rendition('large', (800, 800), qualita=90),
+    Rendition('medio', (400, 400), qualita=85),
+    Rendition('thumb', (300, 300), qualita=85, crop=True),
+    Rendition('icona', (64, 64), qualita=80, crop=True),
+)
+
+# Chiave della larghezza effettiva tra i formati di una rendition generata (vedi genera_rendition):
+# senza ritaglio le proporzioni restano e l'immagine non viene ingrandita, quindi può essere più stretta
+LARGHEZZA = 'larghezza'
+
+# Formati di codifica: estensione -> (formato Pillow, MIME type)
+FORMATI = {
+    'jpg': ('JPEG', 'image/jpeg'),
+    'webp': ('WEBP', 'image/webp'),
+    'avif': ('AVIF', 'image/avif'),
+}
+
+
+def formato_supportato(estensione):
+    """True se Pillow (o un suo plugin) sa codificare il formato"""
+    Image.init()
+    return FORMATI[estensione][0] in Image.SAVE
+
+
+def formati_alternativi():
+    """Formati da generare oltre al JPEG: quelli abilitati nelle impostazioni e supportati da Pillow"""
+    return [
+        estensione for estensione in getattr(settings, 'IMMAGINI_FORMATI_ALTERNATIVI', ('webp', 'avif'))
+        if formato_supportato(estensione)
+    ]
+
+
+def _converti_rgb(img):
+    """Converte in RGB, mettendo su sfondo bianco le immagini con trasparenza"""
+    if img.mode in ('RGBA', 'LA', 'P'):
+        # Crea uno sfondo bianco
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+        return background
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+
+def _codifica(img, qualita, estensione='jpg'):
+    output = BytesIO()
+    if estensione == 'jpg':
+        img.save(output, format='JPEG', quality=qualita, optimize=True)
+    elif estensione == 'webp':
+        img.save(output, format='WEBP', quality=qualita, method=4)
+    else:
+        # AVIF a parità di resa visiva lavora con qualità nominali più basse
+        img.save(output, format=FORMATI[estensione][0], quality=max(qualita - 25, 50))
+    return ContentFile(output.getvalue())
+
+
+def process_image(image_file, max_size, quality=90, crop=False):
+    """
+    Processa un'immagine: ridimensiona, converte in JPEG e ottimizza.
+    Decodifica il file a ogni chiamata: per più formati dello stesso file
+    usare genera_rendition().
+
+    Args:
+        image_file: File immagine da processare
+        max_size: Dimensione massima (larghezza, altezza) in pixel
+        quality: Qualità JPEG (0-100)
+        crop: Se True, ritaglia al centro per ottenere dimensioni esatte
+
+    Returns:
+        ContentFile con l'immagine processata
+    """
+    img = _converti_rgb(Image.open(image_file))
+
+    # Ridimensiona l'immagine
+    if crop:
+        # Crop centrato per thumbnail (dimensioni esatte)
+        img = ImageOps.fit(img, max_size, Image.Resampling.LANCZOS)
+    else:
+        # Ridimensiona mantenendo aspect ratio (per immagine grande)
+        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+    return _codifica(img, quality)
+
+
+def _scala_necessaria(dimensioni_originali, rendition):
+    """Fattore di scala minimo dell'originale che basta a generare la rendition senza perdere dettaglio"""
+    larghezza, altezza = dimensioni_originali
+    fattori = (rendition.dimensioni[0] / larghezza, rendition.dimensioni[1] / altezza)
+    # Il crop deve coprire tutto il riquadro, il ridimensionamento starci dentro
+    return min(max(fattori) if rendition.crop else min(fattori), 1)
+
+
+def decodifica_intermedia(image_file, renditions=RENDITION_ARTICOLO):
+    """
+    Decodifica l'immagine una sola volta alla risoluzione minima che serve
+    a tutte le rendition, già convertita in RGB.
+    """
+    img = Image.open(image_file)
+    scala = max(_scala_necessaria(img.size, rendition) for rendition in renditions)
+    richiesta = (max(1, math.ceil(img.width * scala)), max(1, math.ceil(img.height * scala)))
+
+    # Solo per i JPEG: il decoder scala di 1/2, 1/4 o 1/8 restando >= richiesta
+    img.draft('RGB', richiesta)
+    img = _converti_rgb(img)
+
+    # Riduzione intera veloce (box) verso la risoluzione richiesta, il resto lo fa LANCZOS
+    fattore = min(img.width // richiesta[0], img.height // richiesta[1])
+    if fattore >= 2:
+        img = img.reduce(fattore)
+    return img
+
+
+def genera_rendition(image_file, renditions=RENDITION_ARTICOLO, formati=('jpg',)):
+    """
+    Genera tutte le rendition, in tutti i formati, da un'unica decodifica dell'immagine.
+
+    Returns:
+        dict: nome rendition -> {estensione: ContentFile, LARGHEZZA: larghezza effettiva in pixel}
+    """
+    intermedia = decodifica_intermedia(image_file, renditions)
+    risultato = {}
+    for rendition in renditions:
+        if rendition.crop:
+            img = ImageOps.fit(intermedia, rendition.dimensioni, Image.Resampling.LANCZOS)
+        else:
+            img = intermedia.copy()
+            img.thumbnail(rendition.dimensioni, Image.Resampling.LANCZOS)
+        risultato[rendition.nome] = {
+            estensione: _codifica(img, rendition.qualita, estensione) for estensione in formati
+        }
+        risultato[rendition.nome][LARGHEZZA] = img.width
+    return risultato
+
+
+def descrivi_larghezze(rendition):
+    """Larghezze delle rendition generate da salvare con l'immagine: 'large:800 medio:400 ...'"""
+    return ' '.join(f"{nome}:{per_formato[LARGHEZZA]}" for nome, per_formato in rendition.items())
+
+
+def leggi_larghezze(testo):
+    """Larghezze salvate da descrivi_larghezze(): dict nome rendition -> pixel"""
+    larghezze = {}
+    for voce in (testo or '').split():
+        nome, _, larghezza = voce.partition(':')
+        if larghezza.isdigit():
+            larghezze[nome] = int(larghezza)
+    return larghezze
+
+
+def percorso_rendition(nome_thumbnail, nome_rendition):
+    """Percorso nello storage (JPEG) di una rendition aggiuntiva, derivato dal thumbnail"""
+    return f"{os.path.splitext(nome_thumbnail)[0]}_{nome_rendition}.jpg"
+
+
+def percorso_formato(nome_file, estensione):
+    """Percorso della stessa rendition in un altro formato"""
+    return f"{os.path.splitext(nome_file)[0]}.{estensione}"
+
+
+def percorsi_rendition_articolo(nome_immagine, nome_thumbnail):
+    """
+    Percorsi JPEG di tutte le rendition di un articolo.
+
+    Returns:
+        dict: nome rendition -> percorso nello storage
+    """
+    percorsi = {}
+    for rendition in RENDITION_ARTICOLO:
+        if rendition.nome == 'large':
+            percorsi['large'] = nome_immagine
+        elif rendition.nome == 'thumb':
+            percorsi['thumb'] = nome_thumbnail
+        else:
+            percorsi[rendition.nome] = percorso_rendition(nome_thumbnail, rendition.nome)
+    return percorsi
+
+
+def elimina_rendition_aggiuntive(nome_immagine, nome_thumbnail, storage):
+    """
+    Elimina dallo storage le rendition aggiuntive e i formati alternativi
+    di un articolo (immagine e thumbnail JPEG restano a carico dei campi).
+    """
+    if not nome_thumbnail:
+        # Immagine non ancora elaborata: nessuna rendition derivata
+        return
+    for nome, percorso in percorsi_rendition_articolo(nome_immagine, nome_thumbnail).items():
+        if not percorso:
+            continue
+        if nome not in ('large', 'thumb'):
+            storage.delete(percorso)
+        for estensione in FORMATI:
+            if estensione != 'jpg':
+                storage.delete(percorso_formato(percorso, estensione))
+
+
+def _salva_sostituendo(storage, percorso, contenuto):
+    """Salva con il percorso esatto: i percorsi derivati appartengono all'immagine appena creata"""
+    storage.delete(percorso)
+    return storage.save(percorso, contenuto)
+
+
+def salva_rendition(storage, base, rendition, formati):
+    """
+    Salva nello storage le rendition generate (ContentFile o bytes) sotto il prefisso base.
+
+    Returns:
+        dict: nome rendition -> nome file JPEG
+    """
+    nomi = percorsi_rendition_articolo(f"{base}_large.jpg", f"{base}_thumb.jpg")
+    for nome, percorso in nomi.items():
+        for estensione in formati:
+            contenuto = rendition[nome][estensione]
+            if isinstance(contenuto, bytes):
+                contenuto = ContentFile(contenuto)
+            _salva_sostituendo(storage, percorso_formato(percorso, estensione), contenuto)
+    return nomi
+
+
+def genera_rendition_articolo(nome_originale, base, storage):
+    """
+    Genera le RENDITION_ARTICOLO dal file originale caricato, in JPEG e
+    nei formati_alternativi().
+
+    Immagine principale e thumbnail vengono salvate come <base>_large.jpg e
+    <base>_thumb.jpg, le altre rendition accanto al thumbnail e i formati
+    alternativi accanto al rispettivo JPEG.
+
+    Returns:
+        tuple: (dict nome rendition -> nome file JPEG, lista estensioni generate,
+                larghezze da descrivi_larghezze())
+    """
+    formati = ['jpg'] + formati_alternativi()
+
+    with storage.open(nome_originale, 'rb') as originale:
+        rendition = genera_rendition(originale, formati=formati)
+
+    return salva_rendition(storage, base, rendition, formati), formati, descrivi_larghezze(rendition)
+
+
+def genera_rendition_file(percorso, formati=('jpg',)):
+    """
+    Genera le rendition di un file su disco restituendone i byte.
+
+    Non usa né database né impostazioni Django: adatta a un ProcessPoolExecutor
+    (vedi il comando importa_immagini).
+
+    Returns:
+        dict: nome rendition -> {estensione: bytes, LARGHEZZA: pixel}
+    """
+    with open(percorso, 'rb') as file:
+        rendition = genera_rendition(file, formati=formati)
+    return {
+        nome: {
+            **{estensione: per_formato[estensione].read() for estensione in formati},
+            LARGHEZZA: per_formato[LARGHEZZA],
+        }
+        for nome, per_formato in rendition.items()
+    }
@@ -0,0 +1,187 @@
+"""
+Calcolo aggregato dei KPI di magazzino per dashboard e report.
+
+Tutti gli indicatori vengono calcolati con una sola query di aggregazione
+condizionale (Count/Sum con filter=...) per tabella: una su pezzi_ricambio
+e una su giacenze.
+
+Lo snapshot viene salvato nella cache di Django e invalidato dai signals
+su PezzoRicambio, Giacenza e MovimentoMagazzino (vedi signals.py); il
+timeout KPI_CACHE_TIMEOUT fa da rete di sicurezza per le modifiche che
+non passano dai signals (es. QuerySet.update()) o da altri processi.
+"""
+
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Trim
+
+from .models import Giacenza, PezzoRicambio
+
+
+# Numero massimo di query eseguite da calcola_kpi_snapshot() (usato anche dai test)
+KPI_QUERY_BUDGET = 2
+
+# Cache snapshot KPI
+KPI_CACHE_KEY = 'magazzino:kpi_snapshot'
+KPI_CACHE_TIMEOUT = 300  # secondi
+KPI_CACHE_HIT_KEY = 'magazzino:kpi_snapshot:hit'
+KPI_CACHE_MISS_KEY = 'magazzino:kpi_snapshot:miss'
+
+
+def calcola_percentuale(parziale, totale):
+    """Percentuale arrotondata a un decimale, 0 se il totale è nullo"""
+    if totale <= 0:
+        return 0
+    return round((parziale / totale) * 100, 1)
+
+
+@dataclass(frozen=True)
+class KpiSnapshot:
+    """Fotografia degli indicatori di articoli e giacenze"""
+
+    articoli_attivi: int = 0
+    articoli_non_attivi: int = 0
+    articoli_con_foto: int = 0
+    articoli_con_codice_scm: int = 0
+    articoli_con_codice_fornitore: int = 0
+    articoli_sotto_soglia: int = 0
+    giacenze_articoli: int = 0
+    totale_disponibile: int = 0
+    totale_impegnata: int = 0
+    totale_prenotata: int = 0
+
+    @property
+    def copertura_foto_pct(self):
+        return calcola_percentuale(self.articoli_con_foto, self.articoli_attivi)
+
+    @property
+    def copertura_codice_scm_pct(self):
+        return calcola_percentuale(self.articoli_con_codice_scm, self.articoli_attivi)
+
+    @property
+    def copertura_codice_fornitore_pct(self):
+        return calcola_percentuale(self.articoli_con_codice_fornitore, self.articoli_attivi)
+
+    @property
+    def indice_completezza_pct(self):
+        """Media delle tre coperture (foto, codice SCM, codice fornitore)"""
+        return round(
+            (
+                self.copertura_foto_pct
+                + self.copertura_codice_scm_pct
+                + self.copertura_codice_fornitore_pct
+            ) / 3,
+            1
+        )
+
+    @property
+    def giacenze(self):
+        """Totali giacenze nel formato atteso dai template (chiavi total_*)"""
+        return {
+            'total_articoli': self.giacenze_articoli,
+            'total_disponibile': self.totale_disponibile,
+            'total_impegnata': self.totale_impegnata,
+            'total_prenotata': self.totale_prenotata,
+        }
+
+
+def _aggrega_articoli():
+    """Una query su pezzi_ricambio per tutti i contatori articoli"""
+    attivo = Q(stato_attivo=True)
+
+    return PezzoRicambio.objects.annotate(
+        codice_scm_pulito=Trim('codice_scm'),
+        codice_fornitore_pulito=Trim('codice_fornitore'),
+    ).aggregate(
+        articoli_attivi=Count('pk', filter=attivo),
+        articoli_non_attivi=Count('pk', filter=Q(stato_attivo=False)),
+        articoli_con_foto=Count(
+            'pk',
+            filter=attivo & Q(immagine__isnull=False) & ~Q(immagine='')
+        ),
+        articoli_con_codice_scm=Count(
+            'pk',
+            filter=attivo & Q(codice_scm__isnull=False) & ~Q(codice_scm_pulito='')
+        ),
+        articoli_con_codice_fornitore=Count(
+            'pk',
+            filter=attivo & Q(codice_fornitore__isnull=False) & ~Q(codice_fornitore_pulito='')
+        ),
+        articoli_sotto_soglia=Count(
+            'pk',
+            filter=attivo & Q(giacenza__quantita_disponibile__lt=F('giacenza_minima'))
+        ),
+    )
+
+
+def _aggrega_giacenze():
+    """Una query su giacenze per i totali di stock"""
+    return Giacenza.objects.aggregate(
+        giacenze_articoli=Count('articolo'),
+        totale_disponibile=Sum('quantita_disponibile'),
+        totale_impegnata=Sum('quantita_impegnata'),
+        totale_prenotata=Sum('quantita_prenotata'),
+    )
+
+
+def calcola_kpi_snapshot():
+    """
+    Calcola tutti i KPI di articoli e giacenze.
+
+    Returns:
+        KpiSnapshot con i contatori (esegue al massimo KPI_QUERY_BUDGET query)
+    """
+    valori = {**_aggrega_articoli(), **_aggrega_giacenze()}
+    return KpiSnapshot(**{chiave: valore or 0 for chiave, valore in valori.items()})
+
+
+def _incrementa_contatore(chiave):
+    """Incrementa un contatore in cache senza scadenza"""
+    cache.add(chiave, 0, timeout=None)
+    try:
+        cache.incr(chiave)
+    except ValueError:
+        # Chiave rimossa tra add() e incr() (es. cache.clear())
+        cache.set(chiave, 1, timeout=None)
+
+
+def get_kpi_snapshot():
+    """
+    Restituisce lo snapshot KPI dalla cache, ricalcolandolo solo se assente.
+
+    Returns:
+        KpiSnapshot
+    """
+    kpi = cache.get(KPI_CACHE_KEY)
+    if kpi is not None:
+        _incrementa_contatore(KPI_CACHE_HIT_KEY)
+        return kpi
+
+    _incrementa_contatore(KPI_CACHE_MISS_KEY)
+    kpi = calcola_kpi_snapshot()
+    cache.set(KPI_CACHE_KEY, kpi, timeout=KPI_CACHE_TIMEOUT)
+    return kpi
+
+
+def invalida_kpi_snapshot():
+    """Rimuove lo snapshot KPI dalla cache (chiamato dai signals)"""
+    cache.delete(KPI_CACHE_KEY)
+
+
+def statistiche_cache_kpi():
+    """
+    Contatori hit/miss della cache KPI (per il pannello amministratore).
+
+    Returns:
+        dict: {hit, miss, hit_ratio_pct, timeout}
+    """
+    hit = cache.get(KPI_CACHE_HIT_KEY, 0)
+    miss = cache.get(KPI_CACHE_MISS_KEY, 0)
+    return {
+        'hit': hit,
+        'miss': miss,
+        'hit_ratio_pct': calcola_percentuale(hit, hit + miss),
+        'timeout': KPI_CACHE_TIMEOUT,
+    }
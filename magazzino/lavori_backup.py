@@ -0,0 +1,277 @@
+"""
+Backup e ripristini avviati dalla pagina dei backup, eseguiti in background.
+
+Un mysqldump di un database grande dura minuti: dentro la richiesta HTTP
+occuperebbe un worker del server e supererebbe i timeout del proxy. Come
+per la coda immagini (coda_immagini.py) il lavoro è una riga di
+LavoroBackup eseguita da un thread del processo, senza broker esterni:
+- accoda_lavoro() crea la riga e, al commit, sveglia il thread
+- il thread prenota la riga con un UPDATE condizionale sullo stato e la
+  esegue con BackupManager; byte e tabelle completate vengono scritti
+  nella riga ogni INTERVALLO_AVANZAMENTO secondi
+- la pagina dei backup legge lo stato dalla vista JSON backup_stato
+
+Mai due lavori insieme: il campo attivo vale True per il lavoro in coda o
+in corso e NULL per gli altri, con un indice univoco, quindi una seconda
+richiesta contemporanea riceve il lavoro già avviato invece di lanciare un
+altro dump. Contro crea_backup, pianifica_backup e restore_backup da
+terminale vale il lock di BackupManager (_operazione_esclusiva).
+
+Un lavoro IN_CORSO che non aggiorna la riga da TIMEOUT_LAVORO appartiene a
+un processo terminato (riavvio del server) e viene chiuso in errore.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import LavoroBackup
+
+logger = logging.getLogger(__name__)
+
+
+# Secondi tra due scritture dell'avanzamento (fanno anche da segnale di vita del lavoro)
+INTERVALLO_AVANZAMENTO = 2
+# Un lavoro IN_CORSO fermo da più di così è di un processo terminato
+TIMEOUT_LAVORO = timedelta(minutes=2)
+# Per quanto la pagina dei backup mostra l'esito dell'ultimo lavoro concluso
+DURATA_ESITO = timedelta(minutes=10)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Un solo thread: i lavori sono comunque uno alla volta
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='lavori-backup')
+        return _executor
+
+
+def chiudi_interrotti():
+    """Chiude in errore i lavori IN_CORSO senza avanzamento da TIMEOUT_LAVORO"""
+    adesso = timezone.now()
+    return LavoroBackup.objects.filter(
+        stato=LavoroBackup.IN_CORSO,
+        modificato_il__lt=adesso - TIMEOUT_LAVORO
+    ).update(
+        stato=LavoroBackup.ERRORE,
+        attivo=None,
+        messaggio="Lavoro interrotto: il processo del server è terminato prima della fine",
+        completato_il=adesso,
+        modificato_il=adesso
+    )
+
+
+def lavoro_attivo():
+    """Lavoro in coda o in corso, None se non ce ne sono"""
+    return LavoroBackup.objects.filter(attivo=True).first()
+
+
+def accoda_lavoro(tipo, filename='', utente=''):
+    """
+    Accoda un backup (LavoroBackup.BACKUP) o il ripristino di filename
+    (LavoroBackup.RESTORE). Il thread parte solo dopo il commit.
+
+    Returns:
+        tuple: (LavoroBackup, creato: bool) - se un lavoro è già attivo, quello e False
+    """
+    chiudi_interrotti()
+    try:
+        with transaction.atomic():
+            lavoro = LavoroBackup.objects.create(tipo=tipo, filename=filename, utente=utente)
+    except IntegrityError:
+        lavoro = lavoro_attivo()
+        if lavoro is None:
+            # Concluso tra l'INSERT e la lettura: si riprova
+            return accoda_lavoro(tipo, filename, utente)
+        # Rimasto in coda senza thread (processo riavviato prima del commit): lo esegue questo processo
+        avvia_worker()
+        return lavoro, False
+
+    transaction.on_commit(avvia_worker)
+    logger.info(f"[BACKUP_LAVORI] Accodato lavoro {lavoro.pk}: {lavoro.get_tipo_display()} {filename}".rstrip())
+    return lavoro, True
+
+
+def avvia_worker():
+    """Esegue i lavori in coda nel thread dei lavori di backup"""
+    _get_executor().submit(_esegui_worker)
+
+
+def _esegui_worker():
+    try:
+        while True:
+            lavoro = prenota_lavoro()
+            if lavoro is None:
+                break
+            esegui_lavoro(lavoro)
+    except Exception:
+        logger.exception("[BACKUP_LAVORI] Worker interrotto")
+    finally:
+        # Ogni thread ha la sua connessione al database
+        connection.close()
+
+
+def prenota_lavoro():
+    """
+    Passa IN_CORSO il lavoro in coda (UPDATE condizionale: un solo processo lo vede aggiornato).
+
+    Returns:
+        LavoroBackup prenotato, oppure None
+    """
+    lavoro = LavoroBackup.objects.filter(stato=LavoroBackup.IN_CODA).order_by('creato_il').first()
+    if lavoro is None:
+        return None
+    prenotato = LavoroBackup.objects.filter(pk=lavoro.pk, stato=LavoroBackup.IN_CODA).update(
+        stato=LavoroBackup.IN_CORSO,
+        modificato_il=timezone.now()
+    )
+    if not prenotato:
+        return None
+    lavoro.stato = LavoroBackup.IN_CORSO
+    return lavoro
+
+
+class _Avanzamento(threading.Thread):
+    """
+    Raccoglie l'avanzamento (anche dai thread del restore parallelo) e lo
+    scrive nella riga del lavoro ogni INTERVALLO_AVANZAMENTO secondi, anche
+    se non cambia: la riga aggiornata dice che il lavoro è vivo.
+    """
+
+    def __init__(self, lavoro_id):
+        super().__init__(name=f'avanzamento-backup-{lavoro_id}', daemon=True)
+        self.lavoro_id = lavoro_id
+        self.campi = {}
+        self._lock = threading.Lock()
+        self._fine = threading.Event()
+
+    def aggiorna(self, **campi):
+        with self._lock:
+            self.campi.update(campi)
+
+    def valori(self):
+        with self._lock:
+            return dict(self.campi)
+
+    def run(self):
+        try:
+            while not self._fine.wait(INTERVALLO_AVANZAMENTO):
+                try:
+                    LavoroBackup.objects.filter(pk=self.lavoro_id).update(
+                        modificato_il=timezone.now(), **self.valori()
+                    )
+                except Exception as e:
+                    logger.warning(f"[BACKUP_LAVORI] Avanzamento del lavoro {self.lavoro_id} non salvato: {e}")
+        finally:
+            connection.close()
+
+    def ferma(self):
+        self._fine.set()
+        self.join()
+
+
+def _conta_tabelle():
+    """Tabelle che il backup salverà (per la barra di avanzamento)"""
+    from .backup_manager import TABELLE_ESCLUSE
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE' "
+            f"AND TABLE_NAME NOT IN ({', '.join(['%s'] * len(TABELLE_ESCLUSE))})",
+            list(TABELLE_ESCLUSE)
+        )
+        return cursor.fetchone()[0]
+
+
+def esegui_lavoro(lavoro):
+    """
+    Esegue un lavoro prenotato e ne registra l'esito.
+
+    Returns:
+        bool: True se il backup o il ripristino è riuscito
+    """
+    from .backup_manager import BackupManager
+
+    avanzamento = _Avanzamento(lavoro.pk)
+    avanzamento.start()
+    filename = lavoro.filename
+    try:
+        backup_mgr = BackupManager()
+        if lavoro.tipo == LavoroBackup.BACKUP:
+            avanzamento.aggiorna(tabelle_totali=_conta_tabelle())
+            success, percorso, messaggio = backup_mgr.create_backup(
+                progresso=lambda byte, tabelle: avanzamento.aggiorna(byte_elaborati=byte, tabelle_completate=tabelle)
+            )
+            if percorso is not None:
+                filename = percorso.name
+        else:
+            success, messaggio = backup_mgr.restore_backup(
+                lavoro.filename,
+                progresso=lambda letti, totali: avanzamento.aggiorna(byte_elaborati=letti, byte_totali=totali)
+            )
+    except Exception as e:
+        logger.exception(f"[BACKUP_LAVORI] Lavoro {lavoro.pk} fallito")
+        success, messaggio = False, f"Errore imprevisto: {e}"
+    finally:
+        avanzamento.ferma()
+
+    adesso = timezone.now()
+    LavoroBackup.objects.filter(pk=lavoro.pk).update(
+        stato=LavoroBackup.COMPLETATO if success else LavoroBackup.ERRORE,
+        attivo=None,
+        filename=filename,
+        messaggio=messaggio,
+        completato_il=adesso,
+        modificato_il=adesso,
+        **avanzamento.valori()
+    )
+    if success:
+        logger.info(f"[BACKUP_LAVORI] Lavoro {lavoro.pk} completato ({lavoro.utente}): {messaggio}")
+    else:
+        logger.error(f"[BACKUP_LAVORI] Lavoro {lavoro.pk} fallito ({lavoro.utente}): {messaggio}")
+    return success
+
+
+def ultimo_lavoro():
+    """Lavoro attivo o, se concluso da meno di DURATA_ESITO, l'ultimo lavoro (per la pagina dei backup)"""
+    chiudi_interrotti()
+    lavoro = LavoroBackup.objects.first()
+    if lavoro is None or lavoro.attivo or (lavoro.completato_il and lavoro.completato_il >= timezone.now() - DURATA_ESITO):
+        return lavoro
+    return None
+
+
+def stato_lavoro(lavoro):
+    """Stato del lavoro per la vista JSON e la pagina dei backup"""
+    if lavoro is None:
+        return None
+    fine = lavoro.completato_il or timezone.now()
+    return {
+        'id': lavoro.pk,
+        'tipo': lavoro.tipo,
+        'tipo_display': str(lavoro.get_tipo_display()),
+        'stato': lavoro.stato,
+        'stato_display': str(lavoro.get_stato_display()),
+        'attivo': bool(lavoro.attivo),
+        'filename': lavoro.filename,
+        'utente': lavoro.utente,
+        'mb_elaborati': round(lavoro.byte_elaborati / (1024 * 1024), 1),
+        'percentuale': (
+            min(round(lavoro.byte_elaborati * 100 / lavoro.byte_totali), 100) if lavoro.byte_totali
+            else min(round(lavoro.tabelle_completate * 100 / lavoro.tabelle_totali), 100) if lavoro.tabelle_totali
+            else None
+        ),
+        'tabelle_completate': lavoro.tabelle_completate,
+        'tabelle_totali': lavoro.tabelle_totali,
+        'secondi': round((fine - lavoro.creato_il).total_seconds()),
+        'messaggio': lavoro.messaggio,
+    }
@@ -13,6 +13,7 @@ Opzioni:
 
 from django.core.management.base import BaseCommand
 from django.db import transaction
+from django.utils import timezone
 from magazzino.codici import genera_codice_articolo
 from magazzino.models import PezzoRicambio
 import logging
@@ -60,12 +61,14 @@ class Command(BaseCommand):
             with transaction.atomic():
                 for id_articolo, _, _ in articoli_da_allineare:
                     PezzoRicambio.objects.filter(id_articolo=id_articolo).update(
-                        codice_interno=f"{CODICE_ARTICOLO_PLACEHOLDER_PREFIX}{id_articolo:05d}"
+                        codice_interno=f"{CODICE_ARTICOLO_PLACEHOLDER_PREFIX}{id_articolo:05d}",
+                        modificato_il=timezone.now()
                     )
 
                 for id_articolo, _, nuovo_codice in articoli_da_allineare:
                     PezzoRicambio.objects.filter(id_articolo=id_articolo).update(
-                        codice_interno=nuovo_codice
+                        codice_interno=nuovo_codice,
+                        modificato_il=timezone.now()
                     )
 
         # Riepilogo finale
@@ -0,0 +1,77 @@
+"""
+Management command per misurare il costo CPU dell'elaborazione immagini.
+
+Confronta, sulla stessa immagine, la generazione delle RENDITION_ARTICOLO
+con una decodifica per rendition (process_image) e con una sola
+decodifica condivisa (genera_rendition):
+    python manage.py benchmark_immagini
+    python manage.py benchmark_immagini --file foto.jpg --ripetizioni 20
+"""
+
+import time
+from io import BytesIO
+
+from PIL import Image
+from django.core.management.base import BaseCommand, CommandError
+from magazzino.immagini import RENDITION_ARTICOLO, genera_rendition, process_image
+
+
+def _immagine_sintetica(larghezza, altezza):
+    """JPEG di prova con dettaglio simile a una foto (gradienti e rumore)"""
+    canali = [
+        Image.linear_gradient('L').resize((larghezza, altezza)),
+        Image.effect_noise((larghezza, altezza), 48),
+        Image.radial_gradient('L').resize((larghezza, altezza)),
+    ]
+    output = BytesIO()
+    Image.merge('RGB', canali).save(output, format='JPEG', quality=92)
+    return output.getvalue()
+
+
+class Command(BaseCommand):
+    help = 'Confronta il tempo CPU per upload tra elaborazione per rendition e decodifica unica'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Immagine da usare (default: JPEG sintetico)')
+        parser.add_argument(
+            '--dimensioni',
+            default='4000x3000',
+            help='Dimensioni del JPEG sintetico, es. 4000x3000 (foto da smartphone)'
+        )
+        parser.add_argument('--ripetizioni', type=int, default=10)
+
+    def handle(self, *args, **options):
+        if options['file']:
+            with open(options['file'], 'rb') as f:
+                dati = f.read()
+        else:
+            try:
+                larghezza, altezza = (int(valore) for valore in options['dimensioni'].lower().split('x'))
+            except ValueError:
+                raise CommandError('Dimensioni non valide, usare LARGHEZZAxALTEZZA')
+            dati = _immagine_sintetica(larghezza, altezza)
+
+        with Image.open(BytesIO(dati)) as img:
+            self.stdout.write(f'Immagine: {img.format} {img.width}x{img.height}, {len(dati) / 1024:.0f} KB')
+
+        def per_rendition():
+            for rendition in RENDITION_ARTICOLO:
+                process_image(BytesIO(dati), rendition.dimensioni, rendition.qualita, rendition.crop)
+
+        def decodifica_unica():
+            genera_rendition(BytesIO(dati))
+
+        ripetizioni = options['ripetizioni']
+        risultati = {}
+        for nome, funzione in (('Una decodifica per rendition', per_rendition), ('Decodifica unica', decodifica_unica)):
+            funzione()  # riscaldamento
+            inizio = time.process_time()
+            for _ in range(ripetizioni):
+                funzione()
+            risultati[nome] = (time.process_time() - inizio) / ripetizioni * 1000
+            self.stdout.write(f'  {nome}: {risultati[nome]:.1f} ms CPU per upload')
+
+        prima, dopo = risultati.values()
+        self.stdout.write(self.style.SUCCESS(
+            f'Risparmio: {prima - dopo:.1f} ms per upload ({(prima - dopo) / prima * 100:.0f}%)'
+        ))
@@ -0,0 +1,38 @@
+"""
+Management command per consultare o ricostruire il catalogo dei backup
+(catalogo.json nella cartella dei backup, vedi catalogo_backup.py).
+
+Uso:
+    python manage.py catalogo_backup                 # elenco con SHA-256, durata e righe
+    python manage.py catalogo_backup --ricostruisci  # dopo copie o cancellazioni manuali
+"""
+
+from django.core.management.base import BaseCommand
+from magazzino.backup_manager import BackupManager
+
+
+class Command(BaseCommand):
+    help = 'Mostra o ricostruisce il catalogo dei backup'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ricostruisci',
+            action='store_true',
+            help='Ricostruisce il catalogo dai file presenti nella cartella dei backup'
+        )
+    
+    def handle(self, *args, **options):
+        backup_mgr = BackupManager()
+        
+        if options['ricostruisci']:
+            voci = backup_mgr.catalogo.ricostruisci()
+            self.stdout.write(self.style.SUCCESS(f'Catalogo ricostruito: {len(voci)} backup in {backup_mgr.backup_dir}'))
+        
+        for backup in backup_mgr.list_backups():
+            durata = f"{backup['durata_secondi']:.1f}s" if backup['durata_secondi'] is not None else '-'
+            righe = backup['righe_totali'] if backup['righe_totali'] is not None else '-'
+            self.stdout.write(
+                f"{backup['filename']}\n"
+                f"   {backup['formato']} | {backup['size_mb']:.2f} MB | durata {durata} | righe {righe} | "
+                f"SHA-256 {backup['sha256'] or '-'}"
+            )
@@ -0,0 +1,85 @@
+"""
+Management command per ispezionare ed elaborare la coda immagini.
+
+I lavori vengono eseguiti in background dai worker del server web; dopo un
+riavvio o per elaborare subito i lavori pendenti:
+    python manage.py coda_immagini                  # stato della coda
+    python manage.py coda_immagini --drena          # elabora i lavori eseguibili
+    python manage.py coda_immagini --riprova-errori --drena
+    python manage.py coda_immagini --pulisci 30     # elimina i completati più vecchi di 30 giorni
+    python manage.py coda_immagini --ricalcola-riferimenti
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+from magazzino.archivio_immagini import ricalcola_riferimenti
+from magazzino.coda_immagini import drena_coda, riprova_errori
+from magazzino.models import LavoroImmagine
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Mostra lo stato della coda immagini e ne elabora i lavori pendenti'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--drena',
+            action='store_true',
+            help='Elabora subito tutti i lavori eseguibili'
+        )
+        parser.add_argument(
+            '--riprova-errori',
+            action='store_true',
+            help='Rimette in coda i lavori falliti azzerando i tentativi'
+        )
+        parser.add_argument(
+            '--pulisci',
+            type=int,
+            metavar='GIORNI',
+            help='Elimina i lavori completati da più di GIORNI giorni'
+        )
+        parser.add_argument(
+            '--ricalcola-riferimenti',
+            action='store_true',
+            help='Riallinea i riferimenti delle immagini condivise ed elimina quelle non più usate'
+        )
+
+    def handle(self, *args, **options):
+        if options['riprova_errori']:
+            rimessi = riprova_errori()
+            self.stdout.write(f'Lavori in errore rimessi in coda: {rimessi}')
+
+        if options['drena']:
+            completati, falliti = drena_coda()
+            self.stdout.write(self.style.SUCCESS(f'Lavori completati: {completati}'))
+            if falliti:
+                self.stdout.write(self.style.WARNING(f'Lavori falliti: {falliti}'))
+            logger.info(f'[IMG_CODA] Coda drenata: {completati} completati, {falliti} falliti.')
+
+        if options['pulisci'] is not None:
+            eliminati, _ = LavoroImmagine.objects.filter(
+                stato=LavoroImmagine.COMPLETATO,
+                modificato_il__lt=timezone.now() - timedelta(days=options['pulisci'])
+            ).delete()
+            self.stdout.write(f'Lavori completati eliminati: {eliminati}')
+
+        if options['ricalcola_riferimenti']:
+            eliminate = ricalcola_riferimenti()
+            self.stdout.write(f'Immagini condivise non più usate eliminate: {eliminate}')
+
+        conteggi = dict(
+            LavoroImmagine.objects.values_list('stato').annotate(totale=Count('pk')).order_by()
+        )
+        self.stdout.write('Stato coda immagini:')
+        for stato, etichetta in LavoroImmagine.STATO_CHOICES:
+            self.stdout.write(f'  {etichetta}: {conteggi.get(stato, 0)}')
+
+        for lavoro in LavoroImmagine.objects.filter(stato=LavoroImmagine.ERRORE).select_related('articolo')[:10]:
+            self.stdout.write(self.style.ERROR(
+                f'  {lavoro.articolo.codice_interno} - {lavoro.nome_file}: {lavoro.errore}'
+            ))
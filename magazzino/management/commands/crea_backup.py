@@ -0,0 +1,72 @@
+"""
+Management command per creare un backup del database da terminale o da
+un'operazione pianificata (Utilità di pianificazione di Windows, cron).
+
+Uso:
+    python manage.py crea_backup                  # formato da impostazioni
+    python manage.py crea_backup --parallelo      # backup completo per tabella (.tar)
+    python manage.py crea_backup --incrementale   # solo modifiche dall'ultimo backup parallelo
+    python manage.py crea_backup --differenziale  # solo modifiche dall'ultimo backup completo
+
+Schema tipico: un backup --parallelo la notte e un --incrementale ogni ora.
+Il primo --incrementale senza un backup parallelo completo da cui partire
+crea un backup completo. Per backup a orari fissi e conservazione GFS: pianifica_backup.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from magazzino.backup_manager import BackupManager
+
+
+class Command(BaseCommand):
+    help = 'Crea un backup del database (completo, parallelo o incrementale)'
+    
+    def add_arguments(self, parser):
+        tipo = parser.add_mutually_exclusive_group()
+        tipo.add_argument(
+            '--parallelo',
+            action='store_true',
+            help='Backup completo per tabella, in parallelo (.tar)'
+        )
+        tipo.add_argument(
+            '--incrementale',
+            action='store_true',
+            help='Solo le righe modificate o cancellate dall\'ultimo backup parallelo'
+        )
+        tipo.add_argument(
+            '--differenziale',
+            action='store_true',
+            help='Solo le righe modificate o cancellate dall\'ultimo backup parallelo completo'
+        )
+        
+        parser.add_argument(
+            '--processi',
+            type=int,
+            default=None,
+            help='Tabelle esportate in parallelo (default: impostazione backup_processi)'
+        )
+        
+        parser.add_argument(
+            '--pulizia',
+            action='store_true',
+            help='Applica poi la conservazione (elimina i backup non più conservati)'
+        )
+    
+    def handle(self, *args, **options):
+        backup_mgr = BackupManager()
+        
+        if options['incrementale'] or options['differenziale']:
+            success, _, message = backup_mgr.create_backup_incrementale(
+                differenziale=options['differenziale'], processi=options['processi']
+            )
+        elif options['parallelo']:
+            success, _, message = backup_mgr.create_backup_parallelo(options['processi'])
+        else:
+            success, _, message = backup_mgr.create_backup()
+        
+        if not success:
+            raise CommandError(message)
+        self.stdout.write(self.style.SUCCESS(f'✅ {message}'))
+        
+        if options['pulizia']:
+            _, message = backup_mgr.cleanup_old_backups()
+            self.stdout.write(message)
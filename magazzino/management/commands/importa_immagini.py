@@ -0,0 +1,292 @@
+"""
+Management command per importare in blocco le foto degli articoli da una cartella.
+
+I file vengono abbinati agli articoli per nome (senza estensione), confrontato
+con codice interno e/o codice SCM ignorando maiuscole e separatori:
+    ART-00012.jpg, art00012.png  -> articolo con codice interno ART-00012
+    07L0320061B.jpg              -> articoli con codice SCM 07L0320061B
+
+Le rendition sono generate in parallelo da un ProcessPoolExecutor e salvate
+nell'archivio per contenuto (archivio_immagini.py): le foto identiche sono
+elaborate una sola volta. Gli articoli vengono aggiornati a blocchi con
+bulk_update, quindi un'interruzione perde al massimo il blocco in corso e
+rilanciando il comando le foto già importate vengono saltate.
+
+Uso:
+    python manage.py importa_immagini D:\\Foto\\Ricambi
+    python manage.py importa_immagini D:\\Foto\\Ricambi --campo codice_scm --processi 4
+    python manage.py importa_immagini D:\\Foto\\Ricambi --sostituisci --dry-run
+"""
+
+import hashlib
+import os
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from magazzino.archivio_immagini import assegna_immagini_in_blocco, percorso_base
+from magazzino.immagini import descrivi_larghezze, formati_alternativi, genera_rendition_file, salva_rendition
+from magazzino.kpi import invalida_kpi_snapshot
+from magazzino.models import ImmagineCondivisa, PezzoRicambio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+ESTENSIONI_IMMAGINE = {'.jpg', '.jpeg', '.png', '.webp'}
+
+# Foto inviate ai processi e non ancora lette, per processo (limita la memoria con migliaia di foto)
+MAX_IN_VOLO_PER_PROCESSO = 2
+_SEPARATORI = re.compile(r'[^0-9A-Z]')
+
+
+def normalizza_codice(codice):
+    """Codice confrontabile con il nome file: 'art-00012' -> 'ART00012'"""
+    return _SEPARATORI.sub('', str(codice or '').upper())
+
+
+def _hash_file(percorso):
+    sha = hashlib.sha256()
+    with open(percorso, 'rb') as file:
+        for blocco in iter(lambda: file.read(1024 * 1024), b''):
+            sha.update(blocco)
+    return sha.hexdigest()
+
+
+class Command(BaseCommand):
+    help = 'Importa in blocco le foto degli articoli da una cartella, abbinandole per codice'
+
+    def add_arguments(self, parser):
+        parser.add_argument('cartella', help='Cartella con le foto (sottocartelle comprese)')
+        parser.add_argument(
+            '--campo',
+            choices=['codice_interno', 'codice_scm', 'tutti'],
+            default='tutti',
+            help='Codice con cui abbinare i nomi dei file (default: entrambi)'
+        )
+        parser.add_argument(
+            '--processi',
+            type=int,
+            default=os.cpu_count() or 2,
+            help='Processi paralleli per l\'elaborazione (default: numero di CPU)'
+        )
+        parser.add_argument(
+            '--blocco',
+            type=int,
+            default=50,
+            help='Immagini salvate per transazione (default: 50)'
+        )
+        parser.add_argument(
+            '--sostituisci',
+            action='store_true',
+            help='Sostituisce anche le immagini già presenti (default: salta gli articoli con immagine)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostra gli abbinamenti senza elaborare né salvare nulla'
+        )
+
+    def handle(self, *args, **options):
+        cartella = options['cartella']
+        if not os.path.isdir(cartella):
+            raise CommandError(f'Cartella non trovata: {cartella}')
+        inizio = time.monotonic()
+
+        indice = self._indice_codici(options['campo'])
+        abbinati, non_abbinati = self._abbina_file(cartella, indice)
+        self.stdout.write(
+            f'File immagine: {len(abbinati) + len(non_abbinati)}, '
+            f'abbinati: {len(abbinati)}, senza articolo: {len(non_abbinati)}'
+        )
+
+        lavori, saltati = self._pianifica(abbinati, options['sostituisci'])
+        noti = self._hash_archiviati(lavori)
+        da_elaborare = [hash_contenuto for hash_contenuto in lavori if hash_contenuto not in noti]
+        self.stdout.write(
+            f'Articoli da aggiornare: {sum(len(lavoro["articoli"]) for lavoro in lavori.values())}, '
+            f'già a posto o con immagine: {saltati}, '
+            f'foto da elaborare: {len(da_elaborare)}, già in archivio: {len(noti)}'
+        )
+        if options['dry_run']:
+            for percorso in non_abbinati[:20]:
+                self.stdout.write(self.style.WARNING(f'  Senza articolo: {percorso}'))
+            return
+
+        # Foto già in archivio: basta collegare gli articoli
+        aggiornati = self._collega(lavori, list(noti))
+
+        elaborati, errori, aggiornati_nuovi = self._elabora(lavori, da_elaborare, options)
+        aggiornati += aggiornati_nuovi
+        invalida_kpi_snapshot()
+
+        durata = time.monotonic() - inizio
+        self.stdout.write(self.style.SUCCESS(
+            f'Importazione completata in {durata:.1f}s: {elaborati} foto elaborate, '
+            f'{aggiornati} articoli aggiornati, {errori} errori.'
+        ))
+        logger.info(
+            f'[IMG_IMPORT] {cartella}: {elaborati} foto elaborate, {aggiornati} articoli aggiornati, '
+            f'{errori} errori in {durata:.1f}s.'
+        )
+
+    def _indice_codici(self, campo):
+        """Indice in memoria codice normalizzato -> id articoli (una sola query)"""
+        campi = ['codice_interno', 'codice_scm'] if campo == 'tutti' else [campo]
+        indice = defaultdict(list)
+        for valori in PezzoRicambio.objects.values('pk', *campi).iterator(chunk_size=2000):
+            for nome_campo in campi:
+                codice = normalizza_codice(valori[nome_campo])
+                if codice and valori['pk'] not in indice[codice]:
+                    indice[codice].append(valori['pk'])
+        return indice
+
+    def _abbina_file(self, cartella, indice):
+        """
+        Returns:
+            tuple: (lista (percorso, id articoli), lista percorsi senza articolo)
+        """
+        abbinati = []
+        non_abbinati = []
+        for radice, _, nomi in os.walk(cartella):
+            for nome in sorted(nomi):
+                base, estensione = os.path.splitext(nome)
+                if estensione.lower() not in ESTENSIONI_IMMAGINE:
+                    continue
+                percorso = os.path.join(radice, nome)
+                articoli = indice.get(normalizza_codice(base))
+                if articoli:
+                    abbinati.append((percorso, articoli))
+                else:
+                    non_abbinati.append(percorso)
+        return abbinati, non_abbinati
+
+    def _pianifica(self, abbinati, sostituisci):
+        """
+        Raggruppa per contenuto gli articoli da aggiornare, saltando quelli già a posto
+        (è ciò che rende il comando riprendibile) e, senza --sostituisci, quelli con immagine.
+
+        Returns:
+            tuple: (dict hash -> {'percorso', 'articoli'}, articoli saltati)
+        """
+        stato_articoli = {
+            valori['pk']: valori
+            for valori in PezzoRicambio.objects.filter(
+                pk__in={articolo_id for _, articoli in abbinati for articolo_id in articoli}
+            ).values('pk', 'immagine', 'immagine_condivisa__hash_contenuto')
+        }
+        lavori = {}
+        assegnati = set()
+        saltati = 0
+        for percorso, articoli in abbinati:
+            hash_contenuto = _hash_file(percorso)
+            for articolo_id in articoli:
+                stato = stato_articoli[articolo_id]
+                if articolo_id in assegnati:
+                    # Più file per lo stesso articolo: vale il primo
+                    self.stdout.write(self.style.WARNING(f'  Ignorato {percorso}: articolo già abbinato a un altro file'))
+                    continue
+                assegnati.add(articolo_id)
+                if stato['immagine_condivisa__hash_contenuto'] == hash_contenuto or (stato['immagine'] and not sostituisci):
+                    saltati += 1
+                    continue
+                lavoro = lavori.setdefault(hash_contenuto, {'percorso': percorso, 'articoli': []})
+                lavoro['articoli'].append(articolo_id)
+        return lavori, saltati
+
+    def _hash_archiviati(self, lavori):
+        hash_lavori = list(lavori)
+        noti = set()
+        for inizio in range(0, len(hash_lavori), 1000):
+            noti.update(ImmagineCondivisa.objects.filter(
+                hash_contenuto__in=hash_lavori[inizio:inizio + 1000]
+            ).values_list('hash_contenuto', flat=True))
+        return noti
+
+    def _collega(self, lavori, hash_contenuti):
+        assegnazioni = {
+            articolo_id: hash_contenuto
+            for hash_contenuto in hash_contenuti
+            for articolo_id in lavori[hash_contenuto]['articoli']
+        }
+        return assegna_immagini_in_blocco(assegnazioni) if assegnazioni else 0
+
+    def _salva_blocco(self, lavori, blocco, formati):
+        """Scrive le rendition del blocco nell'archivio e collega gli articoli"""
+        storage = PezzoRicambio._meta.get_field('immagine').storage
+        nuove = []
+        for hash_contenuto, rendition in blocco:
+            nomi = salva_rendition(storage, percorso_base(hash_contenuto), rendition, formati)
+            nuove.append(ImmagineCondivisa(
+                hash_contenuto=hash_contenuto,
+                nome_immagine=nomi['large'],
+                nome_thumbnail=nomi['thumb'],
+                formati=' '.join(formati),
+                larghezze=descrivi_larghezze(rendition),
+            ))
+        ImmagineCondivisa.objects.bulk_create(nuove, ignore_conflicts=True)
+        return self._collega(lavori, [hash_contenuto for hash_contenuto, _ in blocco])
+
+    def _elabora(self, lavori, da_elaborare, options):
+        """
+        Genera le rendition in parallelo e le salva a blocchi man mano che sono pronte.
+
+        Returns:
+            tuple: (foto elaborate, errori, articoli aggiornati)
+        """
+        if not da_elaborare:
+            return 0, 0, 0
+
+        # I processi ricevono solo percorsi e formati: nessun accesso a database o impostazioni
+        formati = ['jpg'] + formati_alternativi()
+        elaborati = errori = aggiornati = 0
+        blocco = []
+        inizio = time.monotonic()
+
+        processi = max(1, options['processi'])
+        da_inviare = iter(da_elaborare)
+        with ProcessPoolExecutor(max_workers=processi) as executor:
+            # Al più MAX_IN_VOLO_PER_PROCESSO foto per processo inviate e non ancora lette, le altre
+            # vengono inviate man mano: le rendition codificate restano in memoria solo fino al loro blocco
+            in_volo = {}
+            while True:
+                for hash_contenuto in islice(da_inviare, processi * MAX_IN_VOLO_PER_PROCESSO - len(in_volo)):
+                    future = executor.submit(genera_rendition_file, lavori[hash_contenuto]['percorso'], formati)
+                    in_volo[future] = hash_contenuto
+                if not in_volo:
+                    break
+
+                completati, _ = wait(in_volo, return_when=FIRST_COMPLETED)
+                for future in completati:
+                    hash_contenuto = in_volo.pop(future)
+                    try:
+                        blocco.append((hash_contenuto, future.result()))
+                    except Exception as e:
+                        errori += 1
+                        self.stdout.write(self.style.ERROR(f'  {lavori[hash_contenuto]["percorso"]}: {e}'))
+                        continue
+
+                    if len(blocco) >= options['blocco']:
+                        aggiornati += self._salva_blocco(lavori, blocco, formati)
+                        elaborati += len(blocco)
+                        blocco = []
+                        self._progresso(elaborati + errori, len(da_elaborare), inizio)
+
+            if blocco:
+                aggiornati += self._salva_blocco(lavori, blocco, formati)
+                elaborati += len(blocco)
+                self._progresso(elaborati + errori, len(da_elaborare), inizio)
+
+        return elaborati, errori, aggiornati
+
+    def _progresso(self, fatti, totale, inizio):
+        durata = max(time.monotonic() - inizio, 0.001)
+        velocita = fatti / durata
+        rimanenti = (totale - fatti) / velocita if velocita else 0
+        self.stdout.write(
+            f'  {fatti}/{totale} foto ({fatti / totale * 100:.0f}%), '
+            f'{velocita:.1f} foto/s, fine stimata tra {rimanenti:.0f}s'
+        )
@@ -0,0 +1,63 @@
+"""
+Management command che esegue i backup pianificati e la conservazione GFS.
+
+Orari e livelli di conservazione si impostano nella pagina Impostazioni
+backup (vedi pianificazione_backup.py). Due modi d'uso:
+    python manage.py pianifica_backup             # da cron / Utilità di pianificazione ogni 5-15 minuti
+    python manage.py pianifica_backup --daemon    # processo sempre attivo, controlla ogni minuto
+    python manage.py pianifica_backup --dry-run   # mostra backup dovuto e backup da eliminare
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from magazzino.pianificazione_backup import esegui_pianificazione
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Crea i backup pianificati dovuti ed elimina quelli fuori dalla conservazione'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--daemon',
+            action='store_true',
+            help='Resta attivo e controlla la pianificazione a intervalli regolari'
+        )
+        parser.add_argument(
+            '--intervallo',
+            type=int,
+            default=60,
+            help='Secondi tra due controlli con --daemon (default: 60)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostra cosa verrebbe fatto senza creare né eliminare backup'
+        )
+
+    def handle(self, *args, **options):
+        if not options['daemon']:
+            self._esegui(options['dry_run'])
+            return
+
+        self.stdout.write(f'Pianificazione backup attiva (controllo ogni {options["intervallo"]}s, Ctrl+C per uscire)')
+        try:
+            while True:
+                # Il processo resta aperto per giorni: niente connessioni scadute (wait_timeout di MySQL)
+                close_old_connections()
+                try:
+                    self._esegui(options['dry_run'])
+                except Exception as e:
+                    logger.exception(f'[BACKUP_PIANIFICATI] Errore: {e}')
+                    self.stdout.write(self.style.ERROR(f'Errore: {e}'))
+                time.sleep(max(options['intervallo'], 1))
+        except KeyboardInterrupt:
+            self.stdout.write('Pianificazione backup interrotta')
+
+    def _esegui(self, dry_run):
+        for messaggio in esegui_pianificazione(dry_run=dry_run):
+            self.stdout.write(messaggio)
@@ -5,12 +5,15 @@ Uso emergenza quando l'interfaccia web non è accessibile:
     python manage.py restore_backup <filename>
     python manage.py restore_backup --list
     python manage.py restore_backup --latest
+    python manage.py restore_backup <backup parallelo .tar> --processi 8
+    python manage.py restore_backup <backup incrementale _inc.tar>   (ripristina tutta la catena)
 """
 
 from django.core.management.base import BaseCommand, CommandError
 from magazzino.backup_manager import BackupManager
 from pathlib import Path
 import sys
+import time
 
 
 class Command(BaseCommand):
@@ -36,12 +39,34 @@ class Command(BaseCommand):
             help='Ripristina il backup più recente'
         )
         
+        parser.add_argument(
+            '--processi',
+            type=int,
+            default=None,
+            help='Client mysql contemporanei per i backup paralleli .tar (default: impostazione backup_processi)'
+        )
+        
         parser.add_argument(
             '--force',
             action='store_true',
             help='Salta la conferma interattiva (PERICOLOSO!)'
         )
     
+    def _mostra_progresso(self, letti, totali):
+        """Avanzamento sui byte compressi consumati (al massimo un aggiornamento ogni mezzo secondo)"""
+        adesso = time.monotonic()
+        if letti < totali and adesso - getattr(self, '_ultimo_progresso', 0) < 0.5:
+            return
+        self._ultimo_progresso = adesso
+        
+        percentuale = letti * 100 // max(totali, 1)
+        barra = '#' * (percentuale // 5)
+        self.stdout.write(
+            f"\r   [{barra:<20}] {percentuale:3d}%  {letti / (1024 * 1024):.1f}/{totali / (1024 * 1024):.1f} MB",
+            ending=''
+        )
+        self.stdout.flush()
+    
     def handle(self, *args, **options):
         backup_mgr = BackupManager()
         
@@ -61,7 +86,7 @@ class Command(BaseCommand):
                 
                 self.stdout.write(
                     f"{i}. {backup['filename']}\n"
-                    f"   Data: {timestamp} | Dimensione: {size} | Età: {age}\n"
+                    f"   Data: {timestamp} | Dimensione: {size} | Età: {age} | Formato: {backup['formato']}\n"
                 )
             
             return
@@ -83,12 +108,26 @@ class Command(BaseCommand):
                 'oppure --latest per ripristinare il più recente.'
             )
         
+        try:
+            catena = backup_mgr.catena_backup(filename)
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+        except Exception:
+            # File inesistente o non leggibile: l'errore lo riporta restore_backup
+            catena = [filename]
+        
         # Conferma operazione (se non --force)
         if not options['force']:
+            descrizione_catena = ''
+            if len(catena) > 1:
+                descrizione_catena = '  Catena incrementale (in ordine):\n' + ''.join(
+                    f'    {i}. {nome}\n' for i, nome in enumerate(catena, 1)
+                )
             self.stdout.write(self.style.WARNING(
                 f'\n⚠️  ATTENZIONE - OPERAZIONE CRITICA!\n'
                 f'\nStai per ripristinare:\n'
                 f'  File: {filename}\n'
+                f'{descrizione_catena}'
                 f'\n❌ TUTTI I DATI ATTUALI VERRANNO SOVRASCRITTI!\n'
                 f'❌ OPERAZIONE IRREVERSIBILE!\n'
             ))
@@ -102,7 +141,10 @@ class Command(BaseCommand):
         # Esegui ripristino
         self.stdout.write(self.style.WARNING('\n🔄 Ripristino in corso...'))
         
-        success, message = backup_mgr.restore_backup(filename)
+        success, message = backup_mgr.restore_backup(
+            filename, progresso=self._mostra_progresso, processi=options['processi']
+        )
+        self.stdout.write('')
         
         if success:
             self.stdout.write(self.style.SUCCESS(f'\n✅ {message}'))
@@ -0,0 +1,30 @@
+"""
+Management command per ricostruire l'indice di ricerca degli articoli.
+
+L'indice è mantenuto dai signals ad ogni salvataggio di un articolo; va
+ricostruito dopo modifiche massive fatte senza signals (QuerySet.update(),
+import SQL diretti, assegna_codici_esistenti):
+    python manage.py ricostruisci_indice_ricerca
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from magazzino.ricerca import ricostruisci_indice
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Ricostruisce l\'indice di ricerca di tutti gli articoli'
+
+    def handle(self, *args, **options):
+        inizio = time.monotonic()
+        articoli, termini = ricostruisci_indice()
+        durata = time.monotonic() - inizio
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Indice ricostruito: {articoli} articoli, {termini} termini in {durata:.1f}s.'
+        ))
+        logger.info(f'[RICERCA] Indice ricostruito: {articoli} articoli, {termini} termini.')
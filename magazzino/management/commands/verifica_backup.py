@@ -0,0 +1,105 @@
+"""
+Management command per verificare i backup del database.
+
+Senza opzioni rilegge il file in streaming (decompressione completa e
+SHA-256 confrontato con quello del catalogo); con --restore lo ripristina
+in un database usa e getta (impostazione BACKUP_SCHEMA_VERIFICA, default
+<database>_verifica), confronta le righe di ogni tabella con quelle
+registrate al backup e misura il tempo di ripristino (RTO).
+
+Uso:
+    python manage.py verifica_backup --latest
+    python manage.py verifica_backup <filename> --restore --processi 8
+    python manage.py verifica_backup --tutti
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from magazzino.backup_manager import BackupManager
+
+
+class Command(BaseCommand):
+    help = 'Verifica integrità dei backup ed esegue test-restore cronometrati'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'filename',
+            nargs='?',
+            type=str,
+            help='Nome del file di backup da verificare'
+        )
+        
+        parser.add_argument(
+            '--latest',
+            action='store_true',
+            help='Verifica il backup più recente'
+        )
+        
+        parser.add_argument(
+            '--tutti',
+            action='store_true',
+            help='Verifica tutti i backup del catalogo (solo integrità, salvo --restore)'
+        )
+        
+        parser.add_argument(
+            '--restore',
+            action='store_true',
+            help='Esegue anche il test-restore nel database di verifica'
+        )
+        
+        parser.add_argument(
+            '--processi',
+            type=int,
+            default=None,
+            help='Client mysql contemporanei per i backup paralleli .tar (default: impostazione backup_processi)'
+        )
+    
+    def handle(self, *args, **options):
+        backup_mgr = BackupManager()
+        
+        if options['tutti']:
+            filenames = [backup['filename'] for backup in backup_mgr.list_backups()]
+        elif options['latest']:
+            backups = backup_mgr.list_backups()
+            if not backups:
+                raise CommandError('Nessun backup disponibile.')
+            filenames = [backups[0]['filename']]
+        elif options['filename']:
+            filenames = [options['filename']]
+        else:
+            raise CommandError('Specifica un filename, oppure --latest o --tutti.')
+        
+        falliti = []
+        for filename in filenames:
+            self.stdout.write(f'\n🔍 {filename}')
+            success, message, risultato = backup_mgr.verifica_backup(
+                filename, test_restore=options['restore'], processi=options['processi']
+            )
+            
+            if risultato:
+                for controllo in risultato['integrita']:
+                    self.stdout.write(
+                        f"   integrità {controllo['filename']}: {controllo['secondi']:.1f}s, "
+                        f"{controllo['byte_sql'] / (1024 * 1024):.2f} MB di SQL, SHA-256 {controllo['sha256']}"
+                    )
+                if risultato['restore']:
+                    self._mostra_tabelle(risultato['restore']['tabelle'])
+            
+            if success:
+                self.stdout.write(self.style.SUCCESS(f'   ✅ {message}'))
+            else:
+                falliti.append(filename)
+                self.stdout.write(self.style.ERROR(f'   ❌ {message}'))
+        
+        if falliti:
+            raise CommandError(f'Verifica fallita per {len(falliti)} backup: {", ".join(falliti)}')
+    
+    def _mostra_tabelle(self, tabelle):
+        """Durata e throughput del test-restore per tabella, dalla più lenta"""
+        self.stdout.write(f"   {'Tabella':<32} {'Secondi':>8} {'MB SQL':>9} {'MB/s':>7} {'Righe':>10} {'Attese':>10}")
+        for nome, tabella in sorted(tabelle.items(), key=lambda voce: voce[1]['secondi'], reverse=True):
+            righe = '-' if tabella['righe'] is None else tabella['righe']
+            attese = '-' if tabella['righe_attese'] is None else tabella['righe_attese']
+            self.stdout.write(
+                f"   {nome:<32} {tabella['secondi']:>8.2f} {tabella['byte_sql'] / (1024 * 1024):>9.2f} "
+                f"{tabella['mb_al_secondo']:>7.1f} {righe:>10} {attese:>10}"
+            )
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-17 16:04
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def popola_classifica(apps, schema_editor):
+    """Calcola i punteggi iniziali dal registro azioni esistente."""
+    AzioneUtente = apps.get_model('magazzino', 'AzioneUtente')
+    MovimentoMagazzino = apps.get_model('magazzino', 'MovimentoMagazzino')
+    ClassificaOperatore = apps.get_model('magazzino', 'ClassificaOperatore')
+
+    punteggi = Counter()
+    for riga in AzioneUtente.objects.values('username', 'tipo_azione').annotate(totale=Count('id')):
+        peso = 2 if riga['tipo_azione'] == 'IMMAGINE' else 1
+        punteggi[riga['username']] += riga['totale'] * peso
+
+    # Vecchi movimenti 'IN' conteggiati dalla dashboard per retrocompatibilità
+    for riga in MovimentoMagazzino.objects.filter(tipo_movimento='IN').values('operatore').annotate(totale=Count('id_movimento')):
+        punteggi[riga['operatore']] += riga['totale']
+
+    ClassificaOperatore.objects.bulk_create([
+        ClassificaOperatore(username=username, punti=punti)
+        for username, punti in punteggi.items()
+        if punti > 0
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('magazzino', '0020_alter_pezzoricambio_codice_scm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassificaOperatore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(max_length=150, unique=True, verbose_name='Username')),
+                ('punti', models.IntegerField(default=0, verbose_name='Punti')),
+                ('aggiornato_il', models.DateTimeField(auto_now=True, verbose_name='Aggiornato il')),
+            ],
+            options={
+                'verbose_name': 'Classifica Operatore',
+                'verbose_name_plural': 'Classifica Operatori',
+                'db_table': 'classifica_operatori',
+                'ordering': ['-punti', 'username'],
+                'indexes': [models.Index(fields=['-punti', 'username'], name='classifica__punti_e2e473_idx')],
+            },
+        ),
+        migrations.RunPython(popola_classifica, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-17 16:30
+
+from django.db import migrations, models
+
+
+def calcola_percorsi(apps, schema_editor):
+    """Calcola il percorso materializzato delle categorie esistenti, dalla radice in giù."""
+    Categoria = apps.get_model('magazzino', 'Categoria')
+
+    padri = dict(Categoria.objects.values_list('id_categoria', 'categoria_padre_id'))
+    percorsi = {}
+
+    def percorso_di(pk):
+        if pk not in percorsi:
+            catena = []
+            corrente = pk
+            # Risale fino alla radice (max 10 passi come protezione anti-loop)
+            while corrente is not None and len(catena) < 10:
+                catena.append(corrente)
+                corrente = padri.get(corrente)
+            percorsi[pk] = '/' + '/'.join(str(i) for i in reversed(catena)) + '/'
+        return percorsi[pk]
+
+    for pk in padri:
+        Categoria.objects.filter(pk=pk).update(percorso=percorso_di(pk))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('magazzino', '0021_classificaoperatore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='percorso',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Percorso degli ID nella gerarchia, calcolato automaticamente', max_length=100, verbose_name='Percorso'),
+        ),
+        migrations.AddIndex(
+            model_name='categoria',
+            index=models.Index(fields=['percorso'], name='categorie_percors_9e8887_idx'),
+        ),
+        migrations.RunPython(calcola_percorsi, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 5.2.8 on 2026-10-17 16:50
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Copia congelata della scomposizione in termini di magazzino/ricerca.py
+# al momento della migrazione: le modifiche successive al motore di ricerca
+# non devono cambiare cosa fa questa migrazione.
+PESI_CAMPI_CODICE = {
+    'codice_interno': 10,
+    'codice_scm': 10,
+    'codice_fornitore': 8,
+}
+PESI_CAMPI_TESTO = {
+    'descrizione': 3,
+    'descrizione_scm': 2,
+}
+CAMPI_INDICIZZATI = tuple(PESI_CAMPI_CODICE) + tuple(PESI_CAMPI_TESTO)
+PESO_SUFFISSO_CODICE = 2
+LUNGHEZZA_MINIMA_SUFFISSO = 3
+LUNGHEZZA_TERMINE = 50
+
+_SEPARATORI = re.compile(r'[^0-9a-z]+')
+_TRASLITTERAZIONI = str.maketrans({
+    'Ø': 'O', 'ø': 'o',
+    'Æ': 'AE', 'æ': 'ae',
+    'Œ': 'OE', 'œ': 'oe',
+    'ß': 'ss',
+    'Ł': 'L', 'ł': 'l',
+    'Đ': 'D', 'đ': 'd',
+    'Ð': 'D', 'ð': 'd',
+    'Þ': 'TH', 'þ': 'th',
+    'ı': 'i',
+})
+
+
+def scomponi_parole(testo):
+    testo = unicodedata.normalize('NFKD', str(testo or '').translate(_TRASLITTERAZIONI))
+    testo = ''.join(c for c in testo if not unicodedata.combining(c)).lower()
+    return [parola[:LUNGHEZZA_TERMINE] for parola in _SEPARATORI.split(testo) if parola]
+
+
+def termini_articolo(valori):
+    termini = {}
+
+    def aggiungi(termine, peso):
+        if termine and peso > termini.get(termine, 0):
+            termini[termine] = peso
+
+    for campo, peso in PESI_CAMPI_TESTO.items():
+        for parola in scomponi_parole(valori.get(campo)):
+            aggiungi(parola, peso)
+
+    for campo, peso in PESI_CAMPI_CODICE.items():
+        parole = scomponi_parole(valori.get(campo))
+        for parola in parole:
+            aggiungi(parola, peso)
+        compatto = ''.join(parole)[:LUNGHEZZA_TERMINE]
+        aggiungi(compatto, peso)
+        for inizio in range(1, len(compatto) - LUNGHEZZA_MINIMA_SUFFISSO + 1):
+            aggiungi(compatto[inizio:], PESO_SUFFISSO_CODICE)
+
+    return termini
+
+
+def popola_indice_ricerca(apps, schema_editor):
+    """Indicizza gli articoli esistenti."""
+    PezzoRicambio = apps.get_model('magazzino', 'PezzoRicambio')
+    IndiceRicercaArticolo = apps.get_model('magazzino', 'IndiceRicercaArticolo')
+
+    righe = []
+    for valori in PezzoRicambio.objects.values('pk', *CAMPI_INDICIZZATI).iterator():
+        righe.extend(
+            IndiceRicercaArticolo(articolo_id=valori['pk'], termine=termine, peso=peso)
+            for termine, peso in termini_articolo(valori).items()
+        )
+    IndiceRicercaArticolo.objects.bulk_create(righe, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('magazzino', '0022_categoria_percorso'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndiceRicercaArticolo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termine', models.CharField(max_length=50, verbose_name='Termine')),
+                ('peso', models.IntegerField(default=1, verbose_name='Peso')),
+                ('articolo', models.ForeignKey(db_column='id_articolo', on_delete=django.db.models.deletion.CASCADE, related_name='termini_ricerca', to='magazzino.pezzoricambio', verbose_name='Articolo')),
+            ],
+            options={
+                'verbose_name': 'Termine di Ricerca',
+                'verbose_name_plural': 'Indice di Ricerca Articoli',
+                'db_table': 'indice_ricerca_articoli',
+                'indexes': [models.Index(fields=['termine', 'articolo'], name='indice_rice_termine_55356e_idx')],
+            },
+        ),
+        migrations.RunPython(popola_indice_ricerca, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-17 18:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def imposta_stato_immagini_esistenti(apps, schema_editor):
+    """Le immagini già caricate sono state elaborate dal vecchio signal sincrono."""
+    PezzoRicambio = apps.get_model('magazzino', 'PezzoRicambio')
+    PezzoRicambio.objects.exclude(immagine__isnull=True).exclude(immagine='').update(stato_immagine='OK')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('magazzino', '0023_indicericercaarticolo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pezzoricambio',
+            name='stato_immagine',
+            field=models.CharField(choices=[('NO', 'Nessuna immagine'), ('ELAB', 'In elaborazione'), ('OK', 'Pronta'), ('ERR', 'Errore di elaborazione')], default='NO', editable=False, help_text='Le immagini caricate vengono ridimensionate in background (vedi coda_immagini)', max_length=4, verbose_name='Stato Immagine'),
+        ),
+        migrations.CreateModel(
+            name='LavoroImmagine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome_file', models.CharField(help_text="Percorso nello storage dell'immagine caricata da elaborare", max_length=255, verbose_name='File Originale')),
+                ('stato', models.CharField(choices=[('CODA', 'In coda'), ('CORSO', 'In corso'), ('OK', 'Completato'), ('ERR', 'Errore')], default='CODA', max_length=5, verbose_name='Stato')),
+                ('tentativi', models.IntegerField(default=0, verbose_name='Tentativi')),
+                ('errore', models.TextField(blank=True, null=True, verbose_name='Ultimo Errore')),
+                ('eseguibile_dal', models.DateTimeField(default=django.utils.timezone.now, help_text='Dopo un errore il lavoro viene ritentato a partire da questa data', verbose_name='Eseguibile Dal')),
+                ('creato_il', models.DateTimeField(auto_now_add=True, db_column='creato_il')),
+                ('modificato_il', models.DateTimeField(auto_now=True, db_column='modificato_il')),
+                ('articolo', models.ForeignKey(db_column='id_articolo', on_delete=django.db.models.deletion.CASCADE, related_name='lavori_immagine', to='magazzino.pezzoricambio', verbose_name='Articolo')),
+            ],
+            options={
+                'verbose_name': 'Lavoro Immagine',
+                'verbose_name_plural': 'Coda Elaborazione Immagini',
+                'db_table': 'lavori_immagini',
+                'ordering': ['creato_il'],
+                'indexes': [models.Index(fields=['stato', 'eseguibile_dal'], name='lavori_imma_stato_0dbeb1_idx')],
+            },
+        ),
+        migrations.RunPython(imposta_stato_immagini_esistenti, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('magazzino', '0024_pezzoricambio_stato_immagine_lavoroimmagine'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pezzoricambio',
+            name='formati_immagine',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Formati generati per le rendition (es. "jpg webp avif"), vuoto per le immagini precedenti', max_length=30, verbose_name='Formati Immagine'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('magazzino', '0025_pezzoricambio_formati_immagine'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImmagineCondivisa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash_contenuto', models.CharField(help_text='SHA-256 del file caricato', max_length=64, unique=True, verbose_name='Hash Contenuto')),
+                ('nome_immagine', models.CharField(max_length=100, verbose_name='Immagine')),
+                ('nome_thumbnail', models.CharField(max_length=100, verbose_name='Thumbnail')),
+                ('formati', models.CharField(default='jpg', max_length=30, verbose_name='Formati')),
+                ('riferimenti', models.IntegerField(default=0, help_text="Numero di articoli che usano l'immagine", verbose_name='Riferimenti')),
+                ('creato_il', models.DateTimeField(auto_now_add=True, db_column='creato_il')),
+            ],
+            options={
+                'verbose_name': 'Immagine Condivisa',
+                'verbose_name_plural': 'Immagini Condivise',
+                'db_table': 'immagini_condivise',
+            },
+        ),
+        migrations.AddField(
+            model_name='pezzoricambio',
+            name='immagine_condivisa',
+            field=models.ForeignKey(blank=True, db_column='id_immagine_condivisa', editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='articoli', to='magazzino.immaginecondivisa', verbose_name='Immagine Condivisa'),
+        ),
+        migrations.AddField(
+            model_name='lavoroimmagine',
+            name='hash_contenuto',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Hash Contenuto'),
+        ),
+    ]
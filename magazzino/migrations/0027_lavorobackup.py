@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('magazzino', '0026_immaginecondivisa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LavoroBackup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('BACKUP', 'Backup'), ('RESTORE', 'Ripristino')], max_length=7, verbose_name='Tipo')),
+                ('stato', models.CharField(choices=[('CODA', 'In coda'), ('CORSO', 'In corso'), ('OK', 'Completato'), ('ERR', 'Errore')], default='CODA', max_length=5, verbose_name='Stato')),
+                ('attivo', models.BooleanField(default=True, editable=False, help_text="True finché il lavoro è in coda o in corso, poi vuoto: l'indice univoco impedisce due lavori attivi", null=True, unique=True, verbose_name='Attivo')),
+                ('filename', models.CharField(blank=True, default='', help_text='Backup da ripristinare, o backup creato', max_length=255, verbose_name='File di Backup')),
+                ('utente', models.CharField(blank=True, default='', max_length=150, verbose_name='Utente')),
+                ('byte_elaborati', models.BigIntegerField(default=0, help_text='Byte compressi scritti dal backup o letti dal ripristino', verbose_name='Byte Elaborati')),
+                ('byte_totali', models.BigIntegerField(blank=True, null=True, verbose_name='Byte Totali')),
+                ('tabelle_completate', models.IntegerField(default=0, verbose_name='Tabelle Completate')),
+                ('tabelle_totali', models.IntegerField(blank=True, null=True, verbose_name='Tabelle Totali')),
+                ('messaggio', models.TextField(blank=True, null=True, verbose_name='Esito')),
+                ('creato_il', models.DateTimeField(auto_now_add=True, db_column='creato_il')),
+                ('modificato_il', models.DateTimeField(auto_now=True, db_column='modificato_il')),
+                ('completato_il', models.DateTimeField(blank=True, null=True, verbose_name='Completato Il')),
+            ],
+            options={
+                'verbose_name': 'Lavoro Backup',
+                'verbose_name_plural': 'Lavori Backup',
+                'db_table': 'lavori_backup',
+                'ordering': ['-creato_il'],
+            },
+        ),
+    ]
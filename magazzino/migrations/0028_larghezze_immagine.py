@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('magazzino', '0027_lavorobackup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='immaginecondivisa',
+            name='larghezze',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='Larghezze'),
+        ),
+        migrations.AddField(
+            model_name='pezzoricambio',
+            name='larghezze_immagine',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Larghezza effettiva di ogni rendition (es. "large:600 medio:300 ..."), per srcset', max_length=100, verbose_name='Larghezze Immagine'),
+        ),
+    ]
@@ -5,6 +5,7 @@ Rappresentano tutte le tabelle del database MySQL.
 """
 
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator, RegexValidator
 from datetime import datetime
@@ -58,6 +59,17 @@ class Categoria(models.Model):
         help_text=_('Ordine di visualizzazione (0=primo)')
     )
     
+    # Percorso materializzato degli antenati (es. "/3/17/42/"), incluso se stesso.
+    # Mantenuto da save(): permette sottoalberi e breadcrumb con una sola query.
+    percorso = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name=_('Percorso'),
+        help_text=_('Percorso degli ID nella gerarchia, calcolato automaticamente')
+    )
+    
     stato_attivo = models.BooleanField(
         default=True,
         verbose_name=_('Stato Attivo'),
@@ -74,90 +86,134 @@ class Categoria(models.Model):
             models.Index(fields=['nome_categoria']),
             models.Index(fields=['categoria_padre']),
             models.Index(fields=['livello']),
+            models.Index(fields=['percorso']),
         ]
         verbose_name = _('Categoria')
         verbose_name_plural = _('Categorie')
         # Rimuovo unique constraint su nome_categoria per permettere stesso nome in livelli diversi
     
     def save(self, *args, **kwargs):
-        """Calcola automaticamente il livello in base alla gerarchia"""
-        # Controllo anti-loop infinito
-        if self.categoria_padre:
-            # Verifica che non stia creando un loop (categoria padre che punta a se stessa)
-            visited = set()
-            current = self.categoria_padre
-            depth = 0
-            max_depth = 10  # Protezione contro loop infiniti
-            
-            while current and depth < max_depth:
-                if current.pk == self.pk:
-                    from django.core.exceptions import ValidationError
-                    raise ValidationError("Errore: creazione di loop circolare rilevata. Una categoria non può essere padre di se stessa.")
-                
-                if current.pk in visited:
-                    from django.core.exceptions import ValidationError
-                    raise ValidationError("Errore: loop circolare rilevato nella gerarchia delle categorie.")
-                
-                visited.add(current.pk)
-                current = current.categoria_padre
-                depth += 1
-            
-            if depth >= max_depth:
-                from django.core.exceptions import ValidationError
-                raise ValidationError("Errore: gerarchia troppo profonda o loop rilevato.")
+        """
+        Calcola automaticamente livello e percorso in base alla gerarchia.
+        Se la categoria viene spostata, aggiorna percorso e livello di tutto
+        il sottoalbero con un solo UPDATE.
+        """
+        from django.core.exceptions import ValidationError
+        from django.db import transaction
+        from django.db.models import F, Max, Value
+        from django.db.models.functions import Concat, Substr
+        
+        padre = self.categoria_padre
+        if padre:
+            # Controllo anti-loop: il padre non può essere se stessa o un suo discendente
+            if self.pk and (padre.pk == self.pk or f"/{self.pk}/" in padre.percorso):
+                raise ValidationError("Errore: creazione di loop circolare rilevata. Una categoria non può essere padre di se stessa.")
             
-            # Calcola livello in modo sicuro
-            self.livello = len(visited)
+            # Il livello è il numero di antenati (ID nel percorso del padre)
+            nuovo_livello = len(padre.get_percorso_ids())
             
             # Validazione: massimo 3 livelli (0, 1, 2)
-            if self.livello > 2:
-                from django.core.exceptions import ValidationError
+            if nuovo_livello > 2:
                 raise ValidationError("Massimo 3 livelli di categorie consentiti (Macrocategoria > Categoria > Sottocategoria)")
         else:
-            self.livello = 0
-        super().save(*args, **kwargs)
+            nuovo_livello = 0
+        
+        vecchio_percorso = self.percorso
+        vecchio_livello = self.livello
+        delta_livello = nuovo_livello - vecchio_livello
+        
+        with transaction.atomic():
+            if vecchio_percorso and delta_livello > 0:
+                # Lo spostamento non deve portare i discendenti oltre il 3° livello
+                livello_max = Categoria.objects.filter(
+                    percorso__startswith=vecchio_percorso
+                ).aggregate(livello_max=Max('livello'))['livello_max'] or vecchio_livello
+                if livello_max + delta_livello > 2:
+                    raise ValidationError("Massimo 3 livelli di categorie consentiti (Macrocategoria > Categoria > Sottocategoria)")
+            
+            self.livello = nuovo_livello
+            super().save(*args, **kwargs)
+            
+            nuovo_percorso = f"{padre.percorso if padre else '/'}{self.pk}/"
+            if nuovo_percorso != vecchio_percorso:
+                Categoria.objects.filter(pk=self.pk).update(percorso=nuovo_percorso, modificato_il=timezone.now())
+                if vecchio_percorso:
+                    Categoria.objects.filter(
+                        percorso__startswith=vecchio_percorso
+                    ).exclude(pk=self.pk).update(
+                        percorso=Concat(Value(nuovo_percorso), Substr('percorso', len(vecchio_percorso) + 1)),
+                        livello=F('livello') + delta_livello,
+                        modificato_il=timezone.now()
+                    )
+                self.percorso = nuovo_percorso
+        
+        self.__dict__.pop('_antenati', None)
+    
+    def get_percorso_ids(self):
+        """Restituisce gli ID degli antenati e della categoria stessa, dalla radice"""
+        return [int(pk) for pk in self.percorso.strip('/').split('/') if pk]
+    
+    def get_antenati(self):
+        """Restituisce gli antenati dalla radice al padre (una sola query, memorizzata sull'istanza)"""
+        if '_antenati' not in self.__dict__:
+            if not self.percorso:
+                # Categoria non ancora salvata: risale la catena dei padri
+                antenati = []
+                if self.categoria_padre:
+                    antenati = self.categoria_padre.get_antenati() + [self.categoria_padre]
+            else:
+                ids = self.get_percorso_ids()[:-1]
+                per_id = Categoria.objects.in_bulk(ids) if ids else {}
+                antenati = [per_id[pk] for pk in ids if pk in per_id]
+            self.__dict__['_antenati'] = antenati
+        return self.__dict__['_antenati']
     
     def get_breadcrumb(self):
         """Restituisce il percorso completo: Motore > Cinghie > Distribuzione"""
-        if self.categoria_padre:
-            return f"{self.categoria_padre.get_breadcrumb()} > {self.nome_categoria}"
-        return self.nome_categoria
+        return ' > '.join([c.nome_categoria for c in self.get_antenati()] + [self.nome_categoria])
     
     def get_breadcrumb_html(self):
         """Restituisce breadcrumb con icone HTML"""
-        if self.categoria_padre:
-            return f"{self.categoria_padre.get_breadcrumb_html()} <i class='fas fa-chevron-right fa-xs'></i> {self.nome_categoria}"
-        return f"<i class='fas fa-folder'></i> {self.nome_categoria}"
-    
-    def get_all_children(self, _visited=None):
-        """Restituisce tutte le sottocategorie ricorsivamente (con protezione anti-loop)"""
-        if _visited is None:
-            _visited = set()
-        
-        # Protezione contro loop infiniti
-        if self.pk in _visited:
-            return []
-        
-        _visited.add(self.pk)
-        
-        children = list(self.sottocategorie.filter(stato_attivo=True))
-        for child in list(children):
-            children.extend(child.get_all_children(_visited=_visited))
-        return children
+        nomi = [c.nome_categoria for c in self.get_antenati()] + [self.nome_categoria]
+        return "<i class='fas fa-folder'></i> " + " <i class='fas fa-chevron-right fa-xs'></i> ".join(nomi)
+    
+    def get_sottoalbero_queryset(self):
+        """
+        QuerySet di tutte le sottocategorie attive raggiungibili (una query indicizzata sul percorso).
+        Come nella navigazione ricorsiva, le categorie sotto una sottocategoria
+        disattivata vengono escluse.
+        """
+        from django.db.models import Exists, F, OuterRef
+        from django.db.models.lookups import StartsWith
+
+        # Esiste una categoria disattivata tra la categoria corrente e il discendente?
+        antenato_inattivo = Categoria.objects.filter(
+            StartsWith(OuterRef('percorso'), F('percorso')),
+            stato_attivo=False,
+            percorso__startswith=self.percorso
+        ).exclude(pk=self.pk)
+
+        return Categoria.objects.filter(
+            percorso__startswith=self.percorso,
+            stato_attivo=True
+        ).exclude(pk=self.pk).exclude(Exists(antenato_inattivo))
+    
+    def get_all_children(self):
+        """Restituisce tutte le sottocategorie attive del sottoalbero"""
+        return list(self.get_sottoalbero_queryset())
     
     def get_all_children_ids(self):
         """Restituisce tutti gli ID delle sottocategorie (per query)"""
-        return [c.id_categoria for c in self.get_all_children()]
+        return list(self.get_sottoalbero_queryset().values_list('id_categoria', flat=True))
     
+    def get_filtro_articoli(self):
+        """Q per gli articoli di questa categoria e del suo sottoalbero attivo"""
+        from django.db.models import Q
+        return Q(categoria_id=self.pk) | Q(categoria__in=self.get_sottoalbero_queryset())
+
     def count_articoli(self):
-        """Conta articoli in questa categoria e tutte le sottocategorie"""
-        from django.db.models import Count
-        # Articoli diretti
-        count = self.pezzoricambio_set.filter(stato_attivo=True).count()
-        # Articoli nelle sottocategorie
-        for child in self.sottocategorie.filter(stato_attivo=True):
-            count += child.count_articoli()
-        return count
+        """Conta articoli attivi in questa categoria e in tutte le sottocategorie (una query)"""
+        return PezzoRicambio.objects.filter(stato_attivo=True).filter(self.get_filtro_articoli()).count()
     
     def has_children(self):
         """Verifica se ha sottocategorie"""
@@ -425,6 +481,19 @@ class PezzoRicambio(models.Model):
         (ESAURITO, _('Esaurito - Da riordinare')),
         (FUORI_PRODUZIONE, _('Fuori produzione')),
     ]
+
+    # Scelte per stato elaborazione immagine
+    IMMAGINE_ASSENTE = 'NO'
+    IMMAGINE_IN_ELABORAZIONE = 'ELAB'
+    IMMAGINE_PRONTA = 'OK'
+    IMMAGINE_ERRORE = 'ERR'
+
+    STATO_IMMAGINE_CHOICES = [
+        (IMMAGINE_ASSENTE, _('Nessuna immagine')),
+        (IMMAGINE_IN_ELABORAZIONE, _('In elaborazione')),
+        (IMMAGINE_PRONTA, _('Pronta')),
+        (IMMAGINE_ERRORE, _('Errore di elaborazione')),
+    ]
     
     id_articolo = models.AutoField(primary_key=True, db_column='id_articolo')
     codice_interno = models.CharField(
@@ -571,6 +640,40 @@ class PezzoRicambio(models.Model):
         verbose_name=_('Thumbnail'),
         help_text=_('Miniatura generata automaticamente (300x300px)')
     )
+    stato_immagine = models.CharField(
+        max_length=4,
+        choices=STATO_IMMAGINE_CHOICES,
+        default=IMMAGINE_ASSENTE,
+        editable=False,
+        verbose_name=_('Stato Immagine'),
+        help_text=_('Le immagini caricate vengono ridimensionate in background (vedi coda_immagini)')
+    )
+    immagine_condivisa = models.ForeignKey(
+        'ImmagineCondivisa',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        editable=False,
+        related_name='articoli',
+        db_column='id_immagine_condivisa',
+        verbose_name=_('Immagine Condivisa')
+    )
+    formati_immagine = models.CharField(
+        max_length=30,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name=_('Formati Immagine'),
+        help_text=_('Formati generati per le rendition (es. "jpg webp avif"), vuoto per le immagini precedenti')
+    )
+    larghezze_immagine = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name=_('Larghezze Immagine'),
+        help_text=_('Larghezza effettiva di ogni rendition (es. "large:600 medio:300 ..."), per srcset')
+    )
     
     stato_attivo = models.BooleanField(default=True, verbose_name=_('Stato Attivo'))
     creato_il = models.DateTimeField(auto_now_add=True, db_column='creato_il')
@@ -997,11 +1100,32 @@ class Configurazione(models.Model):
     def __str__(self):
         return f"{self.chiave} = {self.valore}"
     
+    @staticmethod
+    def converti_valore(valore, tipo_dato):
+        """
+        Converte il valore salvato come testo nel tipo indicato.
+        
+        Raises:
+            ValueError: valore non convertibile (intero o JSON non validi)
+        """
+        if tipo_dato == 'integer':
+            return int(valore)
+        elif tipo_dato == 'boolean':
+            return valore.lower() in ('true', '1', 'yes', 'si', 'sì')
+        elif tipo_dato == 'json':
+            import json
+            return json.loads(valore)
+        else:
+            return valore
+    
     @classmethod
     def get_value(cls, chiave, default=None):
         """
         Recupera un valore di configurazione.
         
+        I valori arrivano dal registro in memoria del processo
+        (registro_configurazioni.py), non da una query per ogni chiave.
+        
         Args:
             chiave: Nome della configurazione
             default: Valore di default se non trovata
@@ -1009,21 +1133,9 @@ class Configurazione(models.Model):
         Returns:
             Il valore convertito nel tipo appropriato
         """
-        try:
-            config = cls.objects.get(chiave=chiave)
-            
-            if config.tipo_dato == 'integer':
-                return int(config.valore)
-            elif config.tipo_dato == 'boolean':
-                return config.valore.lower() in ('true', '1', 'yes', 'si', 'sì')
-            elif config.tipo_dato == 'json':
-                import json
-                return json.loads(config.valore)
-            else:
-                return config.valore
-                
-        except cls.DoesNotExist:
-            return default
+        from .registro_configurazioni import registro
+        
+        return registro.get(chiave, default)
     
     @classmethod
     def set_value(cls, chiave, valore, tipo_dato='string', descrizione=None, username=None):
@@ -1036,6 +1148,8 @@ class Configurazione(models.Model):
             tipo_dato: Tipo del dato (string, integer, boolean, json)
             descrizione: Descrizione opzionale
             username: Username di chi modifica
+        
+        Il salvataggio invalida il registro delle configurazioni (signals.py).
         """
         import json
         
@@ -1109,6 +1223,307 @@ class AzioneUtente(models.Model):
         return f"{self.username} - {self.get_tipo_azione_display()} ({self.data_azione.strftime('%d/%m/%Y')})"
 
 
+# ============================================================================
+# CLASSIFICA OPERATORI (punteggi materializzati)
+# ============================================================================
+
+class ClassificaOperatore(models.Model):
+    """
+    Punteggio aggregato per operatore, aggiornato in modo incrementale
+    ad ogni AzioneUtente registrata (vedi signals.aggiorna_classifica_operatore).
+    La dashboard legge la top 5 con una sola query sull'indice (punti, username).
+    """
+
+    # Peso delle azioni in classifica (default 1 punto)
+    PESI_AZIONI = {
+        'IMMAGINE': 2,
+    }
+
+    username = models.CharField(
+        max_length=150,
+        unique=True,
+        verbose_name=_('Username')
+    )
+    punti = models.IntegerField(
+        default=0,
+        verbose_name=_('Punti')
+    )
+    aggiornato_il = models.DateTimeField(
+        auto_now=True,
+        verbose_name=_('Aggiornato il')
+    )
+
+    class Meta:
+        db_table = 'classifica_operatori'
+        ordering = ['-punti', 'username']
+        indexes = [
+            models.Index(fields=['-punti', 'username']),
+        ]
+        verbose_name = _('Classifica Operatore')
+        verbose_name_plural = _('Classifica Operatori')
+
+    def __str__(self):
+        return f"{self.username} - {self.punti} punti"
+
+    @classmethod
+    def punti_per_azione(cls, tipo_azione):
+        """Restituisce il peso in classifica di un tipo di azione"""
+        return cls.PESI_AZIONI.get(tipo_azione, 1)
+
+    @classmethod
+    def aggiungi_punti(cls, username, punti):
+        """
+        Incrementa atomicamente il punteggio di un operatore.
+
+        Usa un UPDATE con F() per evitare lost update tra richieste concorrenti;
+        la riga viene creata solo al primo punto dell'operatore.
+        """
+        from django.db.models import F
+        from django.utils import timezone
+
+        aggiornati = cls.objects.filter(username=username).update(
+            punti=F('punti') + punti,
+            aggiornato_il=timezone.now()
+        )
+        if not aggiornati:
+            riga, created = cls.objects.get_or_create(
+                username=username,
+                defaults={'punti': punti}
+            )
+            if not created:
+                cls.objects.filter(pk=riga.pk).update(punti=F('punti') + punti)
+
+    @classmethod
+    def togli_punti(cls, username, punti):
+        """
+        Decrementa atomicamente il punteggio di un operatore, con lo stesso
+        UPDATE con F() di aggiungi_punti(); un operatore senza riga (es. dopo
+        l'azzeramento della classifica) non ha punti da togliere.
+        """
+        from django.db.models import F
+        from django.utils import timezone
+
+        cls.objects.filter(username=username).update(
+            punti=F('punti') - punti,
+            aggiornato_il=timezone.now()
+        )
+
+
+# ============================================================================
+# INDICE DI RICERCA ARTICOLI (indice invertito)
+# ============================================================================
+
+class IndiceRicercaArticolo(models.Model):
+    """
+    Termini di ricerca di un articolo con il loro peso, mantenuti dai signals
+    (vedi ricerca.indicizza_articolo). Le ricerche diventano LIKE 'termine%'
+    sull'indice (termine, articolo) invece di LIKE '%testo%' su pezzi_ricambio.
+    """
+
+    articolo = models.ForeignKey(
+        PezzoRicambio,
+        on_delete=models.CASCADE,
+        related_name='termini_ricerca',
+        db_column='id_articolo',
+        verbose_name=_('Articolo')
+    )
+    termine = models.CharField(
+        max_length=50,
+        verbose_name=_('Termine')
+    )
+    peso = models.IntegerField(
+        default=1,
+        verbose_name=_('Peso')
+    )
+
+    class Meta:
+        db_table = 'indice_ricerca_articoli'
+        indexes = [
+            models.Index(fields=['termine', 'articolo']),
+        ]
+        verbose_name = _('Termine di Ricerca')
+        verbose_name_plural = _('Indice di Ricerca Articoli')
+
+    def __str__(self):
+        return f"{self.termine} ({self.peso})"
+
+
+# ============================================================================
+# IMMAGINI ARTICOLI - Archivio per contenuto e coda di elaborazione
+# ============================================================================
+
+class ImmagineCondivisa(models.Model):
+    """
+    Rendition di un'immagine salvate una sola volta per contenuto (vedi
+    archivio_immagini.py): gli articoli con la stessa foto puntano agli
+    stessi file, che vengono eliminati quando l'ultimo riferimento è rilasciato.
+    """
+
+    hash_contenuto = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name=_('Hash Contenuto'),
+        help_text=_('SHA-256 del file caricato')
+    )
+    nome_immagine = models.CharField(max_length=100, verbose_name=_('Immagine'))
+    nome_thumbnail = models.CharField(max_length=100, verbose_name=_('Thumbnail'))
+    formati = models.CharField(max_length=30, default='jpg', verbose_name=_('Formati'))
+    larghezze = models.CharField(max_length=100, blank=True, default='', verbose_name=_('Larghezze'))
+    riferimenti = models.IntegerField(
+        default=0,
+        verbose_name=_('Riferimenti'),
+        help_text=_('Numero di articoli che usano l\'immagine')
+    )
+    creato_il = models.DateTimeField(auto_now_add=True, db_column='creato_il')
+
+    class Meta:
+        db_table = 'immagini_condivise'
+        verbose_name = _('Immagine Condivisa')
+        verbose_name_plural = _('Immagini Condivise')
+
+    def __str__(self):
+        return f"{self.hash_contenuto[:12]} ({self.riferimenti} articoli)"
+
+
+class LavoroImmagine(models.Model):
+    """
+    Lavoro di elaborazione di un'immagine caricata (vedi coda_immagini.py).
+    La coda è la tabella stessa: i worker prenotano un lavoro con un UPDATE
+    condizionale sullo stato, senza broker esterni.
+    """
+
+    IN_CODA = 'CODA'
+    IN_CORSO = 'CORSO'
+    COMPLETATO = 'OK'
+    ERRORE = 'ERR'
+
+    STATO_CHOICES = [
+        (IN_CODA, _('In coda')),
+        (IN_CORSO, _('In corso')),
+        (COMPLETATO, _('Completato')),
+        (ERRORE, _('Errore')),
+    ]
+
+    articolo = models.ForeignKey(
+        PezzoRicambio,
+        on_delete=models.CASCADE,
+        related_name='lavori_immagine',
+        db_column='id_articolo',
+        verbose_name=_('Articolo')
+    )
+    nome_file = models.CharField(
+        max_length=255,
+        verbose_name=_('File Originale'),
+        help_text=_('Percorso nello storage dell\'immagine caricata da elaborare')
+    )
+    hash_contenuto = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        verbose_name=_('Hash Contenuto')
+    )
+    stato = models.CharField(
+        max_length=5,
+        choices=STATO_CHOICES,
+        default=IN_CODA,
+        verbose_name=_('Stato')
+    )
+    tentativi = models.IntegerField(default=0, verbose_name=_('Tentativi'))
+    errore = models.TextField(blank=True, null=True, verbose_name=_('Ultimo Errore'))
+    eseguibile_dal = models.DateTimeField(
+        default=timezone.now,
+        verbose_name=_('Eseguibile Dal'),
+        help_text=_('Dopo un errore il lavoro viene ritentato a partire da questa data')
+    )
+    creato_il = models.DateTimeField(auto_now_add=True, db_column='creato_il')
+    modificato_il = models.DateTimeField(auto_now=True, db_column='modificato_il')
+
+    class Meta:
+        db_table = 'lavori_immagini'
+        ordering = ['creato_il']
+        indexes = [
+            models.Index(fields=['stato', 'eseguibile_dal']),
+        ]
+        verbose_name = _('Lavoro Immagine')
+        verbose_name_plural = _('Coda Elaborazione Immagini')
+
+    def __str__(self):
+        return f"{self.nome_file} ({self.get_stato_display()})"
+
+
+class LavoroBackup(models.Model):
+    """
+    Backup o ripristino avviato dalla pagina dei backup ed eseguito in
+    background (vedi lavori_backup.py); la pagina ne legge l'avanzamento.
+    La tabella è esclusa dai backup: un ripristino non la riporta indietro.
+    """
+
+    BACKUP = 'BACKUP'
+    RESTORE = 'RESTORE'
+
+    TIPO_CHOICES = [
+        (BACKUP, _('Backup')),
+        (RESTORE, _('Ripristino')),
+    ]
+
+    IN_CODA = 'CODA'
+    IN_CORSO = 'CORSO'
+    COMPLETATO = 'OK'
+    ERRORE = 'ERR'
+
+    STATO_CHOICES = [
+        (IN_CODA, _('In coda')),
+        (IN_CORSO, _('In corso')),
+        (COMPLETATO, _('Completato')),
+        (ERRORE, _('Errore')),
+    ]
+
+    tipo = models.CharField(max_length=7, choices=TIPO_CHOICES, verbose_name=_('Tipo'))
+    stato = models.CharField(
+        max_length=5,
+        choices=STATO_CHOICES,
+        default=IN_CODA,
+        verbose_name=_('Stato')
+    )
+    attivo = models.BooleanField(
+        null=True,
+        unique=True,
+        default=True,
+        editable=False,
+        verbose_name=_('Attivo'),
+        help_text=_('True finché il lavoro è in coda o in corso, poi vuoto: l\'indice univoco impedisce due lavori attivi')
+    )
+    filename = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        verbose_name=_('File di Backup'),
+        help_text=_('Backup da ripristinare, o backup creato')
+    )
+    utente = models.CharField(max_length=150, blank=True, default='', verbose_name=_('Utente'))
+    byte_elaborati = models.BigIntegerField(
+        default=0,
+        verbose_name=_('Byte Elaborati'),
+        help_text=_('Byte compressi scritti dal backup o letti dal ripristino')
+    )
+    byte_totali = models.BigIntegerField(blank=True, null=True, verbose_name=_('Byte Totali'))
+    tabelle_completate = models.IntegerField(default=0, verbose_name=_('Tabelle Completate'))
+    tabelle_totali = models.IntegerField(blank=True, null=True, verbose_name=_('Tabelle Totali'))
+    messaggio = models.TextField(blank=True, null=True, verbose_name=_('Esito'))
+    creato_il = models.DateTimeField(auto_now_add=True, db_column='creato_il')
+    modificato_il = models.DateTimeField(auto_now=True, db_column='modificato_il')
+    completato_il = models.DateTimeField(blank=True, null=True, verbose_name=_('Completato Il'))
+
+    class Meta:
+        db_table = 'lavori_backup'
+        ordering = ['-creato_il']
+        verbose_name = _('Lavoro Backup')
+        verbose_name_plural = _('Lavori Backup')
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.filename} ({self.get_stato_display()})"
+
+
 # ============================================================================
 # SEZIONE CLIENTI E FATTURAZIONE - Nuove tabelle da CSV
 # ============================================================================
@@ -0,0 +1,295 @@
+"""
+Registro movimenti: applica i movimenti di magazzino alle giacenze.
+
+Ogni movimento aggiorna la giacenza con un UPDATE condizionale basato su F()
+nella stessa transazione che scrive il movimento, quindi due operatori che
+movimentano lo stesso articolo nello stesso momento non perdono aggiornamenti.
+Per SCARICO e RESO_FORNITORE la condizione quantita_disponibile >= quantita
+è verificata dal database sulla riga stessa: se non è soddisfatta il
+movimento viene rifiutato e nulla viene scritto.
+
+registra_movimenti_batch() registra in blocco le righe di un documento
+(es. un DDT di ricevimento): valida tutte le righe, blocca le giacenze
+coinvolte in ordine di articolo (nessun deadlock tra batch concorrenti)
+e scrive movimenti e giacenze con bulk_create e un solo UPDATE raggruppato.
+
+Usato da MovimentoCreateView e MovimentoBatchView; riutilizzabile da import e API.
+"""
+
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, When
+from django.utils import timezone
+
+from .kpi import invalida_kpi_snapshot
+from .models import (
+    AzioneUtente, ClassificaOperatore, Fornitore, Giacenza, MovimentoMagazzino, PezzoRicambio, TipoMovimento
+)
+
+
+# Movimenti che riducono la giacenza (richiedono disponibilità sufficiente)
+TIPI_SCARICO = (TipoMovimento.SCARICO, TipoMovimento.RESO_FORNITORE)
+
+# Movimenti ammessi nei batch (la RETTIFICA dipende dall'ordine delle righe)
+TIPI_BATCH = (TipoMovimento.CARICO,) + TIPI_SCARICO
+MAX_RIGHE_BATCH = 500
+
+
+def _errore_giacenza_insufficiente(articolo_id, quantita):
+    disponibile = Giacenza.objects.filter(articolo_id=articolo_id).values_list(
+        'quantita_disponibile', flat=True
+    ).first()
+    if disponibile is None:
+        return ValidationError(
+            'Impossibile effettuare uno scarico: articolo senza giacenza registrata',
+            code='no_giacenza'
+        )
+    return ValidationError(
+        'Quantità insufficiente! Disponibile: %(disponibile)d, Richiesto: %(richiesto)d',
+        code='insufficient_stock',
+        params={'disponibile': disponibile, 'richiesto': quantita}
+    )
+
+
+def _aggiorna_o_crea(articolo_id, nuovo_valore, valore_iniziale):
+    """UPDATE della giacenza; se la riga non esiste la crea con valore_iniziale"""
+    adesso = timezone.now()
+    aggiornate = Giacenza.objects.filter(articolo_id=articolo_id).update(
+        quantita_disponibile=nuovo_valore,
+        ultimo_aggiornamento=adesso
+    )
+    if aggiornate:
+        return
+
+    try:
+        # Savepoint: se un'altra transazione crea la riga per prima si ripete l'UPDATE
+        with transaction.atomic():
+            Giacenza.objects.create(articolo_id=articolo_id, quantita_disponibile=valore_iniziale)
+    except IntegrityError:
+        Giacenza.objects.filter(articolo_id=articolo_id).update(
+            quantita_disponibile=nuovo_valore,
+            ultimo_aggiornamento=adesso
+        )
+
+
+def applica_a_giacenza(articolo_id, tipo_movimento, quantita):
+    """
+    Applica un movimento alla giacenza dell'articolo.
+
+    Va chiamata dentro una transazione insieme alla scrittura del movimento.
+
+    Raises:
+        ValidationError: scarico oltre la quantità disponibile o senza giacenza
+    """
+    if tipo_movimento in TIPI_SCARICO:
+        aggiornate = Giacenza.objects.filter(
+            articolo_id=articolo_id,
+            quantita_disponibile__gte=quantita
+        ).update(
+            quantita_disponibile=F('quantita_disponibile') - quantita,
+            ultimo_aggiornamento=timezone.now()
+        )
+        if not aggiornate:
+            raise _errore_giacenza_insufficiente(articolo_id, quantita)
+    elif tipo_movimento == TipoMovimento.CARICO:
+        _aggiorna_o_crea(articolo_id, F('quantita_disponibile') + quantita, quantita)
+    elif tipo_movimento == TipoMovimento.RETTIFICA:
+        # Per rettifiche, il valore inserito è la nuova quantità
+        _aggiorna_o_crea(articolo_id, quantita, quantita)
+    else:
+        raise ValidationError(f'Tipo movimento non valido: {tipo_movimento}', code='invalid')
+
+
+def registra_movimento(movimento):
+    """
+    Salva un movimento (istanza non ancora salvata, con operatore valorizzato)
+    e aggiorna la giacenza in un'unica transazione. I CARICHI registrano anche
+    l'azione utente per la classifica operatori.
+
+    Returns:
+        MovimentoMagazzino salvato
+
+    Raises:
+        ValidationError: il movimento non è applicabile alla giacenza (nulla viene salvato)
+    """
+    with transaction.atomic():
+        applica_a_giacenza(movimento.articolo_id, movimento.tipo_movimento, movimento.quantita)
+        movimento.save()
+
+        if movimento.tipo_movimento == TipoMovimento.CARICO:
+            AzioneUtente.objects.create(
+                username=movimento.operatore,
+                tipo_azione='CARICO',
+                dettagli=f"Carico articolo: {movimento.articolo.codice_interno}"
+            )
+
+    return movimento
+
+
+def _intero(valore):
+    """
+    Intero da un valore JSON: solo interi veri o stringhe di sole cifre, None altrimenti.
+    int() accetterebbe anche 2.9 (troncato a 2) e true (1).
+    """
+    if isinstance(valore, int) and not isinstance(valore, bool):
+        return valore
+    if isinstance(valore, str) and valore.strip().isdecimal() and valore.strip().isascii():
+        return int(valore)
+    return None
+
+
+def _valida_righe_batch(righe):
+    """
+    Normalizza e valida le righe di un batch.
+
+    Returns:
+        tuple: (righe normalizzate [(articolo_id, tipo, quantita)], articoli per id, errori)
+    """
+    errori = []
+    normalizzate = []
+    for numero, riga in enumerate(righe, start=1):
+        tipo = riga.get('tipo_movimento')
+        articolo_id = _intero(riga.get('articolo_id'))
+        quantita = _intero(riga.get('quantita'))
+        if articolo_id is None or quantita is None:
+            errori.append(ValidationError(f'Riga {numero}: articolo e quantità devono essere numeri interi', code='invalid'))
+            continue
+        if tipo not in TIPI_BATCH:
+            errori.append(ValidationError(f'Riga {numero}: tipo movimento non ammesso ({tipo})', code='invalid'))
+        elif quantita < 1:
+            errori.append(ValidationError(f'Riga {numero}: la quantità deve essere almeno 1', code='invalid'))
+        else:
+            normalizzate.append((numero, articolo_id, tipo, quantita))
+
+    articoli = PezzoRicambio.objects.in_bulk({articolo_id for _, articolo_id, _, _ in normalizzate})
+    for numero, articolo_id, _, _ in normalizzate:
+        if articolo_id not in articoli:
+            errori.append(ValidationError(f'Riga {numero}: articolo {articolo_id} non trovato', code='invalid'))
+
+    return [riga[1:] for riga in normalizzate], articoli, errori
+
+
+def _testo_documento(valore, campo, etichetta):
+    """Testo di intestazione del batch (da JSON: può arrivare di qualsiasi tipo), senza spazi ai lati"""
+    if valore is None:
+        return ''
+    if not isinstance(valore, str):
+        raise ValidationError(f'{etichetta}: deve essere un testo', code='invalid')
+    valore = valore.strip()
+    max_length = MovimentoMagazzino._meta.get_field(campo).max_length
+    if len(valore) > max_length:
+        raise ValidationError(f'{etichetta}: massimo {max_length} caratteri', code='max_length')
+    return valore
+
+
+def registra_movimenti_batch(righe, operatore, numero_documento, fornitore_id=None, causale=None, note=None):
+    """
+    Registra tutte le righe di un documento in un'unica transazione.
+
+    Args:
+        righe: lista di dict {articolo_id, tipo_movimento, quantita}
+        operatore: username dell'operatore
+        numero_documento: documento comune a tutte le righe (es. numero DDT)
+
+    Returns:
+        list[MovimentoMagazzino] creati
+
+    Raises:
+        ValidationError: con un messaggio per ogni riga o articolo non valido (nulla viene salvato)
+    """
+    numero_documento = _testo_documento(numero_documento, 'numero_documento', 'Numero documento')
+    causale = _testo_documento(causale, 'causale', 'Causale') or None
+    if fornitore_id is not None:
+        if _intero(fornitore_id) is None:
+            raise ValidationError(f'Fornitore non valido ({fornitore_id})', code='invalid')
+        fornitore_id = _intero(fornitore_id)
+    if not numero_documento:
+        raise ValidationError('Il numero documento è obbligatorio per un inserimento multiplo', code='required')
+    if not righe:
+        raise ValidationError('Nessuna riga da registrare', code='required')
+    if len(righe) > MAX_RIGHE_BATCH:
+        raise ValidationError(f'Massimo {MAX_RIGHE_BATCH} righe per documento', code='invalid')
+
+    righe, articoli, errori = _valida_righe_batch(righe)
+    if fornitore_id and not Fornitore.objects.filter(pk=fornitore_id).exists():
+        errori.append(ValidationError(f'Fornitore {fornitore_id} non trovato', code='invalid'))
+    if errori:
+        raise ValidationError(errori)
+
+    # Variazione netta di giacenza per articolo
+    variazioni = defaultdict(int)
+    for articolo_id, tipo, quantita in righe:
+        variazioni[articolo_id] += -quantita if tipo in TIPI_SCARICO else quantita
+
+    with transaction.atomic():
+        # Crea le giacenze mancanti degli articoli in carico, poi blocca tutte le righe in ordine di articolo
+        Giacenza.objects.bulk_create(
+            [Giacenza(articolo_id=articolo_id) for articolo_id in sorted(variazioni) if variazioni[articolo_id] > 0],
+            ignore_conflicts=True
+        )
+        disponibili = dict(
+            Giacenza.objects.select_for_update().filter(
+                articolo_id__in=variazioni
+            ).order_by('articolo_id').values_list('articolo_id', 'quantita_disponibile')
+        )
+
+        for articolo_id, variazione in sorted(variazioni.items()):
+            codice = articoli[articolo_id].codice_interno
+            if articolo_id not in disponibili:
+                errori.append(ValidationError(f'{codice}: articolo senza giacenza registrata', code='no_giacenza'))
+            elif disponibili[articolo_id] + variazione < 0:
+                errori.append(ValidationError(
+                    f'{codice}: quantità insufficiente (disponibile {disponibili[articolo_id]}, '
+                    f'richiesto {-variazione})',
+                    code='insufficient_stock'
+                ))
+        if errori:
+            raise ValidationError(errori)
+
+        da_aggiornare = {articolo_id: variazione for articolo_id, variazione in variazioni.items() if variazione}
+        if da_aggiornare:
+            Giacenza.objects.filter(articolo_id__in=da_aggiornare).update(
+                quantita_disponibile=Case(
+                    *[
+                        When(articolo_id=articolo_id, then=F('quantita_disponibile') + variazione)
+                        for articolo_id, variazione in da_aggiornare.items()
+                    ],
+                    default=F('quantita_disponibile')
+                ),
+                ultimo_aggiornamento=timezone.now()
+            )
+
+        movimenti = MovimentoMagazzino.objects.bulk_create([
+            MovimentoMagazzino(
+                articolo_id=articolo_id,
+                tipo_movimento=tipo,
+                quantita=quantita,
+                fornitore_id=fornitore_id,
+                causale=causale,
+                numero_documento=numero_documento,
+                operatore=operatore,
+                note=note,
+            )
+            for articolo_id, tipo, quantita in righe
+        ])
+
+        # bulk_create non invia i signals: azioni e classifica vengono aggiornate qui
+        carichi = [articolo_id for articolo_id, tipo, _ in righe if tipo == TipoMovimento.CARICO]
+        if carichi:
+            AzioneUtente.objects.bulk_create([
+                AzioneUtente(
+                    username=operatore,
+                    tipo_azione='CARICO',
+                    dettagli=f"Carico articolo: {articoli[articolo_id].codice_interno} (doc. {numero_documento})"[:200]
+                )
+                for articolo_id in carichi
+            ])
+            ClassificaOperatore.aggiungi_punti(
+                operatore,
+                len(carichi) * ClassificaOperatore.punti_per_azione('CARICO')
+            )
+
+    transaction.on_commit(invalida_kpi_snapshot)
+    return movimenti
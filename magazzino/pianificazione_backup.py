@@ -0,0 +1,184 @@
+"""
+Backup pianificati e conservazione nonno-padre-figlio (GFS).
+
+esegui_pianificazione() crea i backup dovuti e applica la conservazione;
+si lancia dall'Utilità di pianificazione di Windows (o cron) ogni pochi
+minuti, oppure in ciclo continuo:
+    python manage.py pianifica_backup             # esegue quanto è dovuto ed esce
+    python manage.py pianifica_backup --daemon    # controlla ogni minuto
+    python manage.py pianifica_backup --dry-run   # mostra cosa farebbe
+
+Impostazioni (Configurazione, pagina Impostazioni backup):
+- backup_orari: orari dei backup completi, es. "02:00" o "02:00, 13:30"
+- backup_intervallo_incrementale: minuti tra due backup incrementali (0 = nessuno)
+- backup_conserva_orari, backup_retention_days, backup_conserva_settimanali,
+  backup_conserva_mensili: ore, giorni, settimane e mesi di cui tenere un backup
+
+Nessuno stato in più: un backup completo è dovuto se dopo l'ultimo orario
+pianificato trascorso il catalogo non ne contiene (un orario perso a PC
+spento viene recuperato una volta sola), un incrementale se l'ultimo backup
+è più vecchio dell'intervallo. Esecuzioni sovrapposte (pianificatore, cron,
+pulsante della pagina) non creano due backup: vedi BackupManager._operazione_esclusiva.
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Livelli di conservazione: nome -> periodo a cui appartiene un backup
+PERIODI_CONSERVAZIONE = (
+    ('orario', lambda timestamp: (timestamp.date(), timestamp.hour)),
+    ('giornaliero', lambda timestamp: timestamp.date()),
+    ('settimanale', lambda timestamp: timestamp.isocalendar()[:2]),
+    ('mensile', lambda timestamp: (timestamp.year, timestamp.month)),
+)
+
+BACKUP_COMPLETO = 'completo'
+BACKUP_INCREMENTALE = 'incrementale'
+
+
+def leggi_orari(testo):
+    """
+    Orari dei backup da "02:00, 13:30".
+
+    Raises:
+        ValueError: orario non valido
+    """
+    orari = []
+    for parte in str(testo or '').replace(';', ',').split(','):
+        parte = parte.strip()
+        if parte:
+            orari.append(datetime.strptime(parte, '%H:%M').time())
+    return sorted(set(orari))
+
+
+def ultimo_orario(orari, adesso):
+    """Ultimo orario pianificato trascorso (oggi o ieri), None senza orari"""
+    if not orari:
+        return None
+    oggi = [datetime.combine(adesso.date(), orario) for orario in orari if orario <= adesso.time()]
+    if oggi:
+        return oggi[-1]
+    return datetime.combine(adesso.date() - timedelta(days=1), orari[-1])
+
+
+def classifica_backup(backups, politica):
+    """
+    Livelli di conservazione di ogni backup. Per ogni livello resta il backup
+    più recente di ciascuno degli ultimi N periodi che hanno backup (un
+    periodo senza backup non consuma posti, quindi se i backup si fermano i
+    vecchi non vengono eliminati). Il backup più recente resta sempre e i
+    backup conservati conservano la loro catena incrementale.
+
+    Args:
+        backups: lista di BackupManager.list_backups(), dal più recente
+        politica: dict livello -> numero di periodi (vedi PERIODI_CONSERVAZIONE)
+
+    Returns:
+        dict: filename -> lista dei motivi per conservarlo (vuota: da eliminare)
+    """
+    motivi = {backup['filename']: [] for backup in backups}
+    if not backups:
+        return motivi
+
+    for livello, periodo_di in PERIODI_CONSERVAZIONE:
+        limite = politica.get(livello, 0)
+        periodi = set()
+        for backup in backups:
+            periodo = periodo_di(backup['timestamp'])
+            if periodo in periodi:
+                continue
+            if len(periodi) >= limite:
+                break
+            periodi.add(periodo)
+            motivi[backup['filename']].append(livello)
+
+    motivi[backups[0]['filename']].append('ultimo')
+
+    per_nome = {backup['filename']: backup for backup in backups}
+    for backup in backups:
+        if not motivi[backup['filename']] or motivi[backup['filename']] == ['catena']:
+            continue
+        precedente = backup.get('precedente')
+        while precedente in per_nome and 'catena' not in motivi[precedente]:
+            motivi[precedente].append('catena')
+            precedente = per_nome[precedente].get('precedente')
+    return motivi
+
+
+def impostazioni_pianificazione():
+    """
+    Returns:
+        tuple: (orari dei backup completi, minuti tra due incrementali)
+    """
+    from .models import Configurazione
+
+    orari = Configurazione.get_value('backup_orari', getattr(settings, 'BACKUP_ORARI', ''))
+    intervallo = int(Configurazione.get_value(  # type: ignore
+        'backup_intervallo_incrementale', getattr(settings, 'BACKUP_INTERVALLO_INCREMENTALE', 0)
+    ))
+    try:
+        return leggi_orari(orari), intervallo
+    except ValueError:
+        logger.error(f"[BACKUP_PIANIFICATI] Orari non validi: {orari!r}")
+        return [], intervallo
+
+
+def backup_dovuto(backups, orari, intervallo, adesso):
+    """
+    Il backup da creare adesso, se ce n'è uno.
+
+    Returns:
+        str: BACKUP_COMPLETO, BACKUP_INCREMENTALE oppure None
+    """
+    orario = ultimo_orario(orari, adesso)
+    if orario is not None:
+        completi = [backup for backup in backups if backup['formato'] != 'incrementale']
+        if not completi or completi[0]['timestamp'] < orario:
+            return BACKUP_COMPLETO
+
+    if intervallo > 0 and (not backups or adesso - backups[0]['timestamp'] >= timedelta(minutes=intervallo)):
+        return BACKUP_INCREMENTALE
+    return None
+
+
+def esegui_pianificazione(adesso=None, dry_run=False):
+    """
+    Crea il backup dovuto (al massimo uno) e applica la conservazione.
+
+    Returns:
+        list: messaggi di quanto fatto (o, con dry_run, di quanto si farebbe)
+    """
+    from .backup_manager import BackupManager
+
+    adesso = adesso or datetime.now()
+    backup_mgr = BackupManager()
+    orari, intervallo = impostazioni_pianificazione()
+    messaggi = []
+
+    tipo = backup_dovuto(backup_mgr.list_backups(), orari, intervallo, adesso)
+    if tipo and dry_run:
+        messaggi.append(f"Backup {tipo} dovuto")
+    elif tipo:
+        if tipo == BACKUP_COMPLETO:
+            success, _, message = backup_mgr.create_backup()
+        else:
+            success, _, message = backup_mgr.create_backup_incrementale()
+        if success:
+            logger.info(f"[BACKUP_PIANIFICATI] {message}")
+        else:
+            logger.error(f"[BACKUP_PIANIFICATI] Backup {tipo} non riuscito: {message}")
+        messaggi.append(message)
+
+    if dry_run:
+        motivi = classifica_backup(backup_mgr.list_backups(), backup_mgr.politica_conservazione)
+        da_eliminare = [filename for filename, livelli in motivi.items() if not livelli]
+        messaggi.append(f"Da eliminare: {', '.join(da_eliminare) or 'nessuno'}")
+    else:
+        _, message = backup_mgr.cleanup_old_backups()
+        messaggi.append(message)
+    return messaggi
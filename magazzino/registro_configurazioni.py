@@ -0,0 +1,108 @@
+"""
+Registro in memoria delle configurazioni (tabella configurazioni).
+
+Configurazione.get_value() legge da qui invece di fare una query per ogni
+chiave: BackupManager() da solo ne leggeva una decina. Il registro carica
+tutte le righe con una sola query, già convertite nel loro tipo, e le
+tiene per il processo:
+- set_value(), l'admin e ogni save()/delete() di Configurazione lo
+  invalidano subito nel processo che modifica (signals.py)
+- gli altri processi (più worker del server, pianifica_backup, ...) se ne
+  accorgono dal timbro: numero di righe e modificato_il più recente, letti
+  con una query di aggregazione leggera alla prima lettura di ogni richiesta
+  e, fuori dalle richieste, al più ogni INTERVALLO_VERIFICA secondi
+
+Le modifiche fatte con QuerySet.update() senza modificato_il non cambiano
+il timbro: arrivano agli altri processi solo al loro riavvio.
+"""
+
+import copy
+import logging
+import threading
+import time
+
+from django.core.signals import request_started
+from django.db.models import Count, Max
+
+logger = logging.getLogger(__name__)
+
+
+# Secondi tra due controlli del timbro per il codice fuori dalle richieste (thread, comandi)
+INTERVALLO_VERIFICA = 5
+
+
+class RegistroConfigurazioni:
+    """Valori di Configurazione per chiave, ricaricati quando cambia il timbro"""
+
+    def __init__(self):
+        self._valori = None
+        self._timbro = None
+        self._verificato_il = None
+        self._lock = threading.Lock()
+
+    def _leggi_timbro(self):
+        from .models import Configurazione
+
+        timbro = Configurazione.objects.aggregate(righe=Count('chiave'), modificato_il=Max('modificato_il'))
+        return timbro['righe'], timbro['modificato_il']
+
+    def _carica(self):
+        from .models import Configurazione
+
+        valori = {}
+        righe, ultima_modifica = 0, None
+        for chiave, valore, tipo_dato, modificato_il in Configurazione.objects.values_list(
+            'chiave', 'valore', 'tipo_dato', 'modificato_il'
+        ):
+            try:
+                valori[chiave] = Configurazione.converti_valore(valore, tipo_dato)
+            except ValueError as e:
+                # Come prima del registro: la lettura di quella chiave solleva l'errore
+                logger.warning(f"[CONFIGURAZIONI] Valore non valido per {chiave}: {e}")
+                valori[chiave] = e
+            righe += 1
+            if ultima_modifica is None or modificato_il > ultima_modifica:
+                ultima_modifica = modificato_il
+        self._valori = valori
+        self._timbro = (righe, ultima_modifica)
+        self._verificato_il = time.monotonic()
+
+    def _valori_aggiornati(self):
+        with self._lock:
+            if self._valori is None:
+                self._carica()
+            elif self._verificato_il is None or time.monotonic() - self._verificato_il >= INTERVALLO_VERIFICA:
+                if self._leggi_timbro() != self._timbro:
+                    self._carica()
+                else:
+                    self._verificato_il = time.monotonic()
+            return self._valori
+
+    def get(self, chiave, default=None):
+        """Valore convertito di chiave, default se non c'è"""
+        valore = self._valori_aggiornati().get(chiave, default)
+        if isinstance(valore, ValueError):
+            raise valore
+        if isinstance(valore, (dict, list)):
+            # I JSON restano del registro: chi li modifica lavora su una copia
+            return copy.deepcopy(valore)
+        return valore
+
+    def invalida(self):
+        """Scarta i valori: la prossima lettura li ricarica dal database"""
+        with self._lock:
+            self._valori = None
+
+    def da_verificare(self):
+        """La prossima lettura controlla il timbro"""
+        self._verificato_il = None
+
+
+registro = RegistroConfigurazioni()
+
+
+def _nuova_richiesta(sender, **kwargs):
+    registro.da_verificare()
+
+
+request_started.connect(_nuova_richiesta, dispatch_uid='registro_configurazioni_richiesta')
@@ -0,0 +1,189 @@
+"""
+Motore di ricerca articoli basato su un indice invertito (IndiceRicercaArticolo).
+
+Ogni articolo viene scomposto in termini normalizzati (minuscolo, senza
+accenti) presi da codice interno, codice SCM, codice fornitore, descrizione
+e descrizione SCM. Per i codici si indicizzano anche il codice compatto
+(senza separatori) e i suoi suffissi, così che "0320061" trovi "07L0320061B".
+
+La ricerca usa solo confronti LIKE 'termine%' sull'indice (termine, articolo):
+ogni parola cercata deve trovare almeno un termine, e i risultati sono ordinati
+per la somma dei pesi dei termini trovati (le corrispondenze esatte contano doppio).
+
+L'indice è aggiornato dai signals su PezzoRicambio; le modifiche fatte con
+QuerySet.update() si riallineano con:
+    python manage.py ricostruisci_indice_ricerca
+"""
+
+import re
+import unicodedata
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import IndiceRicercaArticolo, PezzoRicambio
+
+
+# Peso dei campi indicizzati (codici più rilevanti delle descrizioni)
+PESI_CAMPI_CODICE = {
+    'codice_interno': 10,
+    'codice_scm': 10,
+    'codice_fornitore': 8,
+}
+PESI_CAMPI_TESTO = {
+    'descrizione': 3,
+    'descrizione_scm': 2,
+}
+CAMPI_INDICIZZATI = tuple(PESI_CAMPI_CODICE) + tuple(PESI_CAMPI_TESTO)
+
+# Peso dei suffissi dei codici (ricerca di una parte del codice)
+PESO_SUFFISSO_CODICE = 2
+LUNGHEZZA_MINIMA_SUFFISSO = 3
+
+# Limiti sulla query dell'utente
+MAX_TERMINI_RICERCA = 6
+LUNGHEZZA_TERMINE = 50
+
+_SEPARATORI = re.compile(r'[^0-9a-z]+')
+
+# Lettere che NFKD non scompone in lettera base + accento (altrimenti verrebbero scartate)
+_TRASLITTERAZIONI = str.maketrans({
+    'Ø': 'O', 'ø': 'o',
+    'Æ': 'AE', 'æ': 'ae',
+    'Œ': 'OE', 'œ': 'oe',
+    'ß': 'ss',
+    'Ł': 'L', 'ł': 'l',
+    'Đ': 'D', 'đ': 'd',
+    'Ð': 'D', 'ð': 'd',
+    'Þ': 'TH', 'þ': 'th',
+    'ı': 'i',
+})
+
+
+def normalizza_testo(testo):
+    """Minuscolo e senza accenti: 'Giunto Cardanico Ø40' -> 'giunto cardanico o40'"""
+    testo = unicodedata.normalize('NFKD', str(testo or '').translate(_TRASLITTERAZIONI))
+    return ''.join(c for c in testo if not unicodedata.combining(c)).lower()
+
+
+def scomponi_parole(testo):
+    """Parole alfanumeriche normalizzate contenute nel testo"""
+    return [parola[:LUNGHEZZA_TERMINE] for parola in _SEPARATORI.split(normalizza_testo(testo)) if parola]
+
+
+def termini_articolo(valori):
+    """
+    Calcola i termini di ricerca di un articolo.
+
+    Args:
+        valori: mapping campo -> valore per i CAMPI_INDICIZZATI
+
+    Returns:
+        dict: termine -> peso (il peso massimo se il termine compare in più campi)
+    """
+    termini = {}
+
+    def aggiungi(termine, peso):
+        if termine and peso > termini.get(termine, 0):
+            termini[termine] = peso
+
+    for campo, peso in PESI_CAMPI_TESTO.items():
+        for parola in scomponi_parole(valori.get(campo)):
+            aggiungi(parola, peso)
+
+    for campo, peso in PESI_CAMPI_CODICE.items():
+        parole = scomponi_parole(valori.get(campo))
+        for parola in parole:
+            aggiungi(parola, peso)
+        compatto = ''.join(parole)[:LUNGHEZZA_TERMINE]
+        aggiungi(compatto, peso)
+        for inizio in range(1, len(compatto) - LUNGHEZZA_MINIMA_SUFFISSO + 1):
+            aggiungi(compatto[inizio:], PESO_SUFFISSO_CODICE)
+
+    return termini
+
+
+def indicizza_articolo(articolo):
+    """Riscrive i termini di ricerca di un articolo (chiamato dal signal post_save)"""
+    termini = termini_articolo({campo: getattr(articolo, campo) for campo in CAMPI_INDICIZZATI})
+    with transaction.atomic():
+        IndiceRicercaArticolo.objects.filter(articolo_id=articolo.pk).delete()
+        IndiceRicercaArticolo.objects.bulk_create([
+            IndiceRicercaArticolo(articolo_id=articolo.pk, termine=termine, peso=peso)
+            for termine, peso in termini.items()
+        ])
+
+
+def ricostruisci_indice(dimensione_blocco=500):
+    """
+    Ricostruisce da zero l'indice di tutti gli articoli.
+
+    Returns:
+        tuple: (articoli indicizzati, termini scritti)
+    """
+    articoli = 0
+    termini_scritti = 0
+    with transaction.atomic():
+        IndiceRicercaArticolo.objects.all().delete()
+        righe = []
+        for valori in PezzoRicambio.objects.values('pk', *CAMPI_INDICIZZATI).iterator(chunk_size=dimensione_blocco):
+            articoli += 1
+            righe.extend(
+                IndiceRicercaArticolo(articolo_id=valori['pk'], termine=termine, peso=peso)
+                for termine, peso in termini_articolo(valori).items()
+            )
+            if len(righe) >= dimensione_blocco:
+                IndiceRicercaArticolo.objects.bulk_create(righe)
+                termini_scritti += len(righe)
+                righe = []
+        IndiceRicercaArticolo.objects.bulk_create(righe)
+        termini_scritti += len(righe)
+    return articoli, termini_scritti
+
+
+def punteggi_ricerca(testo):
+    """
+    QuerySet di {articolo_id, punteggio} per gli articoli che contengono
+    tutte le parole cercate (come prefisso di un termine indicizzato).
+
+    Returns:
+        QuerySet, oppure None se il testo non contiene parole ricercabili
+    """
+    parole = list(dict.fromkeys(scomponi_parole(testo)))[:MAX_TERMINI_RICERCA]
+    if not parole:
+        return None
+
+    filtri = [Q(termine__startswith=parola) for parola in parole]
+    trovati = {f'trovato_{i}': Count('pk', filter=filtro) for i, filtro in enumerate(filtri)}
+
+    return IndiceRicercaArticolo.objects.filter(
+        reduce(or_, filtri)
+    ).values('articolo_id').annotate(
+        punteggio=Sum('peso') + Coalesce(Sum('peso', filter=Q(termine__in=parole)), 0),
+        **trovati
+    ).filter(
+        **{f'{nome}__gt': 0 for nome in trovati}
+    ).order_by()
+
+
+def cerca_articoli(queryset, testo):
+    """
+    Filtra un QuerySet di PezzoRicambio con il testo cercato.
+
+    Gli articoli trovati sono annotati con punteggio_ricerca (più alto = più rilevante);
+    l'ordinamento resta a carico del chiamante.
+    """
+    punteggi = punteggi_ricerca(testo)
+    if punteggi is None:
+        return queryset.none()
+
+    return queryset.filter(
+        pk__in=punteggi.values('articolo_id')
+    ).annotate(
+        punteggio_ricerca=Subquery(
+            punteggi.filter(articolo_id=OuterRef('pk')).values('punteggio')[:1]
+        )
+    )
@@ -2,20 +2,27 @@
 Signals per l'elaborazione automatica delle immagini degli articoli.
 Gestisce:
 - Auto-assegnazione codice interno univoco (ART-XXXXX) ai nuovi articoli
-- Auto-ridimensionamento immagine principale (max 800x800px)
-- Generazione automatica thumbnail (300x300px con crop centrato)
-- Conversione in formato JPEG ottimizzato
+- Aggiornamento dell'indice di ricerca articoli
+- Aggiornamento incrementale della classifica operatori
+- Invalidazione della cache KPI di dashboard e report
+- Invalidazione del registro delle configurazioni (vedi registro_configurazioni.py)
+- Accodamento delle immagini caricate per l'elaborazione in background
+  (immagine principale, thumbnail e JPEG ottimizzato: vedi coda_immagini.py)
+- Riuso delle immagini già archiviate e rilascio dei riferimenti (vedi archivio_immagini.py)
 - Eliminazione file immagini alla cancellazione dell'articolo
 """
 
 import os
-from io import BytesIO
-from PIL import Image, ImageOps
-from django.core.files.base import ContentFile
 from django.db.models.signals import pre_save, post_save, post_delete
 from django.db import transaction
 from django.dispatch import receiver
-from .models import PezzoRicambio
+from .models import PezzoRicambio, Giacenza, MovimentoMagazzino, AzioneUtente, ClassificaOperatore, Configurazione
+from .archivio_immagini import acquisisci_immagine, calcola_hash, rilascia_immagine
+from .coda_immagini import accoda_elaborazione
+from .immagini import elimina_rendition_aggiuntive
+from .kpi import invalida_kpi_snapshot
+from .registro_configurazioni import registro as registro_configurazioni
+from .ricerca import indicizza_articolo
 from .codici import genera_codice_articolo, genera_placeholder_codice_articolo
 import logging
 
@@ -52,131 +59,176 @@ def normalizza_codice_interno(sender, instance, created, **kwargs):
         logger.info(f"[CODICE_SIGNAL] Codice normalizzato: {instance.codice_interno}")
 
 
-def process_image(image_file, max_size, quality=90, crop=False):
-    """
-    Processa un'immagine: ridimensiona, converte in JPEG e ottimizza.
-    
-    Args:
-        image_file: File immagine da processare
-        max_size: Dimensione massima (larghezza, altezza) in pixel
-        quality: Qualità JPEG (0-100)
-        crop: Se True, ritaglia al centro per ottenere dimensioni esatte
-        
-    Returns:
-        ContentFile con l'immagine processata
-    """
-    # Apri l'immagine con Pillow
-    img = Image.open(image_file)
-    
-    # Converti RGBA (PNG con trasparenza) in RGB
-    if img.mode in ('RGBA', 'LA', 'P'):
-        # Crea uno sfondo bianco
-        background = Image.new('RGB', img.size, (255, 255, 255))
-        if img.mode == 'P':
-            img = img.convert('RGBA')
-        background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-        img = background
-    elif img.mode != 'RGB':
-        img = img.convert('RGB')
-    
-    # Ridimensiona l'immagine
-    if crop:
-        # Crop centrato per thumbnail (dimensioni esatte)
-        img = ImageOps.fit(img, max_size, Image.Resampling.LANCZOS)
-    else:
-        # Ridimensiona mantenendo aspect ratio (per immagine grande)
-        img.thumbnail(max_size, Image.Resampling.LANCZOS)
-    
-    # Salva in formato JPEG ottimizzato
-    output = BytesIO()
-    img.save(output, format='JPEG', quality=quality, optimize=True)
-    output.seek(0)
-    
-    return ContentFile(output.read())
+@receiver(post_save, sender=PezzoRicambio)
+def aggiorna_indice_ricerca(sender, instance, **kwargs):
+    """
+    Signal post-save: riscrive i termini di ricerca dell'articolo.
+    Registrato dopo normalizza_codice_interno, quindi indicizza il codice definitivo.
+    I termini vengono eliminati in cascata con l'articolo.
+    """
+    indicizza_articolo(instance)
+
+
+def _elimina_immagini_non_condivise(articolo):
+    """Elimina i file di un'immagine salvata fuori dall'archivio (caricamenti in corso o precedenti all'archivio)"""
+    if articolo.immagine_thumbnail:
+        elimina_rendition_aggiuntive(
+            articolo.immagine.name, articolo.immagine_thumbnail.name, articolo.immagine_thumbnail.storage
+        )
+        articolo.immagine_thumbnail.delete(save=False)
+    if articolo.immagine:
+        articolo.immagine.delete(save=False)
 
 
 @receiver(pre_save, sender=PezzoRicambio)
 def process_articolo_image(sender, instance, **kwargs):
     """
-    Signal pre-save: processa l'immagine caricata generando:
-    - Immagine principale ottimizzata (max 800x800px, qualità 90%)
-    - Thumbnail (300x300px cropped, qualità 85%)
+    Signal pre-save: gestisce il cambio di immagine senza elaborarla.
+    - Foto già presente nell'archivio per contenuto: l'articolo punta subito
+      alle rendition esistenti (nessuna elaborazione, nessun file in più)
+    - Foto nuova: viene salvata così com'è, l'articolo passa in stato
+      'in elaborazione' e il post-save accoda il lavoro per i worker
+    L'immagine precedente viene rilasciata in post-save, a salvataggio avvenuto.
     """
-    logger.info(f"[IMG_SIGNAL] Signal chiamato per: {getattr(instance, 'codice_interno', 'NUOVO')}")
-    
-    # Se non c'è immagine, non fare nulla
-    if not instance.immagine:
-        logger.info("[IMG_SIGNAL] Nessuna immagine, skip")
-        # Se l'immagine è stata rimossa, elimina anche il thumbnail
-        if instance.pk:
-            try:
-                old_instance = PezzoRicambio.objects.get(pk=instance.pk)
-                if old_instance.immagine_thumbnail:
-                    old_instance.immagine_thumbnail.delete(save=False)
-                    instance.immagine_thumbnail = None
-            except PezzoRicambio.DoesNotExist:
-                pass
-        return
-    
-    logger.info(f"[IMG_SIGNAL] Immagine presente: {instance.immagine.name}")
-    
-    # Controlla se l'immagine è stata modificata
     try:
-        old_instance = PezzoRicambio.objects.get(pk=instance.pk)
+        old_instance = PezzoRicambio.objects.get(pk=instance.pk) if instance.pk else None
+    except PezzoRicambio.DoesNotExist:
+        old_instance = None
+
+    if old_instance is not None:
         # Se l'immagine non è cambiata, non riprocessare
         if old_instance.immagine == instance.immagine:
-            logger.info("[IMG_SIGNAL] Immagine non modificata")
             return
-        # Elimina le vecchie immagini
-        if old_instance.immagine:
-            old_instance.immagine.delete(save=False)
-        if old_instance.immagine_thumbnail:
-            old_instance.immagine_thumbnail.delete(save=False)
-    except PezzoRicambio.DoesNotExist:
-        # Nuovo record, nessuna immagine da eliminare
-        logger.info("[IMG_SIGNAL] Nuovo articolo con immagine")
-        pass
-    
-    logger.info("[IMG_SIGNAL] Inizio processing...")
-    
-    # Salva il file originale in memoria prima di processarlo
-    instance.immagine.seek(0)
-    image_data = instance.immagine.read()
-    instance.immagine.seek(0)
-    
-    # Processa immagine principale (max 800x800, mantiene aspect ratio)
-    large_image = process_image(BytesIO(image_data), (800, 800), quality=90, crop=False)
-    
-    # Genera nome file per immagine ottimizzata
-    original_name = instance.immagine.name
-    base_name = os.path.splitext(os.path.basename(original_name))[0]
-    large_name = f"{base_name}_large.jpg"
-    
-    logger.info(f"[IMG_SIGNAL] Salvo large: {large_name}")
-    # Salva immagine principale processata
-    instance.immagine.save(large_name, large_image, save=False)
-    
-    # Genera thumbnail (300x300 cropped al centro) usando gli stessi dati
-    thumbnail_image = process_image(BytesIO(image_data), (300, 300), quality=85, crop=True)
-    
-    # Salva thumbnail
-    thumbnail_name = f"{base_name}_thumb.jpg"
-    logger.info(f"[IMG_SIGNAL] Salvo thumb: {thumbnail_name}")
-    instance.immagine_thumbnail.save(thumbnail_name, thumbnail_image, save=False)
-    logger.info("[IMG_SIGNAL] Processing completato!")
+        # Riferimento a un originale già elaborato e rimosso dal worker
+        # (es. form aperto prima del termine dell'elaborazione): mantieni le immagini attuali
+        if instance.immagine and instance.immagine._committed and not instance.immagine.storage.exists(instance.immagine.name):
+            instance.immagine = old_instance.immagine
+            instance.immagine_thumbnail = old_instance.immagine_thumbnail
+            instance.immagine_condivisa_id = old_instance.immagine_condivisa_id
+            instance.stato_immagine = old_instance.stato_immagine
+            instance.formati_immagine = old_instance.formati_immagine
+            instance.larghezze_immagine = old_instance.larghezze_immagine
+            return
+        # Immagine precedente: i file condivisi si rilasciano in post-save, gli altri si eliminano
+        if old_instance.immagine_condivisa_id:
+            instance._immagine_da_rilasciare = old_instance.immagine_condivisa_id
+        else:
+            _elimina_immagini_non_condivise(old_instance)
+
+    instance.immagine_thumbnail = None
+    instance.immagine_condivisa = None
+    instance.formati_immagine = ''
+    instance.larghezze_immagine = ''
+
+    # Se non c'è immagine, non fare nulla
+    if not instance.immagine:
+        instance.stato_immagine = PezzoRicambio.IMMAGINE_ASSENTE
+        return
+
+    hash_contenuto = calcola_hash(instance.immagine)
+    condivisa = acquisisci_immagine(hash_contenuto)
+    if condivisa is not None:
+        instance.immagine = condivisa.nome_immagine
+        instance.immagine_thumbnail = condivisa.nome_thumbnail
+        instance.immagine_condivisa = condivisa
+        instance.formati_immagine = condivisa.formati
+        instance.larghezze_immagine = condivisa.larghezze
+        instance.stato_immagine = PezzoRicambio.IMMAGINE_PRONTA
+        logger.info(f"[IMG_SIGNAL] Immagine già in archivio: {condivisa.nome_immagine}")
+        return
+
+    instance.stato_immagine = PezzoRicambio.IMMAGINE_IN_ELABORAZIONE
+    instance._immagine_da_elaborare = hash_contenuto
+    logger.info(f"[IMG_SIGNAL] Nuova immagine da elaborare: {instance.immagine.name}")
+
+
+@receiver(post_save, sender=PezzoRicambio)
+def accoda_immagine_articolo(sender, instance, **kwargs):
+    """
+    Signal post-save: accoda l'elaborazione della nuova immagine (il file
+    originale è ormai salvato nello storage con il suo nome definitivo)
+    e rilascia l'immagine condivisa sostituita.
+    """
+    hash_contenuto = instance.__dict__.pop('_immagine_da_elaborare', None)
+    if hash_contenuto:
+        accoda_elaborazione(instance, hash_contenuto)
+
+    condivisa_id = instance.__dict__.pop('_immagine_da_rilasciare', None)
+    if condivisa_id:
+        rilascia_immagine(condivisa_id)
 
 
 @receiver(post_delete, sender=PezzoRicambio)
 def delete_articolo_images(sender, instance, **kwargs):
     """
-    Signal post-delete: elimina fisicamente i file immagini quando l'articolo viene cancellato.
+    Signal post-delete: rilascia l'immagine condivisa (i file vengono eliminati
+    quando nessun articolo la usa più) o elimina fisicamente i file non condivisi.
     """
+    if instance.immagine_condivisa_id:
+        rilascia_immagine(instance.immagine_condivisa_id)
+        return
+
+    # Elimina thumbnail e rendition aggiuntive
+    if instance.immagine_thumbnail:
+        elimina_rendition_aggiuntive(
+            instance.immagine.name, instance.immagine_thumbnail.name, instance.immagine_thumbnail.storage
+        )
+        if os.path.isfile(instance.immagine_thumbnail.path):
+            os.remove(instance.immagine_thumbnail.path)
+
     # Elimina immagine principale
     if instance.immagine:
         if os.path.isfile(instance.immagine.path):
             os.remove(instance.immagine.path)
-    
-    # Elimina thumbnail
-    if instance.immagine_thumbnail:
-        if os.path.isfile(instance.immagine_thumbnail.path):
-            os.remove(instance.immagine_thumbnail.path)
+
+
+@receiver(post_save, sender=AzioneUtente)
+def aggiorna_classifica_operatore(sender, instance, created, **kwargs):
+    """
+    Signal post-save: somma i punti della nuova azione al punteggio materializzato
+    dell'operatore (IMMAGINE vale 2 punti, le altre azioni 1).
+    """
+    if not created:
+        return
+
+    ClassificaOperatore.aggiungi_punti(
+        instance.username,
+        ClassificaOperatore.punti_per_azione(instance.tipo_azione)
+    )
+
+
+@receiver(post_delete, sender=AzioneUtente)
+def togli_azione_da_classifica(sender, instance, **kwargs):
+    """
+    Signal post-delete: toglie i punti dell'azione eliminata dal punteggio
+    materializzato dell'operatore, così la classifica resta la somma delle azioni.
+    """
+    ClassificaOperatore.togli_punti(
+        instance.username,
+        ClassificaOperatore.punti_per_azione(instance.tipo_azione)
+    )
+
+
+@receiver(post_save, sender=PezzoRicambio)
+@receiver(post_delete, sender=PezzoRicambio)
+@receiver(post_save, sender=Giacenza)
+@receiver(post_delete, sender=Giacenza)
+@receiver(post_save, sender=MovimentoMagazzino)
+@receiver(post_delete, sender=MovimentoMagazzino)
+def invalida_cache_kpi(sender, instance, **kwargs):
+    """
+    Signal post-save/post-delete: articoli, giacenze o movimenti modificati,
+    lo snapshot KPI in cache non è più valido. Lo si rimuove al commit: prima,
+    una richiesta concorrente rimetterebbe in cache i totali vecchi.
+    """
+    transaction.on_commit(invalida_kpi_snapshot)
+
+
+@receiver(post_save, sender=Configurazione)
+@receiver(post_delete, sender=Configurazione)
+def invalida_registro_configurazioni(sender, instance, **kwargs):
+    """
+    Signal post-save/post-delete: configurazione modificata (set_value o admin),
+    il registro in memoria di questo processo la rilegge alla prossima lettura.
+    """
+    registro_configurazioni.invalida()
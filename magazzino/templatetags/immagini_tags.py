@@ -0,0 +1,88 @@
+"""
+Template tags per le immagini degli articoli (rendition e formati moderni)
+"""
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from magazzino.immagini import (
+    FORMATI, RENDITION_ARTICOLO, leggi_larghezze, percorsi_rendition_articolo, percorso_formato,
+)
+
+register = template.Library()
+
+# Formati offerti al browser in ordine di preferenza (il più compatto per primo)
+ORDINE_FORMATI = ('avif', 'webp')
+
+
+@register.simple_tag
+def immagine_articolo(articolo, ritaglio=False, sizes='100vw', classe='', stile='', alt=None):
+    """
+    Genera un <picture> con le rendition dell'articolo in AVIF/WebP/JPEG:
+    il browser sceglie formato e dimensione più piccoli adatti a sizes.
+
+    Usage:
+        {% immagine_articolo articolo sizes="(min-width: 992px) 33vw, 100vw" classe="img-fluid" %}
+        {% immagine_articolo articolo ritaglio=True sizes="64px" %}
+
+    Con ritaglio=True usa le rendition quadrate (icona, thumbnail), altrimenti
+    quelle con le proporzioni originali. Le immagini non ancora elaborate (o
+    caricate prima delle rendition multiple) restano un semplice <img>.
+    """
+    if not articolo.immagine:
+        return ''
+    if alt is None:
+        alt = articolo.descrizione
+
+    formati = articolo.formati_immagine.split()
+    if articolo.stato_immagine != articolo.IMMAGINE_PRONTA or 'jpg' not in formati:
+        campo = articolo.immagine_thumbnail if ritaglio and articolo.immagine_thumbnail else articolo.immagine
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" style="{}" loading="lazy">',
+            campo.url, alt, classe, stile
+        )
+
+    storage = articolo.immagine.storage
+    percorsi = percorsi_rendition_articolo(articolo.immagine.name, articolo.immagine_thumbnail.name)
+    renditions = sorted(
+        (rendition for rendition in RENDITION_ARTICOLO if rendition.crop == ritaglio),
+        key=lambda rendition: rendition.dimensioni[0]
+    )
+
+    # Larghezze effettive salvate all'elaborazione (le rendition ritagliate sono sempre grandi
+    # quanto il riquadro). Senza larghezze salvate (immagini elaborate prima) si offre solo la
+    # rendition più grande, senza descrittore: una larghezza nominale sbagliata inganna il browser
+    if ritaglio:
+        larghezze = {rendition.nome: rendition.dimensioni[0] for rendition in renditions}
+    else:
+        larghezze = leggi_larghezze(articolo.larghezze_immagine)
+    if all(rendition.nome in larghezze for rendition in renditions):
+        # Originale piccolo: più rendition della stessa larghezza, basta la prima (la più leggera)
+        candidate = []
+        for rendition in renditions:
+            if not candidate or larghezze[rendition.nome] > larghezze[candidate[-1].nome]:
+                candidate.append(rendition)
+    else:
+        candidate, larghezze = renditions[-1:], {}
+
+    def srcset(estensione):
+        return ', '.join(
+            f"{storage.url(percorso_formato(percorsi[rendition.nome], estensione))}"
+            + (f" {larghezze[rendition.nome]}w" if larghezze else '')
+            for rendition in candidate
+        )
+
+    sorgenti = format_html_join(
+        '',
+        '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (FORMATI[estensione][1], srcset(estensione), sizes)
+            for estensione in ORDINE_FORMATI if estensione in formati
+        )
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" style="{}" loading="lazy" decoding="async"></picture>',
+        sorgenti,
+        storage.url(percorsi[candidate[-1].nome]),
+        srcset('jpg'),
+        sizes, alt, classe, stile
+    )
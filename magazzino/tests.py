@@ -1,11 +1,48 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Template
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
 
 from accounts.models import RuoloUtente
+from .backup_manager import BackupManager, _TempiTabelle
+from .albero_categorie import ALBERO_QUERY_BUDGET, costruisci_albero_categorie
+from .coda_immagini import MAX_TENTATIVI, drena_coda
 from .codici import genera_codice_articolo
-from .forms import PezzoRicambioForm
-from .models import Categoria, Fornitore, MatricolaMacchinaSCM, ModelloMacchinaSCM, PezzoRicambio, TbAppellativo, UnitaMisura
+from .forms import CategoriaForm, MovimentoMagazzinoForm, PezzoRicambioForm
+from .immagini import (
+	RENDITION_ARTICOLO, Rendition, decodifica_intermedia, genera_rendition, percorsi_rendition_articolo, percorso_formato,
+)
+from .kpi import KPI_QUERY_BUDGET, calcola_kpi_snapshot, get_kpi_snapshot, statistiche_cache_kpi
+from .lavori_backup import accoda_lavoro, chiudi_interrotti, esegui_lavoro, prenota_lavoro
+from .registro_configurazioni import registro as registro_configurazioni
+from .models import (
+	AzioneUtente, Categoria, ClassificaOperatore, Fornitore, Giacenza, ImmagineCondivisa, LavoroBackup, LavoroImmagine,
+	Configurazione, MatricolaMacchinaSCM, ModelloMacchinaSCM, MovimentoMagazzino, PezzoRicambio, TbAppellativo, UnitaMisura,
+)
+from .movimenti import registra_movimenti_batch, registra_movimento
+from .pianificazione_backup import BACKUP_COMPLETO, BACKUP_INCREMENTALE, backup_dovuto, classifica_backup, leggi_orari
+from .ricerca import cerca_articoli, termini_articolo
+from .views import ARTICOLO_FORM_QUERY_BUDGET, ARTICOLO_MODIFICA_QUERY_BUDGET
 
 
 class CodiceArticoloAutomaticoTests(TestCase):
@@ -180,6 +217,54 @@ class LayoutModificaArticoloTests(TestCase):
 		self.assertNotContains(response, 'name="codice_interno"', html=False)
 
 
+class QueryFormArticoloTests(TestCase):
+	def setUp(self):
+		self.categoria = Categoria.objects.create(nome_categoria='Categoria Query')
+		self.unita_misura = UnitaMisura.objects.create(denominazione='PZ QUERY')
+		self.modello_scm = ModelloMacchinaSCM.objects.create(nome_modello='Scm Query 200')
+		self.articolo = PezzoRicambio.objects.create(
+			descrizione='Articolo query',
+			categoria=self.categoria,
+			unita_misura=self.unita_misura,
+		)
+		self.crea_matricole(1)
+		self.utente_admin = User.objects.create_user(username='admin_query_form', password='PasswordSicura123!')
+		self.utente_admin.profilo.ruolo = RuoloUtente.ADMIN
+		self.utente_admin.profilo.save()
+
+	def crea_matricole(self, quante):
+		inizio = MatricolaMacchinaSCM.objects.count()
+		for numero in range(inizio, inizio + quante):
+			MatricolaMacchinaSCM.objects.create(modello=self.modello_scm, matricola_macchina=f'MATR-Q-{numero:03d}')
+
+	def query_render_form(self):
+		with CaptureQueriesContext(connection) as query:
+			html = str(PezzoRicambioForm(instance=self.articolo))
+		return len(query), html
+
+	def test_render_form_con_query_costanti_rispetto_alle_matricole(self):
+		query_iniziali, _ = self.query_render_form()
+
+		self.crea_matricole(10)
+		query_finali, html = self.query_render_form()
+
+		self.assertEqual(query_finali, query_iniziali)
+		self.assertEqual(html.count(f'data-modello-id="{self.modello_scm.pk}"'), 11)
+
+	def test_pagine_form_articolo_entro_il_budget_di_query(self):
+		self.client.force_login(self.utente_admin)
+		pagine = [
+			(reverse('magazzino:articolo_create'), ARTICOLO_FORM_QUERY_BUDGET),
+			(reverse('magazzino:articolo_update', args=[self.articolo.pk]), ARTICOLO_MODIFICA_QUERY_BUDGET),
+		]
+		for matricole in (0, 10):
+			self.crea_matricole(matricole)
+			for url, budget in pagine:
+				with self.subTest(url=url, matricole=matricole), self.assertNumQueries(budget):
+					response = self.client.get(url)
+				self.assertEqual(response.status_code, 200)
+
+
 class GestioneTabelleRecordTests(TestCase):
 	def setUp(self):
 		self.utente_admin = User.objects.create_user(username='admin_tabella', password='PasswordSicura123!')
@@ -246,3 +331,1262 @@ class GestioneTabelleRecordTests(TestCase):
 		self.assertContains(response, self.unita_attiva.denominazione)
 		self.assertContains(response, self.unita_inattiva.denominazione)
 		self.assertContains(response, 'Mostra solo attivi')
+
+
+class ClassificaOperatoriTests(TestCase):
+	def setUp(self):
+		self.utente_admin = User.objects.create_user(
+			username='admin_classifica',
+			password='PasswordSicura123!',
+			first_name='Mario',
+			last_name='Rossi',
+		)
+		self.utente_admin.profilo.ruolo = RuoloUtente.ADMIN
+		self.utente_admin.profilo.save()
+
+	def test_azioni_aggiornano_punteggio_con_peso_immagine(self):
+		AzioneUtente.objects.create(username='admin_classifica', tipo_azione='ARTICOLO')
+		AzioneUtente.objects.create(username='admin_classifica', tipo_azione='IMMAGINE')
+		AzioneUtente.objects.create(username='admin_classifica', tipo_azione='CARICO')
+
+		self.assertEqual(ClassificaOperatore.objects.get(username='admin_classifica').punti, 4)
+
+	def test_azioni_eliminate_tolgono_i_punti(self):
+		AzioneUtente.objects.create(username='admin_classifica', tipo_azione='ARTICOLO')
+		immagine = AzioneUtente.objects.create(username='admin_classifica', tipo_azione='IMMAGINE')
+		AzioneUtente.objects.create(username='admin_classifica', tipo_azione='CARICO')
+
+		immagine.delete()
+		self.assertEqual(ClassificaOperatore.objects.get(username='admin_classifica').punti, 2)
+
+		AzioneUtente.objects.filter(username='admin_classifica').delete()
+		self.assertEqual(ClassificaOperatore.objects.get(username='admin_classifica').punti, 0)
+
+	def test_dashboard_mostra_top_operatori_dalla_classifica(self):
+		AzioneUtente.objects.create(username='admin_classifica', tipo_azione='IMMAGINE')
+		self.client.force_login(self.utente_admin)
+
+		response = self.client.get(reverse('magazzino:dashboard'))
+
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.context['top_operatori'], [{
+			'username': 'admin_classifica',
+			'operatore': 'Mario Rossi',
+			'totale_articoli': 2,
+		}])
+
+	def test_reset_classifica_azzera_azioni_e_punteggi(self):
+		AzioneUtente.objects.create(username='admin_classifica', tipo_azione='FORNITORE')
+		self.client.force_login(self.utente_admin)
+
+		self.client.post(reverse('magazzino:reset_classifica'))
+
+		self.assertFalse(AzioneUtente.objects.exists())
+		self.assertFalse(ClassificaOperatore.objects.exists())
+
+
+class KpiSnapshotTests(TestCase):
+	def setUp(self):
+		self.categoria = Categoria.objects.create(nome_categoria='Categoria KPI')
+		self.unita_misura = UnitaMisura.objects.create(denominazione='PZ KPI')
+
+	def crea_articolo(self, descrizione, quantita=None, **campi):
+		articolo = PezzoRicambio.objects.create(
+			descrizione=descrizione,
+			categoria=self.categoria,
+			unita_misura=self.unita_misura,
+			**campi,
+		)
+		if quantita is not None:
+			Giacenza.objects.create(articolo=articolo, quantita_disponibile=quantita, quantita_impegnata=1)
+		return articolo
+
+	def test_snapshot_calcola_contatori_e_coperture(self):
+		self.crea_articolo('Con SCM', quantita=2, codice_scm='07L0320061B', codice_fornitore='F-1')
+		self.crea_articolo('Fornitore vuoto', quantita=50, codice_fornitore='   ')
+		self.crea_articolo('Senza giacenza')
+		self.crea_articolo('Disattivo', quantita=1, stato_attivo=False)
+
+		with self.assertNumQueries(KPI_QUERY_BUDGET):
+			kpi = calcola_kpi_snapshot()
+
+		self.assertEqual(kpi.articoli_attivi, 3)
+		self.assertEqual(kpi.articoli_non_attivi, 1)
+		self.assertEqual(kpi.articoli_con_codice_scm, 1)
+		self.assertEqual(kpi.articoli_con_codice_fornitore, 1)
+		self.assertEqual(kpi.articoli_con_foto, 0)
+		self.assertEqual(kpi.articoli_sotto_soglia, 1)
+		self.assertEqual(kpi.totale_disponibile, 53)
+		self.assertEqual(kpi.totale_impegnata, 3)
+		self.assertEqual(kpi.copertura_codice_scm_pct, 33.3)
+		self.assertEqual(kpi.indice_completezza_pct, 22.2)
+
+	def test_snapshot_vuoto_restituisce_zeri(self):
+		kpi = calcola_kpi_snapshot()
+
+		self.assertEqual(kpi.articoli_attivi, 0)
+		self.assertEqual(kpi.totale_disponibile, 0)
+		self.assertEqual(kpi.indice_completezza_pct, 0)
+
+
+class CacheKpiTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.categoria = Categoria.objects.create(nome_categoria='Categoria Cache')
+		self.unita_misura = UnitaMisura.objects.create(denominazione='PZ CACHE')
+
+	def crea_articolo(self, descrizione):
+		return PezzoRicambio.objects.create(
+			descrizione=descrizione,
+			categoria=self.categoria,
+			unita_misura=self.unita_misura,
+		)
+
+	def test_snapshot_servito_da_cache_fino_a_modifica(self):
+		self.crea_articolo('Articolo 1')
+		self.assertEqual(get_kpi_snapshot().articoli_attivi, 1)
+
+		with self.assertNumQueries(0):
+			self.assertEqual(get_kpi_snapshot().articoli_attivi, 1)
+
+		with self.captureOnCommitCallbacks(execute=True):
+			self.crea_articolo('Articolo 2')
+			# Prima del commit lo snapshot resta quello in cache
+			self.assertEqual(get_kpi_snapshot().articoli_attivi, 1)
+
+		self.assertEqual(get_kpi_snapshot().articoli_attivi, 2)
+		self.assertEqual(statistiche_cache_kpi()['hit'], 2)
+		self.assertEqual(statistiche_cache_kpi()['miss'], 2)
+
+	def test_eliminazione_giacenza_invalida_cache(self):
+		articolo = self.crea_articolo('Articolo giacenza')
+		giacenza = Giacenza.objects.create(articolo=articolo, quantita_disponibile=7)
+		self.assertEqual(get_kpi_snapshot().totale_disponibile, 7)
+
+		with self.captureOnCommitCallbacks(execute=True):
+			giacenza.delete()
+
+		self.assertEqual(get_kpi_snapshot().totale_disponibile, 0)
+
+
+class PercorsoCategoriaTests(TestCase):
+	def setUp(self):
+		self.unita_misura = UnitaMisura.objects.create(denominazione='PZ ALBERO')
+		self.macro = Categoria.objects.create(nome_categoria='Motore')
+		self.categoria = Categoria.objects.create(nome_categoria='Cinghie', categoria_padre=self.macro)
+		self.sotto = Categoria.objects.create(nome_categoria='Distribuzione', categoria_padre=self.categoria)
+		self.altra_macro = Categoria.objects.create(nome_categoria='Elettrica')
+
+	def crea_articolo(self, categoria):
+		return PezzoRicambio.objects.create(
+			descrizione=f'Articolo {categoria.nome_categoria}',
+			categoria=categoria,
+			unita_misura=self.unita_misura,
+		)
+
+	def test_save_calcola_percorso_e_livello(self):
+		self.assertEqual(self.sotto.percorso, f'/{self.macro.pk}/{self.categoria.pk}/{self.sotto.pk}/')
+		self.assertEqual(self.sotto.livello, 2)
+
+	def test_sottoalbero_breadcrumb_e_conteggio_con_una_query(self):
+		self.crea_articolo(self.macro)
+		self.crea_articolo(self.sotto)
+		self.crea_articolo(self.altra_macro)
+
+		with self.assertNumQueries(1):
+			self.assertEqual(set(self.macro.get_all_children_ids()), {self.categoria.pk, self.sotto.pk})
+		with self.assertNumQueries(1):
+			self.assertEqual(self.macro.count_articoli(), 2)
+		sotto = Categoria.objects.get(pk=self.sotto.pk)
+		with self.assertNumQueries(1):
+			self.assertEqual(sotto.get_breadcrumb(), 'Motore > Cinghie > Distribuzione')
+
+	def test_sottoalbero_esclude_rami_disattivati(self):
+		self.categoria.stato_attivo = False
+		self.categoria.save()
+
+		self.assertEqual(self.macro.get_all_children(), [])
+
+	def test_spostamento_aggiorna_percorso_dei_discendenti(self):
+		self.categoria.categoria_padre = self.altra_macro
+		self.categoria.save()
+
+		self.sotto.refresh_from_db()
+		self.assertEqual(self.sotto.percorso, f'/{self.altra_macro.pk}/{self.categoria.pk}/{self.sotto.pk}/')
+		self.assertEqual(self.sotto.get_breadcrumb(), 'Elettrica > Cinghie > Distribuzione')
+
+	def test_spostamento_sotto_discendente_rifiutato(self):
+		self.macro.categoria_padre = self.sotto
+
+		with self.assertRaises(ValidationError):
+			self.macro.save()
+
+	def test_form_modifica_categoria_di_terzo_livello(self):
+		sorella = Categoria.objects.create(nome_categoria='Pulegge', categoria_padre=self.macro)
+
+		form = CategoriaForm(instance=self.sotto)
+
+		self.assertEqual(form.initial['macrocategoria'], self.macro)
+		self.assertEqual(form.initial['categoria_livello2'], self.categoria)
+		self.assertEqual(set(form.fields['categoria_livello2'].queryset), {self.categoria, sorella})
+		self.assertNotIn(self.sotto, form.fields['categoria_padre'].queryset)
+
+
+class AlberoCategorieTests(TestCase):
+	def setUp(self):
+		self.unita_misura = UnitaMisura.objects.create(denominazione='PZ TREE')
+		self.macro = Categoria.objects.create(nome_categoria='Motore')
+		self.categoria = Categoria.objects.create(nome_categoria='Cinghie', categoria_padre=self.macro)
+		self.sotto = Categoria.objects.create(nome_categoria='Distribuzione', categoria_padre=self.categoria)
+		self.disattiva = Categoria.objects.create(
+			nome_categoria='Dismessa', categoria_padre=self.macro, stato_attivo=False,
+		)
+		for categoria in (self.macro, self.sotto, self.sotto, self.disattiva):
+			PezzoRicambio.objects.create(
+				descrizione=f'Articolo {categoria.nome_categoria}',
+				categoria=categoria,
+				unita_misura=self.unita_misura,
+			)
+
+	def test_albero_in_query_costanti_con_conteggi_del_sottoalbero(self):
+		with self.assertNumQueries(ALBERO_QUERY_BUDGET):
+			radici = costruisci_albero_categorie()
+
+		self.assertEqual([nodo.categoria for nodo in radici], [self.macro])
+		macro = radici[0]
+		self.assertTrue(macro.ha_figli)
+		self.assertEqual(macro.articoli_totali, self.macro.count_articoli())
+		self.assertEqual(macro.articoli_totali, 3)
+		self.assertEqual(macro.figli[0].articoli_totali, 2)
+
+	def test_filtro_attivo_nasconde_sottocategorie_disattivate(self):
+		radici = costruisci_albero_categorie('attivo')
+
+		self.assertEqual([nodo.categoria for nodo in radici[0].figli], [self.categoria])
+		self.assertEqual(costruisci_albero_categorie('inattivo'), [])
+
+
+class RicercaArticoliTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.utente = User.objects.create_user(username='operatore_ricerca', password='PasswordSicura123!')
+		self.categoria = Categoria.objects.create(nome_categoria='Categoria Ricerca')
+		self.unita_misura = UnitaMisura.objects.create(denominazione='PZ RICERCA')
+		self.cinghia = self.crea_articolo('Cinghia dentata distribuzione', codice_scm='07L0320061B')
+		self.puleggia = self.crea_articolo(
+			'Puleggia motore', descrizione_scm='Puleggia per cinghia', codice_fornitore='FRN-778',
+		)
+		self.cuscinetto = self.crea_articolo('Cuscinetto a sfere')
+
+	def crea_articolo(self, descrizione, **campi):
+		return PezzoRicambio.objects.create(
+			descrizione=descrizione,
+			categoria=self.categoria,
+			unita_misura=self.unita_misura,
+			**campi,
+		)
+
+	def cerca(self, testo):
+		return list(cerca_articoli(PezzoRicambio.objects.all(), testo).order_by('-punteggio_ricerca', 'descrizione'))
+
+	def test_termini_includono_suffissi_dei_codici(self):
+		termini = termini_articolo({'codice_scm': '07L0320061B', 'descrizione': 'Giunto Ø40'})
+
+		self.assertEqual(termini['07l0320061b'], 10)
+		self.assertIn('0320061b', termini)
+		self.assertEqual(termini['giunto'], 3)
+		self.assertIn('o40', termini)
+
+	def test_ricerca_ordina_per_rilevanza(self):
+		self.assertEqual(self.cerca('cinghia'), [self.cinghia, self.puleggia])
+		self.assertEqual(self.cerca('0320061'), [self.cinghia])
+		self.assertEqual(self.cerca('frn 778'), [self.puleggia])
+		self.assertEqual(self.cerca(self.cuscinetto.codice_interno), [self.cuscinetto])
+
+	def test_tutte_le_parole_devono_essere_trovate(self):
+		self.assertEqual(self.cerca('puleggia cinghia'), [self.puleggia])
+		self.assertEqual(self.cerca('cinghia sfere'), [])
+
+	def test_indice_aggiornato_alla_modifica(self):
+		self.cuscinetto.descrizione = 'Cuscinetto conico'
+		self.cuscinetto.save()
+
+		self.assertEqual(self.cerca('sfere'), [])
+		self.assertEqual(self.cerca('conico'), [self.cuscinetto])
+
+	def test_autocomplete_restituisce_articoli_attivi_paginati(self):
+		self.crea_articolo('Cinghia dismessa', stato_attivo=False)
+		Giacenza.objects.create(articolo=self.cinghia, quantita_disponibile=4)
+		self.client.force_login(self.utente)
+		url = reverse('magazzino:api_articolo_autocomplete')
+
+		prima = self.client.get(url, {'q': 'cingh', 'limit': 1}).json()
+		seconda = self.client.get(url, {'q': 'cingh', 'limit': 1, 'page': 2}).json()
+
+		self.assertEqual(prima['risultati'], [{
+			'id': self.cinghia.pk,
+			'codice_interno': self.cinghia.codice_interno,
+			'descrizione': self.cinghia.descrizione,
+			'disponibile': 4,
+		}])
+		self.assertTrue(prima['has_more'])
+		self.assertEqual([r['id'] for r in seconda['risultati']], [self.puleggia.pk])
+		self.assertFalse(seconda['has_more'])
+
+	def test_autocomplete_servito_da_cache(self):
+		self.client.force_login(self.utente)
+		url = reverse('magazzino:api_articolo_autocomplete')
+		self.client.get(url, {'q': 'sfere'})
+
+		self.cuscinetto.delete()
+
+		self.assertEqual(len(self.client.get(url, {'q': 'sfere'}).json()['risultati']), 1)
+
+	def test_form_movimento_non_elenca_tutto_il_catalogo(self):
+		form = MovimentoMagazzinoForm(initial={'articolo': self.cinghia.pk})
+		html = str(form['articolo'])
+
+		self.assertIn(self.cinghia.codice_interno, html)
+		self.assertNotIn(self.puleggia.codice_interno, html)
+		self.assertIn(reverse('magazzino:api_articolo_autocomplete'), html)
+
+
+class RegistroMovimentiTests(TestCase):
+	def setUp(self):
+		self.categoria = Categoria.objects.create(nome_categoria='Categoria Movimenti')
+		self.unita_misura = UnitaMisura.objects.create(denominazione='PZ MOV')
+		self.articolo = PezzoRicambio.objects.create(
+			descrizione='Articolo movimenti',
+			categoria=self.categoria,
+			unita_misura=self.unita_misura,
+		)
+
+	def movimento(self, tipo, quantita):
+		return MovimentoMagazzino(articolo=self.articolo, tipo_movimento=tipo, quantita=quantita, operatore='op')
+
+	def test_carico_crea_giacenza_e_registra_azione(self):
+		registra_movimento(self.movimento('CARICO', 5))
+		registra_movimento(self.movimento('CARICO', 3))
+
+		self.assertEqual(Giacenza.objects.get(articolo=self.articolo).quantita_disponibile, 8)
+		self.assertEqual(AzioneUtente.objects.filter(username='op', tipo_azione='CARICO').count(), 2)
+
+	def test_scarico_oltre_disponibile_rifiutato_senza_scritture(self):
+		registra_movimento(self.movimento('CARICO', 2))
+
+		with self.assertRaises(ValidationError) as errore:
+			registra_movimento(self.movimento('SCARICO', 3))
+
+		self.assertEqual(errore.exception.code, 'insufficient_stock')
+		self.assertEqual(Giacenza.objects.get(articolo=self.articolo).quantita_disponibile, 2)
+		self.assertEqual(MovimentoMagazzino.objects.filter(tipo_movimento='SCARICO').count(), 0)
+
+	def test_rettifica_imposta_quantita(self):
+		registra_movimento(self.movimento('CARICO', 9))
+		registra_movimento(self.movimento('RETTIFICA', 4))
+
+		self.assertEqual(Giacenza.objects.get(articolo=self.articolo).quantita_disponibile, 4)
+
+
+class MovimentiBatchTests(TestCase):
+	def setUp(self):
+		self.utente = User.objects.create_user(username='magazziniere', password='PasswordSicura123!')
+		self.utente.profilo.ruolo = RuoloUtente.ADMIN
+		self.utente.profilo.save()
+		categoria = Categoria.objects.create(nome_categoria='Categoria DDT')
+		unita_misura = UnitaMisura.objects.create(denominazione='PZ DDT')
+		self.primo, self.secondo = [
+			PezzoRicambio.objects.create(descrizione=f'Articolo DDT {n}', categoria=categoria, unita_misura=unita_misura)
+			for n in (1, 2)
+		]
+		Giacenza.objects.create(articolo=self.secondo, quantita_disponibile=3)
+
+	def test_batch_registra_righe_e_raggruppa_giacenze(self):
+		righe = [
+			{'articolo_id': self.primo.pk, 'tipo_movimento': 'CARICO', 'quantita': 4},
+			{'articolo_id': self.primo.pk, 'tipo_movimento': 'CARICO', 'quantita': 6},
+			{'articolo_id': self.secondo.pk, 'tipo_movimento': 'SCARICO', 'quantita': 2},
+		]
+
+		movimenti = registra_movimenti_batch(righe, operatore='magazziniere', numero_documento='DDT-77')
+
+		self.assertEqual(len(movimenti), 3)
+		self.assertEqual(Giacenza.objects.get(articolo=self.primo).quantita_disponibile, 10)
+		self.assertEqual(Giacenza.objects.get(articolo=self.secondo).quantita_disponibile, 1)
+		self.assertEqual(MovimentoMagazzino.objects.filter(numero_documento='DDT-77').count(), 3)
+		self.assertEqual(ClassificaOperatore.objects.get(username='magazziniere').punti, 2)
+
+	def test_batch_con_riga_non_valida_non_scrive_nulla(self):
+		righe = [
+			{'articolo_id': self.primo.pk, 'tipo_movimento': 'CARICO', 'quantita': 4},
+			{'articolo_id': self.secondo.pk, 'tipo_movimento': 'SCARICO', 'quantita': 5},
+		]
+
+		with self.assertRaises(ValidationError) as errore:
+			registra_movimenti_batch(righe, operatore='magazziniere', numero_documento='DDT-78')
+
+		self.assertIn('disponibile 3, richiesto 5', errore.exception.messages[0])
+		self.assertFalse(MovimentoMagazzino.objects.exists())
+		self.assertFalse(Giacenza.objects.filter(articolo=self.primo).exists())
+		self.assertEqual(Giacenza.objects.get(articolo=self.secondo).quantita_disponibile, 3)
+
+	def test_batch_accetta_solo_quantita_intere(self):
+		righe = [
+			{'articolo_id': self.primo.pk, 'tipo_movimento': 'CARICO', 'quantita': 2.9},
+			{'articolo_id': self.primo.pk, 'tipo_movimento': 'CARICO', 'quantita': True},
+			{'articolo_id': str(self.primo.pk), 'tipo_movimento': 'CARICO', 'quantita': '3'},
+		]
+
+		with self.assertRaises(ValidationError) as errore:
+			registra_movimenti_batch(righe, operatore='magazziniere', numero_documento='DDT-81')
+
+		self.assertEqual(len(errore.exception.messages), 2)
+		self.assertFalse(MovimentoMagazzino.objects.exists())
+
+	def test_endpoint_batch_usa_tipo_movimento_predefinito(self):
+		self.client.force_login(self.utente)
+
+		response = self.client.post(
+			reverse('magazzino:movimento_batch'),
+			data={
+				'numero_documento': 'DDT-79',
+				'tipo_movimento': 'CARICO',
+				'righe': [{'articolo_id': self.primo.pk, 'quantita': 2}, {'articolo_id': 'x', 'quantita': 1}],
+			},
+			content_type='application/json',
+		)
+
+		self.assertEqual(response.status_code, 400)
+		self.assertEqual(len(response.json()['errori']), 1)
+
+		response = self.client.post(
+			reverse('magazzino:movimento_batch'),
+			data={'numero_documento': 'DDT-79', 'righe': [{'articolo_id': self.primo.pk, 'quantita': 2}]},
+			content_type='application/json',
+		)
+
+		self.assertEqual(response.json(), {'success': True, 'movimenti': 1})
+		self.assertEqual(Giacenza.objects.get(articolo=self.primo).quantita_disponibile, 2)
+
+	def test_endpoint_batch_rifiuta_intestazione_non_valida(self):
+		self.client.force_login(self.utente)
+		righe = [{'articolo_id': self.primo.pk, 'quantita': 2}]
+
+		for intestazione in ({'numero_documento': 80}, {'numero_documento': 'D' * 51}, {'fornitore_id': 'abc'}):
+			response = self.client.post(
+				reverse('magazzino:movimento_batch'),
+				data={'numero_documento': 'DDT-80', 'righe': righe, **intestazione},
+				content_type='application/json',
+			)
+			self.assertEqual(response.status_code, 400)
+
+		self.assertFalse(MovimentoMagazzino.objects.exists())
+
+
+class RegistroMovimentiConcorrenzaTests(TransactionTestCase):
+	def setUp(self):
+		categoria = Categoria.objects.create(nome_categoria='Categoria Concorrenza')
+		unita_misura = UnitaMisura.objects.create(denominazione='PZ CONC')
+		self.articolo = PezzoRicambio.objects.create(
+			descrizione='Articolo conteso',
+			categoria=categoria,
+			unita_misura=unita_misura,
+		)
+		Giacenza.objects.create(articolo=self.articolo, quantita_disponibile=10)
+
+	def scarica(self, _):
+		try:
+			registra_movimento(MovimentoMagazzino(
+				articolo_id=self.articolo.pk, tipo_movimento='SCARICO', quantita=1, operatore='op',
+			))
+			return True
+		except ValidationError:
+			return False
+		finally:
+			connection.close()
+
+	def test_scarichi_concorrenti_non_perdono_aggiornamenti(self):
+		with ThreadPoolExecutor(max_workers=8) as executor:
+			esiti = list(executor.map(self.scarica, range(25)))
+
+		self.assertEqual(esiti.count(True), 10)
+		self.assertEqual(Giacenza.objects.get(articolo=self.articolo).quantita_disponibile, 0)
+		self.assertEqual(MovimentoMagazzino.objects.filter(articolo=self.articolo).count(), 10)
+
+
+class CodaImmaginiTests(TestCase):
+	def setUp(self):
+		media_root = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+		impostazioni = override_settings(MEDIA_ROOT=media_root)
+		impostazioni.enable()
+		self.addCleanup(impostazioni.disable)
+
+		self.categoria = Categoria.objects.create(nome_categoria='Categoria Immagini')
+		self.unita_misura = UnitaMisura.objects.create(denominazione='PZ IMG')
+		self.articolo = PezzoRicambio.objects.create(
+			descrizione='Articolo con foto',
+			categoria=self.categoria,
+			unita_misura=self.unita_misura,
+		)
+
+	def png(self, colore=(200, 30, 30, 255)):
+		buffer = BytesIO()
+		Image.new('RGBA', (1200, 600), colore).save(buffer, format='PNG')
+		return buffer.getvalue()
+
+	def carica_immagine(self, nome='foto.png', contenuto=None):
+		self.articolo.immagine = SimpleUploadedFile(nome, contenuto or self.png(), content_type='image/png')
+		self.articolo.save()
+		self.articolo.refresh_from_db()
+
+	def crea_gemello(self):
+		gemello = PezzoRicambio.objects.create(
+			descrizione='Articolo con la stessa foto',
+			categoria=self.categoria,
+			unita_misura=self.unita_misura,
+			immagine=SimpleUploadedFile('copia.png', self.png(), content_type='image/png'),
+		)
+		gemello.refresh_from_db()
+		return gemello
+
+	def test_salvataggio_accoda_senza_elaborare(self):
+		self.carica_immagine()
+
+		self.assertEqual(self.articolo.stato_immagine, PezzoRicambio.IMMAGINE_IN_ELABORAZIONE)
+		self.assertFalse(self.articolo.immagine_thumbnail)
+		lavoro = LavoroImmagine.objects.get(articolo=self.articolo)
+		self.assertEqual(lavoro.stato, LavoroImmagine.IN_CODA)
+		self.assertEqual(lavoro.nome_file, self.articolo.immagine.name)
+		self.assertTrue(self.articolo.immagine.storage.exists(lavoro.nome_file))
+
+	def test_worker_genera_immagini_e_rimuove_originale(self):
+		self.carica_immagine()
+		originale = self.articolo.immagine.name
+
+		self.assertEqual(drena_coda(), (1, 0))
+
+		self.articolo.refresh_from_db()
+		self.assertEqual(self.articolo.stato_immagine, PezzoRicambio.IMMAGINE_PRONTA)
+		self.assertTrue(self.articolo.immagine.name.endswith('_large.jpg'))
+		with Image.open(self.articolo.immagine.path) as large:
+			self.assertEqual(large.size, (800, 400))
+		with Image.open(self.articolo.immagine_thumbnail.path) as thumb:
+			self.assertEqual(thumb.size, (300, 300))
+		self.assertFalse(self.articolo.immagine.storage.exists(originale))
+		self.assertEqual(LavoroImmagine.objects.get().stato, LavoroImmagine.COMPLETATO)
+
+	@override_settings(IMMAGINI_FORMATI_ALTERNATIVI=('webp',))
+	def test_worker_salva_formati_alternativi(self):
+		self.carica_immagine()
+		drena_coda()
+
+		self.articolo.refresh_from_db()
+		self.assertEqual(self.articolo.formati_immagine, 'jpg webp')
+		storage = self.articolo.immagine.storage
+		for percorso in percorsi_rendition_articolo(self.articolo.immagine.name, self.articolo.immagine_thumbnail.name).values():
+			self.assertTrue(storage.exists(percorso))
+			self.assertTrue(storage.exists(percorso_formato(percorso, 'webp')))
+
+		with self.captureOnCommitCallbacks(execute=True):
+			self.articolo.delete()
+		self.assertFalse(storage.exists(percorso_formato(percorso, 'webp')))
+
+	def test_template_tag_picture(self):
+		self.carica_immagine()
+		modello = Template('{% load immagini_tags %}{% immagine_articolo articolo ritaglio=True sizes="64px" %}')
+
+		# Immagine in elaborazione: semplice <img> sull'originale
+		html = modello.render(Context({'articolo': self.articolo}))
+		self.assertNotIn('<picture>', html)
+		self.assertIn(self.articolo.immagine.url, html)
+
+		with self.settings(IMMAGINI_FORMATI_ALTERNATIVI=('webp',)):
+			drena_coda()
+		self.articolo.refresh_from_db()
+		html = modello.render(Context({'articolo': self.articolo}))
+
+		self.assertIn('<source type="image/webp"', html)
+		self.assertIn('_thumb_icona.webp 64w', html)
+		self.assertIn('_thumb.webp 300w', html)
+		self.assertIn('_thumb.jpg 300w', html)
+		self.assertNotIn('_large', html)
+
+	def test_template_tag_larghezze_reali_senza_ritaglio(self):
+		modello = Template('{% load immagini_tags %}{% immagine_articolo articolo %}')
+		for dimensioni, attese, escluse in (
+			((600, 1200), ('_thumb_medio.jpg 200w', '_large.jpg 400w'), ()),
+			((200, 100), ('_thumb_medio.jpg 200w',), ('_large.jpg ',)),
+		):
+			buffer = BytesIO()
+			Image.new('RGB', dimensioni, (30, 30, 200)).save(buffer, format='PNG')
+			self.carica_immagine(contenuto=buffer.getvalue())
+			drena_coda()
+			self.articolo.refresh_from_db()
+
+			# Larghezze salvate all'elaborazione: il tag non apre i file
+			with mock.patch.object(type(self.articolo.immagine.storage), 'open') as apri:
+				html = modello.render(Context({'articolo': self.articolo}))
+			apri.assert_not_called()
+
+			for attesa in attese:
+				self.assertIn(attesa, html)
+			for esclusa in escluse:
+				self.assertNotIn(esclusa, html)
+
+	def test_immagine_sostituita_prima_dell_elaborazione(self):
+		self.carica_immagine('prima.png')
+		seconda = self.png((30, 200, 30, 255))
+		self.carica_immagine('seconda.png', seconda)
+
+		self.assertEqual(drena_coda(), (2, 0))
+
+		self.articolo.refresh_from_db()
+		self.assertEqual(self.articolo.immagine_condivisa.hash_contenuto, hashlib.sha256(seconda).hexdigest())
+		self.assertEqual(self.articolo.stato_immagine, PezzoRicambio.IMMAGINE_PRONTA)
+		self.assertEqual(ImmagineCondivisa.objects.count(), 1)
+
+	def test_foto_duplicata_riusa_i_file_senza_elaborazione(self):
+		self.carica_immagine()
+		drena_coda()
+		self.articolo.refresh_from_db()
+
+		gemello = self.crea_gemello()
+
+		self.assertEqual(gemello.stato_immagine, PezzoRicambio.IMMAGINE_PRONTA)
+		self.assertEqual(gemello.immagine.name, self.articolo.immagine.name)
+		self.assertEqual(gemello.immagine_thumbnail.name, self.articolo.immagine_thumbnail.name)
+		self.assertEqual(LavoroImmagine.objects.count(), 1)
+		self.assertEqual(gemello.immagine_condivisa.riferimenti, 2)
+
+	def test_file_eliminati_con_l_ultimo_riferimento(self):
+		self.carica_immagine()
+		drena_coda()
+		self.articolo.refresh_from_db()
+		gemello = self.crea_gemello()
+		storage = gemello.immagine.storage
+		nome = gemello.immagine.name
+
+		with self.captureOnCommitCallbacks(execute=True):
+			self.articolo.delete()
+		self.assertTrue(storage.exists(nome))
+		self.assertEqual(ImmagineCondivisa.objects.get().riferimenti, 1)
+
+		with self.captureOnCommitCallbacks(execute=True):
+			gemello.delete()
+		self.assertFalse(storage.exists(nome))
+		self.assertFalse(ImmagineCondivisa.objects.exists())
+
+	def test_errore_ritentato_poi_segnalato(self):
+		self.carica_immagine('rotta.png', b'non un immagine')
+
+		self.assertEqual(drena_coda(), (0, 1))
+		lavoro = LavoroImmagine.objects.get()
+		self.assertEqual(lavoro.stato, LavoroImmagine.IN_CODA)
+		self.assertEqual(lavoro.tentativi, 1)
+		self.assertGreater(lavoro.eseguibile_dal, timezone.now())
+
+		LavoroImmagine.objects.update(tentativi=MAX_TENTATIVI - 1, eseguibile_dal=timezone.now())
+		self.assertEqual(drena_coda(), (0, 1))
+
+		lavoro.refresh_from_db()
+		self.articolo.refresh_from_db()
+		self.assertEqual(lavoro.stato, LavoroImmagine.ERRORE)
+		self.assertEqual(self.articolo.stato_immagine, PezzoRicambio.IMMAGINE_ERRORE)
+
+	def test_comando_drena_la_coda(self):
+		self.carica_immagine()
+		output = StringIO()
+
+		call_command('coda_immagini', '--drena', stdout=output)
+
+		self.assertIn('Lavori completati: 1', output.getvalue())
+		self.articolo.refresh_from_db()
+		self.assertEqual(self.articolo.stato_immagine, PezzoRicambio.IMMAGINE_PRONTA)
+
+
+class RenditionImmaginiTests(TestCase):
+	def jpeg(self, dimensioni):
+		buffer = BytesIO()
+		Image.new('RGB', dimensioni, (10, 120, 200)).save(buffer, format='JPEG')
+		buffer.seek(0)
+		return buffer
+
+	def test_jpeg_decodificato_alla_risoluzione_necessaria(self):
+		intermedia = decodifica_intermedia(self.jpeg((3200, 2400)))
+
+		# La rendition large (800x800) basta un quarto della risoluzione originale
+		self.assertEqual(intermedia.size, (800, 600))
+		self.assertEqual(intermedia.mode, 'RGB')
+
+	def test_tutte_le_rendition_da_una_decodifica(self):
+		rendition = genera_rendition(
+			self.jpeg((1600, 400)),
+			RENDITION_ARTICOLO + (Rendition('banner', (1200, 200), qualita=80, crop=True),)
+		)
+
+		dimensioni = {nome: Image.open(formati['jpg']).size for nome, formati in rendition.items()}
+		self.assertEqual(dimensioni, {
+			'large': (800, 200), 'medio': (400, 100), 'thumb': (300, 300), 'icona': (64, 64), 'banner': (1200, 200),
+		})
+
+	def test_formati_alternativi_per_ogni_rendition(self):
+		rendition = genera_rendition(self.jpeg((1000, 1000)), formati=('jpg', 'webp'))
+
+		for formati in rendition.values():
+			self.assertEqual(Image.open(formati['jpg']).format, 'JPEG')
+			self.assertEqual(Image.open(formati['webp']).format, 'WEBP')
+
+	def test_png_trasparente_su_sfondo_bianco(self):
+		buffer = BytesIO()
+		Image.new('RGBA', (500, 500), (0, 0, 0, 0)).save(buffer, format='PNG')
+		buffer.seek(0)
+
+		thumb = Image.open(genera_rendition(buffer)['thumb']['jpg'])
+
+		self.assertEqual(thumb.format, 'JPEG')
+		self.assertTrue(all(canale >= 250 for canale in thumb.getpixel((150, 150))))
+
+
+class ImportaImmaginiTests(TestCase):
+	def setUp(self):
+		media_root = tempfile.mkdtemp()
+		self.cartella = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+		self.addCleanup(shutil.rmtree, self.cartella, ignore_errors=True)
+		impostazioni = override_settings(MEDIA_ROOT=media_root, IMMAGINI_FORMATI_ALTERNATIVI=())
+		impostazioni.enable()
+		self.addCleanup(impostazioni.disable)
+
+		categoria = Categoria.objects.create(nome_categoria='Categoria Import')
+		unita_misura = UnitaMisura.objects.create(denominazione='PZ IMPORT')
+		self.primo = PezzoRicambio.objects.create(descrizione='Primo', categoria=categoria, unita_misura=unita_misura)
+		self.secondo = PezzoRicambio.objects.create(
+			descrizione='Secondo', categoria=categoria, unita_misura=unita_misura, codice_scm='07L0320061B',
+		)
+		self.primo.refresh_from_db()
+
+	def scrivi_foto(self, nome):
+		Image.new('RGB', (900, 900), (40, 90, 160)).save(os.path.join(self.cartella, nome))
+
+	def importa(self, *argomenti):
+		output = StringIO()
+		call_command('importa_immagini', self.cartella, '--processi', '1', *argomenti, stdout=output)
+		return output.getvalue()
+
+	def test_abbina_per_codice_e_condivide_le_foto_uguali(self):
+		self.scrivi_foto(f'{self.primo.codice_interno.lower()}.png')
+		self.scrivi_foto('07l0320061b.png')
+		self.scrivi_foto('sconosciuto.png')
+
+		output = self.importa()
+
+		self.assertIn('abbinati: 2, senza articolo: 1', output)
+		self.assertIn('foto da elaborare: 1', output)
+		self.primo.refresh_from_db()
+		self.secondo.refresh_from_db()
+		self.assertEqual(self.primo.stato_immagine, PezzoRicambio.IMMAGINE_PRONTA)
+		self.assertEqual(self.primo.immagine.name, self.secondo.immagine.name)
+		self.assertEqual(ImmagineCondivisa.objects.get().riferimenti, 2)
+
+	def test_riavvio_salta_le_foto_gia_importate(self):
+		self.scrivi_foto(f'{self.primo.codice_interno}.jpg')
+		self.importa()
+
+		output = self.importa()
+
+		self.assertIn('Articoli da aggiornare: 0, già a posto o con immagine: 1', output)
+		self.assertEqual(ImmagineCondivisa.objects.get().riferimenti, 1)
+
+	def test_dry_run_non_salva(self):
+		self.scrivi_foto(f'{self.primo.codice_interno}.jpg')
+
+		self.importa('--dry-run')
+
+		self.primo.refresh_from_db()
+		self.assertFalse(self.primo.immagine)
+		self.assertFalse(ImmagineCondivisa.objects.exists())
+
+
+class _MysqldumpFinto:
+	"""Processo mysqldump simulato: stdout in memoria, stderr scritto sul file passato a Popen"""
+
+	def __init__(self, dump, returncode=0, errore=b''):
+		self.dump = dump
+		self.returncode = returncode
+		self.errore = errore
+
+	def __call__(self, cmd, stdout=None, stderr=None, **kwargs):
+		stderr.write(self.errore)
+		self.stdout = BytesIO(self.dump)
+		return self
+
+	def wait(self):
+		return self.returncode
+
+	def kill(self):
+		pass
+
+
+class _StdinFinto(BytesIO):
+	def close(self):
+		self.ricevuto = self.getvalue()
+		super().close()
+
+
+class _MysqlFinto(_MysqldumpFinto):
+	"""Client mysql simulato: raccoglie quanto riceve sullo stdin"""
+
+	def __init__(self, returncode=0, errore=b''):
+		super().__init__(b'', returncode, errore)
+
+	def __call__(self, cmd, stdin=None, stderr=None, **kwargs):
+		stderr.write(self.errore)
+		self.stdin = _StdinFinto()
+		return self
+
+
+class _SnapshotFinto:
+	"""_RigheSnapshot simulato: nessuna connessione, righe fisse"""
+
+	righe = {'articoli': 50000}
+
+	def __init__(self, credenziali):
+		self.osservati = 0
+
+	def osserva(self, blocco):
+		self.osservati += 1
+
+	def conta(self):
+		return dict(self.righe)
+
+	def chiudi(self):
+		pass
+
+
+class _ClientMysqlFinti:
+	"""Un _MysqlFinto nuovo per ogni client avviato (restore parallelo)"""
+
+	def __init__(self):
+		self.processi = []
+
+	def __call__(self, cmd, **kwargs):
+		processo = _MysqlFinto()(cmd, **kwargs)
+		self.processi.append(processo)
+		return processo
+
+
+class BackupStreamingTests(TestCase):
+	def setUp(self):
+		self.cartella = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.cartella, ignore_errors=True)
+		Configurazione.set_value('backup_dir', self.cartella)
+		Configurazione.set_value('backup_livello_compressione', 1, tipo_dato='integer')
+		self.dump = b"-- MySQL dump\nINSERT INTO `articoli` VALUES (1,'Cuscinetto');\n" * 50000
+		snapshot = mock.patch('magazzino.backup_manager._RigheSnapshot', _SnapshotFinto)
+		snapshot.start()
+		self.addCleanup(snapshot.stop)
+
+	def test_dump_compresso_in_streaming_e_leggibile(self):
+		backup_mgr = BackupManager()
+		with mock.patch('magazzino.backup_manager.subprocess.Popen', _MysqldumpFinto(self.dump)):
+			successo, percorso, messaggio = backup_mgr.create_backup()
+
+		self.assertTrue(successo, messaggio)
+		self.assertTrue(percorso.name.endswith('.sql.gz'))
+		with gzip.open(percorso, 'rb') as file:
+			self.assertEqual(file.read(), self.dump)
+		self.assertEqual(backup_mgr.statistiche_backup['byte_dump'], len(self.dump))
+		self.assertEqual([backup['filename'] for backup in backup_mgr.list_backups()], [percorso.name])
+		# Nessun .sql non compresso né file parziale lasciato in cartella
+		self.assertCountEqual(os.listdir(self.cartella), [percorso.name, 'catalogo.json'])
+
+	def test_catalogo_registra_il_backup_senza_scandire_la_cartella(self):
+		backup_mgr = BackupManager()
+		with mock.patch('magazzino.backup_manager.subprocess.Popen', _MysqldumpFinto(self.dump)):
+			successo, percorso, messaggio = backup_mgr.create_backup()
+		self.assertTrue(successo, messaggio)
+
+		backup = backup_mgr.list_backups()[0]
+		with open(percorso, 'rb') as file:
+			self.assertEqual(backup['sha256'], hashlib.sha256(file.read()).hexdigest())
+		self.assertIsNotNone(backup['durata_secondi'])
+
+		# Un file copiato a mano compare solo ricostruendo il catalogo
+		with open(os.path.join(self.cartella, 'backup_GMR_20250101_120000.sql.gz'), 'wb') as file:
+			file.write(gzip.compress(b'SELECT 1;'))
+		self.assertEqual(len(backup_mgr.list_backups()), 1)
+		backup_mgr.catalogo.ricostruisci()
+		backups = backup_mgr.list_backups()
+		self.assertEqual([b['filename'] for b in backups], [percorso.name, 'backup_GMR_20250101_120000.sql.gz'])
+		# L'hash calcolato alla creazione sopravvive alla ricostruzione
+		self.assertEqual(backups[0]['sha256'], backup['sha256'])
+
+		self.assertTrue(backup_mgr.delete_backup(percorso.name)[0])
+		self.assertEqual([b['filename'] for b in backup_mgr.list_backups()], ['backup_GMR_20250101_120000.sql.gz'])
+
+	def test_verifica_rileva_backup_troncato_o_modificato(self):
+		backup_mgr = BackupManager()
+		dump = self.dump + b"-- Dump completed on 2026-01-01 12:00:00\n"
+		with mock.patch('magazzino.backup_manager.subprocess.Popen', _MysqldumpFinto(dump)):
+			_, percorso, _ = backup_mgr.create_backup()
+
+		successo, messaggio, risultato = backup_mgr.verifica_backup(percorso.name)
+		self.assertTrue(successo, messaggio)
+		self.assertEqual(risultato['integrita'][0]['byte_sql'], len(dump))
+		self.assertTrue(backup_mgr.list_backups()[0]['verifica']['esito'])
+
+		# Un byte cambiato: hash diverso da quello registrato e CRC gzip errato
+		with open(percorso, 'r+b') as file:
+			file.seek(os.path.getsize(percorso) // 2)
+			byte = file.read(1)
+			file.seek(-1, os.SEEK_CUR)
+			file.write(bytes([byte[0] ^ 0xFF]))
+		successo, messaggio, _ = backup_mgr.verifica_backup(percorso.name)
+		self.assertFalse(successo)
+		self.assertIn('SHA-256', messaggio)
+		self.assertFalse(backup_mgr.list_backups()[0]['verifica']['esito'])
+
+		# Dump interrotto ma compresso correttamente: manca la riga finale di mysqldump
+		with open(percorso, 'wb') as file:
+			file.write(gzip.compress(self.dump))
+		backup_mgr.catalogo.aggiorna(percorso.name, sha256=None)
+		successo, messaggio, _ = backup_mgr.verifica_backup(percorso.name)
+		self.assertFalse(successo)
+		self.assertIn('troncato', messaggio)
+
+	def test_test_restore_confronta_le_righe_contate_alla_creazione(self):
+		backup_mgr = BackupManager()
+		dump = self.dump + b"-- Dump completed on 2026-01-01 12:00:00\n"
+		with mock.patch('magazzino.backup_manager.subprocess.Popen', _MysqldumpFinto(dump)):
+			_, percorso, _ = backup_mgr.create_backup()
+		self.assertEqual(backup_mgr.list_backups()[0]['righe'], {'articoli': 50000})
+
+		# Dump fermo prima della fine: il ripristino ha meno righe del database al momento del backup
+		restore = {'secondi': 1.0, 'byte_sql': len(dump), 'errori': [], 'tempi': {}, 'righe': {'articoli': 49000}}
+		with mock.patch.object(BackupManager, '_test_restore', return_value=restore):
+			successo, messaggio, risultato = backup_mgr.verifica_backup(percorso.name, test_restore=True)
+			self.assertFalse(successo)
+			self.assertIn('49000 righe ripristinate, 50000 al momento del backup', messaggio)
+			self.assertEqual(risultato['restore']['tabelle']['articoli']['righe_attese'], 50000)
+
+			# Senza righe registrate il test-restore non fa da riferimento a se stesso
+			backup_mgr.catalogo.aggiorna(percorso.name, righe=None)
+			successo, messaggio, _ = backup_mgr.verifica_backup(percorso.name, test_restore=True)
+			self.assertTrue(successo, messaggio)
+			self.assertIn('nessun confronto', messaggio)
+			self.assertIsNone(backup_mgr.list_backups()[0]['righe'])
+
+	def test_tempi_per_tabella_dai_commenti_di_mysqldump(self):
+		tempi = {}
+		osservatore = _TempiTabelle(tempi)
+		dump = (
+			b"-- Table structure for table `articoli`\n" + b"INSERT INTO `articoli` VALUES (1);\n" * 10
+			+ b"-- Table structure for table `giacenze`\n" + b"INSERT INTO `giacenze` VALUES (1);\n"
+		)
+		# Blocchi piccoli: il secondo marcatore è spezzato tra due blocchi
+		for inizio in range(0, len(dump), 50):
+			osservatore.osserva(dump[inizio:inizio + 50])
+		osservatore.termina()
+
+		self.assertEqual(set(tempi), {'articoli', 'giacenze'})
+		self.assertEqual(sum(tempo['byte_sql'] for tempo in tempi.values()), len(dump))
+		# Attribuzione approssimata al blocco
+		inizio_giacenze = dump.index(b"-- Table structure for table `giacenze`")
+		self.assertAlmostEqual(tempi['giacenze']['byte_sql'], len(dump) - inizio_giacenze, delta=50)
+
+	def test_dump_fallito_non_lascia_file(self):
+		backup_mgr = BackupManager()
+		processo = _MysqldumpFinto(self.dump[:1000], returncode=2, errore=b'Access denied')
+		with mock.patch('magazzino.backup_manager.subprocess.Popen', processo):
+			successo, percorso, messaggio = backup_mgr.create_backup()
+
+		self.assertFalse(successo)
+		self.assertIn('Access denied', messaggio)
+		self.assertEqual(os.listdir(self.cartella), [])
+
+	def test_restore_decomprime_in_streaming_nello_stdin_di_mysql(self):
+		backup_mgr = BackupManager()
+		with mock.patch('magazzino.backup_manager.subprocess.Popen', _MysqldumpFinto(self.dump)):
+			_, percorso, _ = backup_mgr.create_backup()
+		avanzamento = []
+
+		mysql = _MysqlFinto()
+		with mock.patch('magazzino.backup_manager.subprocess.Popen', mysql):
+			successo, messaggio = backup_mgr.restore_backup(
+				percorso.name, progresso=lambda letti, totali: avanzamento.append((letti, totali))
+			)
+
+		self.assertTrue(successo, messaggio)
+		self.assertEqual(mysql.stdin.ricevuto, self.dump)
+		self.assertEqual(avanzamento[-1], (percorso.stat().st_size, percorso.stat().st_size))
+		self.assertCountEqual(os.listdir(self.cartella), [percorso.name, 'catalogo.json'])
+
+	def _crea_archivio(self, nome_archivio, manifest, contenuti):
+		percorso = os.path.join(self.cartella, nome_archivio)
+		with tarfile.open(percorso, 'w') as archivio:
+			for nome, dati in [('manifest.json', json.dumps(manifest).encode())] + [
+				(nome, gzip.compress(dati)) for nome, dati in contenuti.items()
+			]:
+				membro = tarfile.TarInfo(nome)
+				membro.size = len(dati)
+				archivio.addfile(membro, BytesIO(dati))
+		return percorso
+
+	def _crea_catena(self):
+		"""Backup completo con due incrementali: ogni archivio ha una tabella e gli oggetti"""
+		nomi = [
+			'backup_GMR_20260101_020000.tar',
+			'backup_GMR_20260101_090000_inc.tar',
+			'backup_GMR_20260101_100000_inc.tar',
+		]
+		for indice, nome in enumerate(nomi):
+			manifest = {
+				'formato': 'parallelo',
+				'versione': 2,
+				'tipo': 'incrementale' if indice else 'completo',
+				'tabelle': [{'nome': 'articoli', 'file': 'tabelle/articoli.sql.gz', 'righe': 1, 'eliminate': 0, 'byte_compressi': 10}],
+				'oggetti': 'oggetti.sql.gz',
+			}
+			if indice:
+				manifest['precedente'] = nomi[indice - 1]
+				manifest['base'] = nomi[0]
+			self._crea_archivio(nome, manifest, {
+				'tabelle/articoli.sql.gz': f"-- {nome}\n".encode(),
+				'oggetti.sql.gz': b"SET NAMES utf8mb4;\n",
+			})
+		return nomi
+
+	def test_restore_incrementale_ripristina_la_catena_in_ordine(self):
+		nomi = self._crea_catena()
+		backup_mgr = BackupManager()
+		self.assertEqual(backup_mgr.list_backups()[0]['formato'], 'incrementale')
+		self.assertEqual(backup_mgr.catena_backup(nomi[2]), nomi)
+
+		client = _ClientMysqlFinti()
+		with mock.patch('magazzino.backup_manager.subprocess.Popen', client):
+			successo, messaggio = backup_mgr.restore_backup(nomi[2], processi=1)
+
+		self.assertTrue(successo, messaggio)
+		tabelle = [processo.stdin.ricevuto for processo in client.processi if processo.stdin.ricevuto.startswith(b'--')]
+		self.assertEqual(tabelle, [f"-- {nome}\n".encode() for nome in nomi])
+
+	def test_backup_necessario_a_un_incrementale_non_eliminabile(self):
+		nomi = self._crea_catena()
+		backup_mgr = BackupManager()
+
+		successo, _ = backup_mgr.delete_backup(nomi[1])
+		self.assertFalse(successo)
+		self.assertTrue(os.path.exists(os.path.join(self.cartella, nomi[1])))
+
+		# Eliminando dall'ultimo anello la catena si accorcia
+		self.assertTrue(backup_mgr.delete_backup(nomi[2])[0])
+		self.assertTrue(backup_mgr.delete_backup(nomi[1])[0])
+		self.assertTrue(backup_mgr.delete_backup(nomi[0])[0])
+
+	def test_restore_parallelo_carica_tabelle_e_poi_oggetti(self):
+		contenuti = {
+			'tabelle/articoli.sql.gz': b"INSERT INTO `articoli` VALUES (1);\n" * 1000,
+			'tabelle/giacenze.sql.gz': b"INSERT INTO `giacenze` VALUES (1,5);\n",
+			'oggetti.sql.gz': b"SET NAMES utf8mb4;\n",
+		}
+		manifest = {
+			'formato': 'parallelo',
+			'versione': 1,
+			'tabelle': [
+				{'nome': nome.split('/')[1].split('.')[0], 'file': nome, 'righe': 1, 'byte_compressi': len(gzip.compress(dati))}
+				for nome, dati in contenuti.items() if nome.startswith('tabelle/')
+			],
+			'oggetti': 'oggetti.sql.gz',
+		}
+		percorso = self._crea_archivio('backup_GMR_20260101_120000.tar', manifest, contenuti)
+
+		backup_mgr = BackupManager()
+		self.assertEqual(backup_mgr.list_backups()[0]['formato'], 'parallelo')
+		client = _ClientMysqlFinti()
+		with mock.patch('magazzino.backup_manager.subprocess.Popen', client):
+			successo, messaggio = backup_mgr.restore_backup(os.path.basename(percorso), processi=2)
+
+		self.assertTrue(successo, messaggio)
+		ricevuti = [processo.stdin.ricevuto for processo in client.processi]
+		self.assertCountEqual(ricevuti[:2], [contenuti['tabelle/articoli.sql.gz'], contenuti['tabelle/giacenze.sql.gz']])
+		self.assertEqual(ricevuti[2], contenuti['oggetti.sql.gz'])
+
+
+class BackupPianificatiTests(TestCase):
+	def _backup(self, nome, quando, formato='parallelo', precedente=None):
+		return {'filename': nome, 'timestamp': datetime.fromisoformat(quando), 'formato': formato, 'precedente': precedente}
+
+	def test_conservazione_gfs_con_catena_degli_incrementali(self):
+		backups = [
+			self._backup('A', '2026-03-10 14:00'),
+			self._backup('B', '2026-03-10 13:00', 'incrementale', precedente='C'),
+			self._backup('C', '2026-03-10 12:00'),
+			self._backup('D', '2026-03-09 02:00'),
+			self._backup('E', '2026-03-08 02:00'),
+			self._backup('F', '2026-03-07 02:00'),
+			self._backup('G', '2026-02-15 02:00'),
+			self._backup('H', '2026-02-10 02:00'),
+		]
+		motivi = classifica_backup(backups, {'orario': 2, 'giornaliero': 3, 'settimanale': 0, 'mensile': 2})
+
+		self.assertEqual(motivi['A'], ['orario', 'giornaliero', 'mensile', 'ultimo'])
+		self.assertEqual(motivi['B'], ['orario'])
+		# C non è il più recente di nessun periodo ma B si basa su di lui
+		self.assertEqual(motivi['C'], ['catena'])
+		self.assertEqual(motivi['D'], ['giornaliero'])
+		self.assertEqual(motivi['G'], ['mensile'])
+		self.assertEqual([nome for nome, livelli in motivi.items() if not livelli], ['F', 'H'])
+
+	def test_backup_dovuto_dagli_orari_e_dal_catalogo(self):
+		orari = leggi_orari('13:30; 2:00')
+		self.assertEqual([orario.strftime('%H:%M') for orario in orari], ['02:00', '13:30'])
+		with self.assertRaises(ValueError):
+			leggi_orari('25:00')
+
+		ieri = [self._backup('backup_1', '2026-03-09 13:30:04')]
+		oggi = [self._backup('backup_2', '2026-03-10 02:00:03')] + ieri
+		self.assertEqual(backup_dovuto(ieri, orari, 0, datetime(2026, 3, 10, 1, 0)), None)
+		# Orario perso a PC spento: recuperato al primo controllo, una volta sola
+		self.assertEqual(backup_dovuto(ieri, orari, 0, datetime(2026, 3, 10, 9, 0)), BACKUP_COMPLETO)
+		self.assertEqual(backup_dovuto(oggi, orari, 0, datetime(2026, 3, 10, 9, 0)), None)
+		self.assertEqual(backup_dovuto(oggi, orari, 60, datetime(2026, 3, 10, 2, 30)), None)
+		self.assertEqual(backup_dovuto(oggi, orari, 60, datetime(2026, 3, 10, 3, 5)), BACKUP_INCREMENTALE)
+		self.assertEqual(backup_dovuto([], [], 0, datetime(2026, 3, 10, 3, 0)), None)
+
+
+class LavoriBackupTests(TestCase):
+	def setUp(self):
+		self.cartella = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.cartella, ignore_errors=True)
+		Configurazione.set_value('backup_dir', self.cartella)
+		self.utente = User.objects.create_user(username='admin_backup', password='PasswordSicura123!')
+		self.utente.profilo.ruolo = RuoloUtente.ADMIN
+		self.utente.profilo.save()
+		avvia = mock.patch('magazzino.lavori_backup.avvia_worker')
+		avvia.start()
+		self.addCleanup(avvia.stop)
+
+	def test_richieste_contemporanee_non_avviano_due_backup(self):
+		self.client.force_login(self.utente)
+		self.client.post(reverse('magazzino:backup_create'))
+		self.client.post(reverse('magazzino:backup_create'))
+
+		lavoro = LavoroBackup.objects.get()
+		self.assertEqual((lavoro.tipo, lavoro.stato, lavoro.utente), (LavoroBackup.BACKUP, LavoroBackup.IN_CODA, 'admin_backup'))
+		self.assertFalse(accoda_lavoro(LavoroBackup.RESTORE, 'backup_GMR_20260101_120000.sql.gz')[1])
+
+		stato = self.client.get(reverse('magazzino:backup_stato')).json()['lavoro']
+		self.assertEqual((stato['id'], stato['attivo']), (lavoro.pk, True))
+
+	def test_lavoro_registra_avanzamento_ed_esito(self):
+		dump = b"".join(
+			f"-- Table structure for table `{tabella}`\nINSERT INTO `{tabella}` VALUES (1);\n".encode() * 2000
+			for tabella in ('articoli', 'giacenze')
+		) + b"-- Dump completed\n"
+		lavoro, _ = accoda_lavoro(LavoroBackup.BACKUP, utente='admin_backup')
+		self.assertEqual(prenota_lavoro().pk, lavoro.pk)
+		self.assertIsNone(prenota_lavoro())
+
+		with mock.patch('magazzino.backup_manager.subprocess.Popen', _MysqldumpFinto(dump)):
+			self.assertTrue(esegui_lavoro(lavoro))
+
+		lavoro.refresh_from_db()
+		self.assertEqual(lavoro.stato, LavoroBackup.COMPLETATO)
+		self.assertIsNone(lavoro.attivo)
+		self.assertCountEqual(os.listdir(self.cartella), [lavoro.filename, 'catalogo.json'])
+		self.assertEqual(lavoro.tabelle_completate, 2)
+		self.assertEqual(lavoro.byte_elaborati, os.path.getsize(os.path.join(self.cartella, lavoro.filename)))
+		# Concluso il lavoro se ne può avviare un altro
+		self.assertTrue(accoda_lavoro(LavoroBackup.BACKUP)[1])
+
+	def test_lavoro_di_un_processo_terminato_viene_chiuso(self):
+		lavoro, _ = accoda_lavoro(LavoroBackup.RESTORE, 'backup_GMR_20260101_120000.sql.gz')
+		LavoroBackup.objects.filter(pk=lavoro.pk).update(
+			stato=LavoroBackup.IN_CORSO, modificato_il=timezone.now() - timedelta(minutes=5)
+		)
+
+		self.assertEqual(chiudi_interrotti(), 1)
+		lavoro.refresh_from_db()
+		self.assertEqual((lavoro.stato, lavoro.attivo), (LavoroBackup.ERRORE, None))
+		self.assertTrue(accoda_lavoro(LavoroBackup.BACKUP)[1])
+
+
+class BackupDownloadTests(TestCase):
+	def setUp(self):
+		self.cartella = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.cartella, ignore_errors=True)
+		Configurazione.set_value('backup_dir', self.cartella)
+		self.contenuto = os.urandom(100000)
+		with open(os.path.join(self.cartella, 'backup_GMR_20260101_120000.sql.gz'), 'wb') as file:
+			file.write(self.contenuto)
+		self.url = reverse('magazzino:backup_download', args=['backup_GMR_20260101_120000.sql.gz'])
+		utente = User.objects.create_user(username='admin_download', password='PasswordSicura123!')
+		utente.profilo.ruolo = RuoloUtente.ADMIN
+		utente.profilo.save()
+		self.client.force_login(utente)
+
+	def test_download_riprende_da_una_porzione(self):
+		response = self.client.get(self.url)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response['Accept-Ranges'], 'bytes')
+		self.assertEqual(b''.join(response.streaming_content), self.contenuto)
+		etag = response['ETag']
+
+		response = self.client.get(self.url, HTTP_RANGE='bytes=60000-', HTTP_IF_RANGE=etag)
+		self.assertEqual(response.status_code, 206)
+		self.assertEqual(response['Content-Range'], 'bytes 60000-99999/100000')
+		self.assertEqual(b''.join(response.streaming_content), self.contenuto[60000:])
+
+		response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+		self.assertEqual((response.status_code, response['Content-Length']), (206, '10'))
+		self.assertEqual(b''.join(response.streaming_content), self.contenuto[10:20])
+
+		# File cambiato dopo l'inizio del download: si riparte da zero
+		response = self.client.get(self.url, HTTP_RANGE='bytes=60000-', HTTP_IF_RANGE='"altro"')
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(b''.join(response.streaming_content), self.contenuto)
+
+		self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=100000-').status_code, 416)
+		self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+	@override_settings(BACKUP_DOWNLOAD_PROXY='x-accel')
+	def test_download_delegato_al_proxy(self):
+		response = self.client.get(self.url)
+		self.assertEqual(response['X-Accel-Redirect'], '/backup-interni/backup_GMR_20260101_120000.sql.gz')
+		self.assertEqual(response.content, b'')
+
+
+class RegistroConfigurazioniTests(TestCase):
+	def setUp(self):
+		Configurazione.set_value('backup_retention_days', 30, tipo_dato='integer')
+		Configurazione.set_value('backup_parallelo', True, tipo_dato='boolean')
+		Configurazione.set_value('tabelle', ['a', 'b'], tipo_dato='json')
+
+	def test_letture_senza_query(self):
+		registro_configurazioni.invalida()
+		with self.assertNumQueries(1):
+			self.assertEqual(Configurazione.get_value('backup_retention_days'), 30)
+			self.assertIs(Configurazione.get_value('backup_parallelo'), True)
+			self.assertEqual(Configurazione.get_value('assente', 'default'), 'default')
+			Configurazione.get_value('tabelle').append('c')
+			self.assertEqual(Configurazione.get_value('tabelle'), ['a', 'b'])
+
+		# Nuova richiesta: solo il controllo del timbro
+		registro_configurazioni.da_verificare()
+		with self.assertNumQueries(1):
+			self.assertEqual(Configurazione.get_value('backup_retention_days'), 30)
+
+	def test_modifiche_invalidano_il_registro(self):
+		self.assertEqual(Configurazione.get_value('backup_retention_days'), 30)
+		Configurazione.set_value('backup_retention_days', 7, tipo_dato='integer')
+		self.assertEqual(Configurazione.get_value('backup_retention_days'), 7)
+
+		Configurazione.objects.filter(chiave='backup_parallelo').delete()
+		self.assertIsNone(Configurazione.get_value('backup_parallelo'))
+
+		# Modifica di un altro processo: cambia il timbro, non passa dai signals
+		Configurazione.objects.filter(chiave='backup_retention_days').update(valore='14', modificato_il=timezone.now())
+		self.assertEqual(Configurazione.get_value('backup_retention_days'), 7)
+		registro_configurazioni.da_verificare()
+		self.assertEqual(Configurazione.get_value('backup_retention_days'), 14)
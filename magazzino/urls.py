@@ -25,6 +25,7 @@ urlpatterns = [
     # API AJAX - Dati in tempo reale
     path('api/articolo/<int:articolo_id>/giacenza/', views.get_articolo_giacenza, name='api_articolo_giacenza'),
     path('api/articolo/<int:articolo_id>/fornitore/', views.get_articolo_fornitore, name='api_articolo_fornitore'),
+    path('api/articoli/autocomplete/', views.articolo_autocomplete, name='api_articolo_autocomplete'),
     
     # ARTICOLI / PEZZI DI RICAMBIO
     path('articoli/', views.PezzoRicambioListView.as_view(), name='articolo_list'),
@@ -55,6 +56,7 @@ urlpatterns = [
     # MOVIMENTI DI MAGAZZINO
     path('movimenti/', views.MovimentoListView.as_view(), name='movimento_list'),
     path('movimenti/create/', views.MovimentoCreateView.as_view(), name='movimento_create'),
+    path('movimenti/batch/', views.MovimentoBatchView.as_view(), name='movimento_batch'),
     path('movimenti/<int:pk>/', views.MovimentoDetailView.as_view(), name='movimento_detail'),
     
     # GIACENZE
@@ -76,6 +78,7 @@ urlpatterns = [
     # GESTIONE BACKUP
     path('backup/', views.BackupListView.as_view(), name='backup_list'),
     path('backup/create/', views.BackupCreateView.as_view(), name='backup_create'),
+    path('backup/stato/', views.BackupStatoView.as_view(), name='backup_stato'),
     path('backup/download/<str:filename>/', views.BackupDownloadView.as_view(), name='backup_download'),
     path('backup/delete/<str:filename>/', views.BackupDeleteView.as_view(), name='backup_delete'),
     path('backup/cleanup/', views.BackupCleanupView.as_view(), name='backup_cleanup'),
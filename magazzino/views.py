@@ -6,7 +6,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django import forms as django_forms
 from django.views.generic import (
     TemplateView, ListView, DetailView, CreateView, 
-    UpdateView, DeleteView, FormView
+    UpdateView, DeleteView, FormView, View
 )
 from django.forms import modelform_factory
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
@@ -14,13 +14,14 @@ from django.contrib.auth.models import User
 from django.contrib import messages
 from django.urls import reverse_lazy, reverse
 from django.db.models import Q, F, Sum, Count
-from django.db.models.functions import Trim
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
-from django.http import JsonResponse, FileResponse, HttpResponse, Http404
+from django.http import JsonResponse, HttpResponse, Http404
 from django.conf import settings
-from django.core.exceptions import FieldDoesNotExist
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
 from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 import logging
 import secrets
@@ -37,13 +38,28 @@ from .models import (
     ModelloMacchinaSCM, MatricolaMacchinaSCM,
     TbAppellativo, TbTipoPagamento, TbCategoriaIVA, TbCategorieTariffe, TbContatti, TbPrestazioni, TbModalitaPagamento
 )
+from .albero_categorie import costruisci_albero_categorie
+from .kpi import get_kpi_snapshot, statistiche_cache_kpi
+from .movimenti import registra_movimenti_batch, registra_movimento
+from .ricerca import cerca_articoli, scomponi_parole
 from accounts.models import RuoloUtente
 
 logger = logging.getLogger(__name__)
 
+# Query del GET di creazione articolo (usato anche dai test): sessione, utente e profilo,
+# poi le scelte del form (modelli, matricole, fornitori, unità di misura, tre livelli di
+# categoria), indipendenti dal numero di matricole
+ARTICOLO_FORM_QUERY_BUDGET = 10
+# La modifica legge anche l'articolo e la sua categoria
+ARTICOLO_MODIFICA_QUERY_BUDGET = ARTICOLO_FORM_QUERY_BUDGET + 2
 
+
+@lru_cache(maxsize=None)
 def _get_tabelle_permesse_config():
-    """Configurazione centralizzata delle tabelle gestibili via interfaccia."""
+    """
+    Configurazione centralizzata delle tabelle gestibili via interfaccia.
+    Costruita una volta per processo: i chiamanti la leggono soltanto.
+    """
     return {
         'tbappellativo': {
             'modello': TbAppellativo,
@@ -188,106 +204,58 @@ class DashboardView(CanViewMixin, TemplateView):
         context['usa_layout_riorganizzato'] = layout_corrente == 'riorganizzata'
         context['dashboard_layout_corrente'] = layout_corrente
 
-        articoli_attivi = PezzoRicambio.objects.filter(stato_attivo=True)
+        # KPI articoli e giacenze (da cache, invalidata dai signals)
+        kpi = get_kpi_snapshot()
+        context['kpi'] = kpi
         
         # Statistiche generali
-        context['total_articoli'] = articoli_attivi.count()
+        context['total_articoli'] = kpi.articoli_attivi
         context['total_fornitori'] = Fornitore.objects.filter(stato_attivo=True).count()
         context['total_categorie'] = Categoria.objects.filter(stato_attivo=True).count()
 
         # Statistiche articoli richieste in dashboard
-        context['articoli_con_foto'] = articoli_attivi.filter(
-            immagine__isnull=False
-        ).exclude(
-            immagine=''
-        ).count()
-        context['articoli_con_codice_scm'] = articoli_attivi.filter(
-            codice_scm__isnull=False
-        ).annotate(
-            codice_scm_pulito=Trim('codice_scm')
-        ).exclude(
-            codice_scm_pulito=''
-        ).count()
-        context['articoli_con_codice_fornitore'] = articoli_attivi.filter(
-            codice_fornitore__isnull=False
-        ).annotate(
-            codice_fornitore_pulito=Trim('codice_fornitore')
-        ).exclude(
-            codice_fornitore_pulito=''
-        ).count()
-        context['articoli_non_attivi'] = PezzoRicambio.objects.filter(stato_attivo=False).count()
-
-        totale_articoli = context['total_articoli']
-
-        def calcola_percentuale(parziale, totale):
-            if totale <= 0:
-                return 0
-            return round((parziale / totale) * 100, 1)
-
-        context['copertura_foto_pct'] = calcola_percentuale(context['articoli_con_foto'], totale_articoli)
-        context['copertura_codice_scm_pct'] = calcola_percentuale(context['articoli_con_codice_scm'], totale_articoli)
-        context['copertura_codice_fornitore_pct'] = calcola_percentuale(context['articoli_con_codice_fornitore'], totale_articoli)
-        context['indice_completezza_articoli_pct'] = round(
-            (
-                context['copertura_foto_pct']
-                + context['copertura_codice_scm_pct']
-                + context['copertura_codice_fornitore_pct']
-            ) / 3,
-            1
-        )
+        context['articoli_con_foto'] = kpi.articoli_con_foto
+        context['articoli_con_codice_scm'] = kpi.articoli_con_codice_scm
+        context['articoli_con_codice_fornitore'] = kpi.articoli_con_codice_fornitore
+        context['articoli_non_attivi'] = kpi.articoli_non_attivi
+
+        context['copertura_foto_pct'] = kpi.copertura_foto_pct
+        context['copertura_codice_scm_pct'] = kpi.copertura_codice_scm_pct
+        context['copertura_codice_fornitore_pct'] = kpi.copertura_codice_fornitore_pct
+        context['indice_completezza_articoli_pct'] = kpi.indice_completezza_pct
         
         # Giacenze
-        giacenze_total = Giacenza.objects.aggregate(
-            total_disponibile=Sum('quantita_disponibile'),
-            total_impegnata=Sum('quantita_impegnata')
-        )
-        context['giacenze'] = giacenze_total
+        context['giacenze'] = kpi.giacenze
         
         # Articoli sotto soglia
-        articoli_sotto_soglia = articoli_attivi.filter(
-            giacenza__quantita_disponibile__lt=F('giacenza_minima')
-        ).count()
-        context['articoli_sotto_soglia'] = articoli_sotto_soglia
+        context['articoli_sotto_soglia'] = kpi.articoli_sotto_soglia
         
         # Ultimi movimenti
         context['ultimi_movimenti'] = MovimentoMagazzino.objects.select_related(
             'articolo', 'fornitore'
         ).order_by('-data_movimento')[:10]
         
-        # Top 5 utenti per numero di azioni (carichi + fornitori creati)
-        from django.contrib.auth.models import User
-        from .models import AzioneUtente
-        
-        # Conta le azioni per ogni utente
-        utenti_con_azioni = []
-        for user in User.objects.all():
-            # Conta azioni registrate con pesi diversi
-            azioni = AzioneUtente.objects.filter(username=user.username)
-            punti_azioni = 0
-            for azione in azioni:
-                if azione.tipo_azione == 'IMMAGINE':
-                    punti_azioni += 2  # +2 punti per immagini
-                else:
-                    punti_azioni += 1  # +1 punto per altre azioni
-            
-            # Conta anche i movimenti IN (per retrocompatibilità con dati esistenti)
-            count_carichi = MovimentoMagazzino.objects.filter(
-                operatore=user.username,
-                tipo_movimento='IN'
-            ).count()
-            
-            total = punti_azioni + count_carichi
-            
-            if total > 0:
-                nome_completo = f"{user.first_name} {user.last_name}".strip() or user.username
-                utenti_con_azioni.append({
-                    'username': user.username,
-                    'operatore': nome_completo,
-                    'totale_articoli': total
-                })
-        
-        # Ordina per numero totale e prendi i top 5
-        top_operatori = sorted(utenti_con_azioni, key=lambda x: x['totale_articoli'], reverse=True)[:5]
+        # Top 5 operatori dalla classifica materializzata (una sola query sull'indice punti)
+        from django.db.models import Exists, OuterRef, Subquery
+        from .models import ClassificaOperatore
+
+        utenti = User.objects.filter(username=OuterRef('username'))
+        classifica = ClassificaOperatore.objects.annotate(
+            first_name=Subquery(utenti.values('first_name')[:1]),
+            last_name=Subquery(utenti.values('last_name')[:1]),
+        ).filter(
+            Exists(utenti),
+            punti__gt=0
+        ).order_by('-punti', 'username')[:5]
+
+        top_operatori = []
+        for riga in classifica:
+            nome_completo = f"{riga.first_name or ''} {riga.last_name or ''}".strip() or riga.username
+            top_operatori.append({
+                'username': riga.username,
+                'operatore': nome_completo,
+                'totale_articoli': riga.punti
+            })
         context['top_operatori'] = top_operatori
         
         # Convertire a JSON per il template
@@ -298,6 +266,8 @@ class DashboardView(CanViewMixin, TemplateView):
         try:
             profilo = self.request.user.profilo
             context['ruolo_utente'] = profilo.get_ruolo_display()
+            if profilo.è_admin():
+                context['kpi_cache_stats'] = statistiche_cache_kpi()
         except:
             context['ruolo_utente'] = 'Sconosciuto'
         
@@ -319,10 +289,15 @@ class ResetClassificaView(CanEditMixin, TemplateView):
     
     def post(self, request, *args, **kwargs):
         try:
-            # Elimina tutte le azioni registrate per azzerare la classifica
-            from .models import AzioneUtente
-            count = AzioneUtente.objects.all().count()
-            AzioneUtente.objects.all().delete()
+            # Elimina tutte le azioni registrate e i punteggi materializzati
+            # nella stessa transazione, così la classifica non resta mai a metà
+            from django.db import transaction
+            from .models import AzioneUtente, ClassificaOperatore
+            with transaction.atomic():
+                count = AzioneUtente.objects.all().count()
+                # Prima i punteggi: il post_delete di ogni azione non trova più righe da aggiornare
+                ClassificaOperatore.objects.all().delete()
+                AzioneUtente.objects.all().delete()
             
             messages.success(
                 request,
@@ -351,10 +326,8 @@ class CategoriaListView(CanViewMixin, ListView):
     
     def get_queryset(self):
         # Restituisci solo le macrocategorie (livello 0)
-        # Le sottocategorie saranno accedute tramite relazione 'sottocategorie'
-        queryset = Categoria.objects.filter(categoria_padre__isnull=True).prefetch_related(
-            'sottocategorie__sottocategorie'  # Prefetch fino a 3 livelli
-        ).order_by('ordine', 'nome_categoria')
+        # In vista ad albero il template usa l'albero di costruisci_albero_categorie()
+        queryset = Categoria.objects.filter(categoria_padre__isnull=True).order_by('ordine', 'nome_categoria')
         
         # Filtro per ricerca (cerca in tutti i livelli)
         search = self.request.GET.get('search')
@@ -380,6 +353,9 @@ class CategoriaListView(CanViewMixin, ListView):
         context['stato'] = self.request.GET.get('stato', '')
         # Flag per sapere se siamo in modalità ricerca o tree view
         context['is_search'] = bool(self.request.GET.get('search'))
+        if not context['is_search']:
+            # Albero completo con conteggi articoli in due query, senza ricorsione nel template
+            context['categorie'] = costruisci_albero_categorie(context['stato'])
         return context
 
 
@@ -488,7 +464,7 @@ class CategoriaDeleteView(CanEditMixin, DeleteView):
         articoli_da_riassegnare = PezzoRicambio.objects.filter(categoria=categoria)
         if articoli_da_riassegnare.exists():
             num_articoli = articoli_da_riassegnare.count()
-            articoli_da_riassegnare.update(categoria=categoria_fallback)
+            articoli_da_riassegnare.update(categoria=categoria_fallback, modificato_il=timezone.now())
             messages.warning(
                 request,
                 f"⚠️ {num_articoli} articolo/i della categoria '{categoria.nome_categoria}' "
@@ -554,22 +530,8 @@ def categoria_move(request):
                 }, status=400)
             
             # Controllo 2: Verifica che nuovo_padre non sia un discendente di categoria
-            # (usa un controllo iterativo sicuro invece di ricorsivo)
-            current = nuovo_padre
-            visited = set()
-            is_descendant = False
-            max_iterations = 10
-            iterations = 0
-            
-            while current and iterations < max_iterations:
-                if current.pk == categoria.pk:
-                    is_descendant = True
-                    break
-                if current.pk in visited:
-                    break  # Loop rilevato
-                visited.add(current.pk)
-                current = current.categoria_padre
-                iterations += 1
+            # (il percorso materializzato del padre contiene tutti i suoi antenati)
+            is_descendant = f"/{categoria.pk}/" in nuovo_padre.percorso
             
             if is_descendant:
                 return JsonResponse({
@@ -589,7 +551,7 @@ def categoria_move(request):
             categoria.categoria_padre = None
         
         categoria.ordine = nuovo_ordine
-        categoria.save()  # Il livello si aggiorna automaticamente nel save()
+        categoria.save()  # Livello e percorso (anche dei discendenti) si aggiornano nel save()
         
         messages.success(request, f'✅ Categoria "{categoria.nome_categoria}" spostata con successo!')
         logger.info(f"📦 Categoria spostata: {categoria.nome_categoria} -> {categoria.get_breadcrumb()}")
@@ -602,6 +564,8 @@ def categoria_move(request):
         
     except Categoria.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Categoria non trovata'}, status=404)
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'error': ' '.join(e.messages)}, status=400)
     except Exception as e:
         logger.error(f"❌ Errore spostamento categoria: {str(e)}")
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
@@ -642,23 +606,21 @@ class PezzoRicambioListView(SortableListMixin, CanViewMixin, ListView):
             'categoria', 'unita_misura', 'giacenza'
         ).order_by(self.get_ordering())
         
-        # Filtro per ricerca
+        # Filtro per ricerca (indice di ricerca: codici, codice SCM, codice fornitore, descrizioni)
         search = self.request.GET.get('search')
         if search:
-            queryset = queryset.filter(
-                Q(codice_interno__icontains=search) |
-                Q(descrizione__icontains=search) |
-                Q(codice_fornitore__icontains=search)
-            )
+            queryset = cerca_articoli(queryset, search)
+            # Senza un ordinamento esplicito, i risultati più rilevanti vengono per primi
+            if not self.request.GET.get('order'):
+                queryset = queryset.order_by('-punteggio_ricerca', 'descrizione')
         
         # Filtro per categoria (GERARCHICO: include sottocategorie)
         categoria = self.request.GET.get('categoria')
         if categoria:
             try:
                 cat = Categoria.objects.get(pk=categoria)
-                # Includi la categoria selezionata + tutte le sue sottocategorie
-                categoria_ids = [cat.id_categoria] + cat.get_all_children_ids()
-                queryset = queryset.filter(categoria_id__in=categoria_ids)
+                # Includi la categoria selezionata + tutte le sue sottocategorie (una subquery sul percorso)
+                queryset = queryset.filter(cat.get_filtro_articoli())
             except Categoria.DoesNotExist:
                 pass
         
@@ -1304,34 +1266,62 @@ class MovimentoCreateView(CanEditMixin, CreateView):
     def form_valid(self, form):
         movimento = form.save(commit=False)
         movimento.operatore = self.request.user.username
-        movimento.save()
         
-        # Registra azione se è un CARICO (IN)
-        if movimento.tipo_movimento == 'CARICO':
-            from .models import AzioneUtente
-            AzioneUtente.objects.create(
-                username=self.request.user.username,
-                tipo_azione='CARICO',
-                dettagli=f"Carico articolo: {movimento.articolo.codice_interno}"
-            )
-        
-        # Aggiorna la giacenza
-        articolo = movimento.articolo
-        giacenza = articolo.giacenza
+        # Movimento e giacenza nella stessa transazione, con aggiornamento atomico dello stock
+        try:
+            registra_movimento(movimento)
+        except ValidationError as e:
+            form.add_error(None, e)
+            return self.form_invalid(form)
         
-        if movimento.tipo_movimento == 'CARICO':
-            giacenza.quantita_disponibile += movimento.quantita
-        elif movimento.tipo_movimento in ['SCARICO', 'RESO_FORNITORE']:
-            giacenza.quantita_disponibile = max(0, giacenza.quantita_disponibile - movimento.quantita)
-        elif movimento.tipo_movimento == 'RETTIFICA':
-            # Per rettifiche, il valore inserito è la nuova quantità
-            giacenza.quantita_disponibile = movimento.quantita
+        self.object = movimento
+        messages.success(self.request, _('Movimento registrato con successo!'))
+        logger.info(f"📦 Movimento registrato: {movimento.tipo_movimento} - {movimento.articolo.codice_interno}")
+        return redirect(self.get_success_url())
+
+
+class MovimentoBatchView(CanEditMixin, View):
+    """
+    Registra in un colpo solo tutte le righe di un documento (es. DDT di ricevimento).
+    
+    POST JSON: {
+        numero_documento: str,
+        tipo_movimento: str (default per le righe, es. 'CARICO'),
+        fornitore_id: int (opzionale),
+        causale: str (opzionale),
+        righe: [{articolo_id, quantita, tipo_movimento (opzionale)}]
+    }
+    Le righe vengono validate insieme: se anche una sola non è valida non viene salvato nulla.
+    """
+    
+    def post(self, request, *args, **kwargs):
+        try:
+            data = json.loads(request.body)
+            tipo_default = data.get('tipo_movimento', 'CARICO')
+            righe = [
+                {**riga, 'tipo_movimento': riga.get('tipo_movimento') or tipo_default}
+                for riga in data.get('righe') or []
+            ]
+        except (ValueError, TypeError, AttributeError):
+            return JsonResponse({'success': False, 'errori': ['Richiesta JSON non valida']}, status=400)
         
-        giacenza.save()
+        try:
+            movimenti = registra_movimenti_batch(
+                righe,
+                operatore=request.user.username,
+                numero_documento=data.get('numero_documento'),
+                fornitore_id=data.get('fornitore_id') or None,
+                causale=data.get('causale'),
+                note=data.get('note') or None,
+            )
+        except ValidationError as e:
+            return JsonResponse({'success': False, 'errori': e.messages}, status=400)
         
-        messages.success(self.request, _('Movimento registrato con successo!'))
-        logger.info(f"📦 Movimento registrato: {movimento.tipo_movimento} - {articolo.codice_interno}")
-        return super().form_valid(form)
+        logger.info(
+            f"📦 Batch movimenti registrato: doc. {data.get('numero_documento')} - "
+            f"{len(movimenti)} righe ({request.user.username})"
+        )
+        return JsonResponse({'success': True, 'movimenti': len(movimenti)})
 
 
 # ============================================================================
@@ -1404,12 +1394,9 @@ class GiacenzeReportView(CanViewMixin, TemplateView):
         ).select_related('articolo', 'articolo__categoria').order_by('-quantita_disponibile')
         
         # Statistiche totali
-        context['statistiche'] = Giacenza.objects.aggregate(
-            total_articoli=Count('articolo'),
-            total_disponibile=Sum('quantita_disponibile'),
-            total_impegnata=Sum('quantita_impegnata'),
-            total_prenotata=Sum('quantita_prenotata'),
-        )
+        kpi = get_kpi_snapshot()
+        context['kpi'] = kpi
+        context['statistiche'] = kpi.giacenze
         
         return context
 
@@ -1754,12 +1741,21 @@ class BackupListView(CanEditMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         
         from .backup_manager import BackupManager
+        from .pianificazione_backup import classifica_backup
         backup_mgr = BackupManager()
         
-        # Lista backup esistenti
+        # Lista backup esistenti, con i livelli di conservazione che li tengono
         context['backups'] = backup_mgr.list_backups()
+        motivi = classifica_backup(context['backups'], backup_mgr.politica_conservazione)
+        for backup in context['backups']:
+            backup['conservazione'] = motivi[backup['filename']]
         context['backup_dir'] = backup_mgr.backup_dir
         context['retention_days'] = backup_mgr.retention_days
+        context['politica_conservazione'] = backup_mgr.politica_conservazione
+        
+        # Backup o ripristino in background (in corso o appena concluso)
+        from .lavori_backup import stato_lavoro, ultimo_lavoro
+        context['lavoro'] = stato_lavoro(ultimo_lavoro())
         
         # Statistiche
         if context['backups']:
@@ -1788,18 +1784,19 @@ class BackupCreateView(CanEditMixin, TemplateView):
             return False
     
     def post(self, request, *args, **kwargs):
-        from .backup_manager import BackupManager
-        backup_mgr = BackupManager()
+        from .lavori_backup import accoda_lavoro
+        from .models import LavoroBackup
         
-        success, filepath, message = backup_mgr.create_backup()
+        # Il dump gira in background: la pagina dei backup ne mostra l'avanzamento
+        lavoro, creato = accoda_lavoro(LavoroBackup.BACKUP, utente=request.user.username)
         
-        if success:
-            messages.success(request, f"✅ {message}")
-            filepath_name = filepath.name if filepath else 'backup'
-            logger.info(f"Backup creato da {request.user.username}: {filepath_name}")
+        if creato:
+            messages.info(request, "⏳ Backup avviato: l'avanzamento è mostrato qui sotto")
+            logger.info(f"Backup avviato da {request.user.username} (lavoro {lavoro.pk})")
         else:
-            messages.error(request, f"❌ {message}")
-            logger.error(f"Errore creazione backup da {request.user.username}: {message}")
+            messages.warning(
+                request, f"⚠️ {lavoro.get_tipo_display()} già in corso (avviato da {lavoro.utente or 'sconosciuto'})"
+            )
         
         return redirect('magazzino:backup_list')
 
@@ -1819,7 +1816,8 @@ class BackupDownloadView(CanEditMixin, TemplateView):
     def get(self, request, *args, **kwargs):
         filename = kwargs.get('filename', '')
         
-        from .backup_manager import BackupManager
+        from .backup_manager import BackupManager, ESTENSIONI_ARCHIVIO
+        from .download_file import risposta_download
         backup_mgr = BackupManager()
         
         backup_path = Path(str(backup_mgr.backup_dir or '.')) / str(filename)
@@ -1829,21 +1827,25 @@ class BackupDownloadView(CanEditMixin, TemplateView):
             messages.error(request, "File di backup non trovato")
             return redirect('magazzino:backup_list')
         
-        if not backup_path.name.startswith('backup_'):
+        if not backup_path.name.startswith('backup_') or not backup_path.name.endswith(ESTENSIONI_ARCHIVIO):
             messages.error(request, "File non valido")
             return redirect('magazzino:backup_list')
         
-        # Log download
-        logger.info(f"Download backup {filename} da {request.user.username}")
+        # Log download (le riprese di un download interrotto indicano il byte di partenza)
+        ripresa = request.headers.get('Range')
+        logger.info(f"Download backup {filename} da {request.user.username}" + (f" ({ripresa})" if ripresa else ""))
         
-        # Serve file
-        response = FileResponse(
-            open(backup_path, 'rb'),
-            content_type='application/gzip'
+        # Serve file: Range/ETag per riprendere i download, oppure X-Sendfile/X-Accel-Redirect al proxy
+        return risposta_download(
+            request,
+            backup_path,
+            content_type={
+                '.zst': 'application/zstd',
+                '.tar': 'application/x-tar',
+            }.get(backup_path.suffix, 'application/gzip'),
+            proxy=getattr(settings, 'BACKUP_DOWNLOAD_PROXY', None),
+            url_interno=getattr(settings, 'BACKUP_DOWNLOAD_URL_INTERNO', '/backup-interni/') + filename,
         )
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        return response
 
 
 class BackupDeleteView(CanEditMixin, TemplateView):
@@ -1924,19 +1926,45 @@ class BackupRestoreView(CanEditMixin, TemplateView):
             return redirect('magazzino:backup_list')
         
         from .backup_manager import BackupManager
+        from .lavori_backup import accoda_lavoro
+        from .models import LavoroBackup
         backup_mgr = BackupManager()
         
-        success, message = backup_mgr.restore_backup(filename)
+        if filename not in {backup['filename'] for backup in backup_mgr.list_backups()}:
+            messages.error(request, "❌ File di backup non trovato")
+            return redirect('magazzino:backup_list')
         
-        if success:
-            messages.success(request, f"✅ {message}")
-            logger.warning(f"⚠️ RESTORE eseguito da {request.user.username}: {filename}")
+        lavoro, creato = accoda_lavoro(LavoroBackup.RESTORE, filename=filename, utente=request.user.username)
+        
+        if creato:
+            messages.info(request, f"⏳ Ripristino di {filename} avviato: l'avanzamento è mostrato qui sotto")
+            logger.warning(f"⚠️ RESTORE avviato da {request.user.username}: {filename} (lavoro {lavoro.pk})")
         else:
-            messages.error(request, f"❌ {message}")
+            messages.warning(
+                request, f"⚠️ {lavoro.get_tipo_display()} già in corso (avviato da {lavoro.utente or 'sconosciuto'})"
+            )
         
         return redirect('magazzino:backup_list')
 
 
+class BackupStatoView(CanEditMixin, View):
+    """Stato JSON del backup o ripristino in background, letto a intervalli dalla pagina dei backup"""
+    
+    def test_func(self):
+        """Solo ADMIN vede i lavori di backup"""
+        if not self.request.user.is_authenticated:
+            return False
+        try:
+            return self.request.user.profilo.è_admin()
+        except:
+            return False
+    
+    def get(self, request, *args, **kwargs):
+        from .lavori_backup import stato_lavoro, ultimo_lavoro
+        
+        return JsonResponse({'lavoro': stato_lavoro(ultimo_lavoro())})
+
+
 class BackupSettingsView(CanEditMixin, FormView):
     """Configurazione impostazioni backup"""
     template_name = 'magazzino/backup_settings.html'
@@ -1963,6 +1991,25 @@ class BackupSettingsView(CanEditMixin, FormView):
             'backup_dir': Configurazione.get_value('backup_dir', str(settings.BASE_DIR / 'backups')),
             'retention_days': Configurazione.get_value('backup_retention_days', 30),
             'mysql_bin_path': Configurazione.get_value('mysql_bin_path', r'C:\xampp\mysql\bin'),
+            'compressione': Configurazione.get_value('backup_compressione', getattr(settings, 'BACKUP_COMPRESSIONE', 'gzip')),
+            'livello_compressione': Configurazione.get_value(
+                'backup_livello_compressione', getattr(settings, 'BACKUP_LIVELLO_COMPRESSIONE', 6)
+            ),
+            'parallelo': Configurazione.get_value('backup_parallelo', getattr(settings, 'BACKUP_PARALLELO', False)),
+            'processi': Configurazione.get_value('backup_processi', getattr(settings, 'BACKUP_PROCESSI', 4)),
+            'conserva_orari': Configurazione.get_value(
+                'backup_conserva_orari', getattr(settings, 'BACKUP_CONSERVA_ORARI', 24)
+            ),
+            'conserva_settimanali': Configurazione.get_value(
+                'backup_conserva_settimanali', getattr(settings, 'BACKUP_CONSERVA_SETTIMANALI', 8)
+            ),
+            'conserva_mensili': Configurazione.get_value(
+                'backup_conserva_mensili', getattr(settings, 'BACKUP_CONSERVA_MENSILI', 12)
+            ),
+            'orari': Configurazione.get_value('backup_orari', getattr(settings, 'BACKUP_ORARI', '')),
+            'intervallo_incrementale': Configurazione.get_value(
+                'backup_intervallo_incrementale', getattr(settings, 'BACKUP_INTERVALLO_INCREMENTALE', 0)
+            ),
         }
     
     def form_valid(self, form):
@@ -1985,7 +2032,7 @@ class BackupSettingsView(CanEditMixin, FormView):
                 'backup_retention_days',
                 form.cleaned_data['retention_days'],
                 tipo_dato='integer',
-                descrizione='Giorni di conservazione dei backup prima della pulizia automatica',
+                descrizione='Giorni di cui conservare l\'ultimo backup giornaliero',
                 username=username
             )
             
@@ -1997,6 +2044,78 @@ class BackupSettingsView(CanEditMixin, FormView):
                 username=username
             )
             
+            Configurazione.set_value(
+                'backup_compressione',
+                form.cleaned_data['compressione'],
+                tipo_dato='string',
+                descrizione='Formato di compressione dei backup (gzip o zstd)',
+                username=username
+            )
+            
+            Configurazione.set_value(
+                'backup_livello_compressione',
+                form.cleaned_data['livello_compressione'],
+                tipo_dato='integer',
+                descrizione='Livello di compressione dei backup (gzip 1-9, zstd 1-19)',
+                username=username
+            )
+            
+            Configurazione.set_value(
+                'backup_parallelo',
+                form.cleaned_data['parallelo'],
+                tipo_dato='boolean',
+                descrizione='Backup per tabella in parallelo (archivio .tar con manifest)',
+                username=username
+            )
+            
+            Configurazione.set_value(
+                'backup_processi',
+                form.cleaned_data['processi'],
+                tipo_dato='integer',
+                descrizione='Processi del backup e del ripristino parallelo',
+                username=username
+            )
+            
+            Configurazione.set_value(
+                'backup_conserva_orari',
+                form.cleaned_data['conserva_orari'],
+                tipo_dato='integer',
+                descrizione='Ore di cui conservare l\'ultimo backup orario',
+                username=username
+            )
+            
+            Configurazione.set_value(
+                'backup_conserva_settimanali',
+                form.cleaned_data['conserva_settimanali'],
+                tipo_dato='integer',
+                descrizione='Settimane di cui conservare l\'ultimo backup settimanale',
+                username=username
+            )
+            
+            Configurazione.set_value(
+                'backup_conserva_mensili',
+                form.cleaned_data['conserva_mensili'],
+                tipo_dato='integer',
+                descrizione='Mesi di cui conservare l\'ultimo backup mensile',
+                username=username
+            )
+            
+            Configurazione.set_value(
+                'backup_orari',
+                form.cleaned_data['orari'],
+                tipo_dato='string',
+                descrizione='Orari dei backup completi pianificati (comando pianifica_backup)',
+                username=username
+            )
+            
+            Configurazione.set_value(
+                'backup_intervallo_incrementale',
+                form.cleaned_data['intervallo_incrementale'],
+                tipo_dato='integer',
+                descrizione='Minuti tra due backup incrementali pianificati (0 = nessuno)',
+                username=username
+            )
+            
             messages.success(
                 self.request, 
                 "✅ Impostazioni salvate con successo! Le modifiche sono attive immediatamente."
@@ -2082,6 +2201,79 @@ def get_articolo_giacenza(request, articolo_id):
         }, status=500)
 
 
+AUTOCOMPLETE_CACHE_TIMEOUT = 30  # secondi
+AUTOCOMPLETE_LIMITE_MAX = 20
+
+
+def articolo_autocomplete(request):
+    """
+    Endpoint AJAX per l'autocompletamento degli articoli (es. campo articolo del form movimento).
+    Usa l'indice di ricerca a prefisso e restituisce gli articoli attivi più rilevanti,
+    una pagina alla volta. Le risposte restano in cache per AUTOCOMPLETE_CACHE_TIMEOUT secondi.
+    
+    Query string:
+        q: testo cercato (codice interno, codice SCM, codice fornitore, descrizione)
+        limit: risultati per pagina (default 10, max AUTOCOMPLETE_LIMITE_MAX)
+        page: numero di pagina (default 1)
+    
+    Returns:
+        JSON: {
+            success: bool,
+            risultati: [{id, codice_interno, descrizione, disponibile}],
+            page: int,
+            has_more: bool
+        }
+    """
+    # Verifica che l'utente sia autenticato
+    if not request.user.is_authenticated:
+        return JsonResponse({
+            'success': False,
+            'error': 'Non autenticato'
+        }, status=401)
+    
+    try:
+        limite = min(max(int(request.GET.get('limit', 10)), 1), AUTOCOMPLETE_LIMITE_MAX)
+    except ValueError:
+        limite = 10
+    try:
+        pagina = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        pagina = 1
+    
+    parole = scomponi_parole(request.GET.get('q', ''))
+    if not parole:
+        return JsonResponse({'success': True, 'risultati': [], 'page': pagina, 'has_more': False})
+    
+    chiave_cache = f"magazzino:autocomplete:{'-'.join(parole)}:{pagina}:{limite}"
+    data = cache.get(chiave_cache)
+    if data is None:
+        inizio = (pagina - 1) * limite
+        # Una riga in più per sapere se esiste la pagina successiva
+        articoli = list(cerca_articoli(
+            PezzoRicambio.objects.filter(stato_attivo=True), ' '.join(parole)
+        ).order_by('-punteggio_ricerca', 'descrizione').values(
+            'id_articolo', 'codice_interno', 'descrizione', 'giacenza__quantita_disponibile'
+        )[inizio:inizio + limite + 1])
+        
+        data = {
+            'success': True,
+            'risultati': [
+                {
+                    'id': articolo['id_articolo'],
+                    'codice_interno': articolo['codice_interno'],
+                    'descrizione': articolo['descrizione'],
+                    'disponibile': articolo['giacenza__quantita_disponibile'] or 0,
+                }
+                for articolo in articoli[:limite]
+            ],
+            'page': pagina,
+            'has_more': len(articoli) > limite,
+        }
+        cache.set(chiave_cache, data, timeout=AUTOCOMPLETE_CACHE_TIMEOUT)
+    
+    return JsonResponse(data)
+
+
 def get_articolo_fornitore(request, articolo_id):
     """
     Endpoint AJAX che ritorna il fornitore predefinito di un articolo.